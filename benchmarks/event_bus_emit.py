@@ -0,0 +1,64 @@
+"""
+EventBus.emit 单条消息开销基准。
+
+模拟 game_response_received: 9 个监听器，其中大部分只处理回复/提及我的消息。
+用法 (在项目根目录):  python -m benchmarks.event_bus_emit [消息数]
+"""
+import asyncio
+import inspect
+import sys
+import time
+import types
+
+from core.event_bus import EventBus
+
+LISTENER_COUNT = 9
+REPLY_ONLY = 6    # 只处理回复我的消息
+MENTION_ONLY = 1  # 只处理提及我的消息 (其余监听所有消息)
+
+
+def _make_listener(kind: str, counter: list):
+    async def listener(message, is_reply_to_me, is_mentioning_me, *rest):
+        if kind == "reply" and not is_reply_to_me: return
+        if kind == "mention" and not is_mentioning_me: return
+        counter[0] += 1
+    listener.__name__ = f"{kind}_listener"
+    return listener
+
+
+async def _run(message_count: int, use_predicates: bool) -> float:
+    bus = EventBus()
+    supports_when = "when" in inspect.signature(bus.on).parameters
+    if use_predicates and not supports_when: return float("nan")
+    if supports_when:
+        from core.event_bus import reply_to_me, mentioning_me
+    counter = [0]
+    kinds = ["reply"] * REPLY_ONLY + ["mention"] * MENTION_ONLY + ["all"] * (LISTENER_COUNT - REPLY_ONLY - MENTION_ONLY)
+    for kind in kinds:
+        callback = _make_listener(kind, counter)
+        if use_predicates and kind == "reply": bus.on("game_response_received", callback, when=reply_to_me)
+        elif use_predicates and kind == "mention": bus.on("game_response_received", callback, when=mentioning_me)
+        else: bus.on("game_response_received", callback)
+
+    message = types.SimpleNamespace(id=1, text="群聊里的普通游戏消息", caption=None)
+    start = time.perf_counter()
+    for i in range(message_count):
+        # 约 5% 的消息回复了我
+        await bus.emit("game_response_received", message, i % 20 == 0, False)
+        if i % 100 == 0: await asyncio.sleep(0) # 让监听器任务有机会完成
+    while bus._running_tasks: await asyncio.sleep(0)
+    return (time.perf_counter() - start) / message_count * 1e6
+
+
+def main():
+    message_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    plain = asyncio.run(_run(message_count, use_predicates=False))
+    filtered = asyncio.run(_run(message_count, use_predicates=True))
+    print(f"消息数: {message_count}, 监听器: {LISTENER_COUNT}")
+    print(f"无预过滤: {plain:8.2f} µs/消息")
+    if filtered == filtered: print(f"预过滤:   {filtered:8.2f} µs/消息")
+    else: print("预过滤:   (当前 EventBus 不支持 when=)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+背包字典处理 vs 类型化模型 (modules.game_models.Inventory) 的内存 / CPU 基准。
+
+模拟大背包 (默认 3000 种物品) 上的典型查询: 每轮检查一份 8 种材料的配方并查找一张配方图纸。
+- 字典: 每次查询前展开 items_by_type 并按名称累加 (check_materials 旧实现)
+- 模型: 每次同步解码一次并建立索引，查询走 by_name / by_id
+用法 (在项目根目录):  python -m benchmarks.game_models [物品数] [查询轮数]
+"""
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from modules.game_models import Inventory
+
+ITEM_TYPES = ("material", "elixir", "recipe", "seed", "treasure")
+RECIPE_SIZE = 8
+
+
+def _make_inventory(item_count: int) -> dict:
+    rng = random.Random(42)
+    items_by_type = {item_type: [] for item_type in ITEM_TYPES}
+    for i in range(item_count):
+        item_type = ITEM_TYPES[i % len(ITEM_TYPES)]
+        items_by_type[item_type].append({"item_id": f"{item_type}_{i}", "name": f"物品{i}", "quantity": rng.randint(1, 99)})
+    return {"summary": {"total_types": item_count, "material_types": 0, "last_updated": "2024-01-01 00:00:00"}, "items_by_type": items_by_type}
+
+
+def _dict_queries(inventory: dict, recipe: list, recipe_item_id: str) -> int:
+    current = {}
+    for sublist in inventory["items_by_type"].values():
+        for item in sublist:
+            current[item["name"]] = current.get(item["name"], 0) + item.get("quantity", 0)
+    found = any(item.get("item_id") == recipe_item_id for item in inventory["items_by_type"].get("recipe", []))
+    return sum(current.get(name, 0) for name in recipe) + found
+
+
+def _model_queries(inventory: Inventory, recipe: list, recipe_item_id: str) -> int:
+    return sum(inventory.quantity_by_name(name) for name in recipe) + inventory.has(recipe_item_id)
+
+
+def _measure_memory(build) -> int:
+    tracemalloc.start()
+    obj = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return current
+
+
+def main():
+    item_count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    inventory_dict = _make_inventory(item_count)
+    payload = json.dumps(inventory_dict, ensure_ascii=False)
+    recipe = [f"物品{i}" for i in range(0, item_count, max(1, item_count // RECIPE_SIZE))][:RECIPE_SIZE]
+    recipe_item_id = f"recipe_{(item_count // 2) - (item_count // 2) % len(ITEM_TYPES) + 2}"
+
+    start = time.perf_counter()
+    for _ in range(rounds): _dict_queries(inventory_dict, recipe, recipe_item_id)
+    dict_us = (time.perf_counter() - start) / rounds * 1e6
+
+    start = time.perf_counter()
+    model = Inventory.from_cache(inventory_dict)
+    decode_us = (time.perf_counter() - start) * 1e6
+    start = time.perf_counter()
+    for _ in range(rounds): _model_queries(model, recipe, recipe_item_id)
+    model_us = (time.perf_counter() - start) / rounds * 1e6
+    assert _dict_queries(inventory_dict, recipe, recipe_item_id) == _model_queries(model, recipe, recipe_item_id)
+
+    dict_bytes = _measure_memory(lambda: json.loads(payload))
+    model_bytes = _measure_memory(lambda: Inventory.from_cache(json.loads(payload)))
+
+    print(f"物品数: {item_count}, 查询轮数: {rounds}")
+    print(f"字典: 每轮 {dict_us:10.1f} µs | 内存 {dict_bytes / 1024:8.1f} KB")
+    print(f"模型: 每轮 {model_us:10.1f} µs | 内存 {model_bytes / 1024:8.1f} KB (模型 + 索引，解码一次 {decode_us:.0f} µs)")
+    print(f"同步间隔内查询 {max(1, round(decode_us / max(dict_us - model_us, 1e-9)))} 轮以上时模型更省 CPU")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,301 @@
 import asyncio
-from collections import defaultdict
-import inspect 
-from core.logger import logger 
+import logging
+import time
+from collections import defaultdict, deque
+import inspect
+from typing import Any, Callable, Optional
+from core.logger import logger
+
+# --- 新增: 常用监听器预过滤条件 (在创建任务前由 EventBus 求值) ---
+# 适用于 game_response_received / game_response:{分类} 事件，参数为 (message, is_reply_to_me, is_mentioning_me[, game_message])
+def reply_to_me(*args, **kwargs) -> bool:
+    """仅当消息回复了我"""
+    return len(args) > 1 and bool(args[1])
+
+def mentioning_me(*args, **kwargs) -> bool:
+    """仅当消息 @提及了我"""
+    return len(args) > 2 and bool(args[2])
+
+def reply_or_mention(*args, **kwargs) -> bool:
+    """消息回复或 @提及了我"""
+    return reply_to_me(*args) or mentioning_me(*args)
+
+def in_categories(*categories: str) -> Callable[..., bool]:
+    """消息分类 (GameMessage.categories) 与给定分类有交集"""
+    wanted = frozenset(categories)
+    def _predicate(*args, **kwargs) -> bool:
+        game_message = args[3] if len(args) > 3 else kwargs.get("game_message")
+        return game_message is not None and not wanted.isdisjoint(game_message.categories)
+    return _predicate
+
+def not_edited(*args, **kwargs) -> bool:
+    """排除编辑消息 (GameMessage.is_edited)，用于同时订阅原始编辑事件的监听器"""
+    game_message = args[3] if len(args) > 3 else kwargs.get("game_message")
+    return game_message is None or not game_message.is_edited
+
+def all_of(*predicates: Optional[Callable[..., bool]]) -> Optional[Callable[..., bool]]:
+    """组合多个预过滤条件 (忽略 None)，全部满足才调度"""
+    active = [p for p in predicates if p is not None]
+    if not active: return None
+    if len(active) == 1: return active[0]
+    def _predicate(*args, **kwargs) -> bool:
+        return all(p(*args, **kwargs) for p in active)
+    return _predicate
+
+def message_id_key(*args, **kwargs):
+    """合并键: 首个参数 (消息) 的 ID，同一条消息的多次编辑只保留最新一次"""
+    return getattr(args[0], "id", None) if args else None
+
+def from_chat(*chat_ids: int) -> Callable[..., bool]:
+    """首个参数 (消息) 来自给定的会话"""
+    wanted = frozenset(chat_ids)
+    def _predicate(*args, **kwargs) -> bool:
+        chat = getattr(args[0], "chat", None) if args else None
+        return chat is not None and chat.id in wanted
+    return _predicate
+# --- 新增结束 ---
+
+
+DURATION_SAMPLE_SIZE = 256 # 每个监听器保留的耗时样本数
+
+# --- 新增: 监听器并发上限满时的溢出策略 ---
+OVERFLOW_QUEUE = "queue"             # 排队等待 (队列满时丢弃新事件)
+OVERFLOW_DROP_OLDEST = "drop_oldest" # 队列满时丢弃最早排队的事件
+OVERFLOW_COALESCE = "coalesce"       # 排队中已有相同合并键的事件时，以新参数替换 (保留原排队位置)
+OVERFLOW_POLICIES = (OVERFLOW_QUEUE, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE)
+DEFAULT_MAX_PENDING = 50
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values: return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct))]
+
+
+class _Listener:
+    __slots__ = ("callback", "name", "when", "inline", "is_coroutine", "slow_threshold",
+                 "max_concurrency", "overflow", "coalesce_key", "max_pending", "timeout", "active", "pending",
+                 "invocations", "failures", "skipped", "slow", "in_flight", "max_in_flight",
+                 "max_duration", "durations", "queued", "dropped", "coalesced", "timeouts")
+
+    def __init__(self, callback, when: Optional[Callable[..., bool]], inline: bool, slow_threshold: Optional[float],
+                 max_concurrency: Optional[int] = None, overflow: str = OVERFLOW_QUEUE,
+                 coalesce_key: Optional[Callable[..., Any]] = None, max_pending: int = DEFAULT_MAX_PENDING,
+                 timeout: Optional[float] = None):
+        self.callback = callback
+        self.name = f"{getattr(callback, '__module__', '?')}.{getattr(callback, '__name__', 'Unknown')}"
+        self.when = when
+        self.inline = inline
+        self.is_coroutine = asyncio.iscoroutinefunction(callback)
+        self.slow_threshold = slow_threshold # None 表示使用 EventBus 的全局阈值
+        # --- 并发与背压 ---
+        self.max_concurrency = max_concurrency # None 表示不限制
+        self.overflow = overflow
+        self.coalesce_key = coalesce_key or message_id_key
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.active = 0 # 已调度 (含尚未开始执行) 的任务数
+        self.pending: deque = deque() # 等待调度的 [合并键, args, kwargs]
+        # --- 统计 ---
+        self.invocations = 0; self.failures = 0; self.skipped = 0; self.slow = 0
+        self.in_flight = 0; self.max_in_flight = 0
+        self.max_duration = 0.0
+        self.durations = deque(maxlen=DURATION_SAMPLE_SIZE)
+        self.queued = 0; self.dropped = 0; self.coalesced = 0; self.timeouts = 0
+
+    def get_stats(self) -> dict:
+        samples = sorted(self.durations)
+        return {
+            "listener": self.name, "inline": self.inline,
+            "invocations": self.invocations, "failures": self.failures, "skipped": self.skipped,
+            "slow": self.slow, "in_flight": self.in_flight, "max_in_flight": self.max_in_flight,
+            "pending": len(self.pending), "queued": self.queued, "dropped": self.dropped,
+            "coalesced": self.coalesced, "timeouts": self.timeouts,
+            "p50_ms": round(_percentile(samples, 0.5) * 1000, 1),
+            "p95_ms": round(_percentile(samples, 0.95) * 1000, 1),
+            "max_ms": round(self.max_duration * 1000, 1),
+        }
+
 
 class EventBus:
-    def __init__(self):
+    def __init__(self, slow_listener_threshold: float = 10.0):
         self._listeners = defaultdict(list)
-        self._running_tasks = set() 
+        self._running_tasks = set()
+        # --- 新增: 统计 ---
+        self.slow_listener_threshold = slow_listener_threshold # 监听器耗时超过该秒数时记录警告
+        self._emit_counts = defaultdict(int)
+        self._started_at = time.time()
 
-    def on(self, event_name: str, callback):
-        """注册一个事件监听器"""
-        if not asyncio.iscoroutinefunction(callback):
+    def on(self, event_name: str, callback, when: Optional[Callable[..., bool]] = None, inline: bool = False,
+           slow_threshold: Optional[float] = None, max_concurrency: Optional[int] = None,
+           overflow: str = OVERFLOW_QUEUE, coalesce_key: Optional[Callable[..., Any]] = None,
+           max_pending: int = DEFAULT_MAX_PENDING, timeout: Optional[float] = None):
+        """
+        注册一个事件监听器。
+        when: 预过滤条件，以事件参数调用，返回 False 时不调度该监听器 (不创建任务)。
+        inline: 在 emit 中直接执行 (不创建任务)，仅用于不会阻塞的轻量处理器；inline 时也允许普通函数。
+        slow_threshold: 单独的慢处理警告阈值 (秒)，用于本就需要较长时间的监听器。
+        max_concurrency: 同时执行的最大任务数，超出部分按 overflow 策略排队 (最多 max_pending 个)。
+        overflow: queue / drop_oldest / coalesce；coalesce 时以 coalesce_key(*args, **kwargs) 合并 (默认按消息 ID)。
+        timeout: 单次处理的最长时间 (秒)，超时后取消处理器并记录。
+        """
+        if not inline and not asyncio.iscoroutinefunction(callback):
              logger.error(f"事件监听器注册失败: '{getattr(callback, '__name__', 'Unknown')}' 必须是一个 async 函数。")
-             return 
-             
-        self._listeners[event_name].append(callback)
+             return
+        if overflow not in OVERFLOW_POLICIES:
+             logger.error(f"事件监听器注册失败: 未知的溢出策略 '{overflow}' (可选: {', '.join(OVERFLOW_POLICIES)})。")
+             return
+        if inline and (max_concurrency or timeout):
+             logger.warning(f"EventBus: inline 监听器 '{getattr(callback, '__name__', 'Unknown')}' 不支持并发上限/超时，已忽略。")
+             max_concurrency = None; timeout = None
+
+        listener = _Listener(callback, when, inline, slow_threshold, max_concurrency=max_concurrency, overflow=overflow,
+                             coalesce_key=coalesce_key, max_pending=max(1, max_pending), timeout=timeout)
+        self._listeners[event_name].append(listener)
         # --- (修改: 使用 DEBUG 级别) ---
-        logger.debug(f"EventBus: 已注册事件 '{event_name}' 的监听器: {getattr(callback, '__module__', '?')}.{getattr(callback, '__name__', 'Unknown')}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"EventBus: 已注册事件 '{event_name}' 的监听器: {listener.name}{' (inline)' if inline else ''}{' (带预过滤)' if when else ''}")
         # --- (修改结束) ---
 
     async def emit(self, event_name: str, *args, **kwargs):
         """
-        异步触发一个事件，为每个监听器创建一个独立的任务。
+        异步触发一个事件。
+        先对每个监听器求值预过滤条件；inline 监听器直接执行，其余为每个监听器创建一个独立的任务。
         """
-        logger.debug(f"EventBus: 触发事件: '{event_name}' (Args: {len(args)}, Kwargs: {len(kwargs)})") 
-        listeners_to_run = self._listeners.get(event_name) 
-        
-        # --- (新增 Debug 日志) ---
-        if listeners_to_run:
-            logger.debug(f"EventBus: 找到 {len(listeners_to_run)} 个监听器 for '{event_name}':")
-            for i, listener in enumerate(listeners_to_run):
-                 logger.debug(f"  [{i+1}] {getattr(listener, '__module__', '?')}.{getattr(listener, '__name__', 'Unknown')}")
-            # --- (新增结束) ---
-            
-            tasks = []
-            for listener in listeners_to_run:
-                listener_name = f"{getattr(listener, '__module__', '?')}.{getattr(listener, '__name__', 'Unknown')}" # (修改: 包含模块名)
-                logger.debug(f"EventBus: 为事件 '{event_name}' 创建任务: {listener_name}") # (修改: 改为 DEBUG)
-                
-                task = asyncio.create_task(self._execute_listener(listener, event_name, args, kwargs)) 
-                self._running_tasks.add(task)
-                task.add_done_callback(self._running_tasks.discard)
-                tasks.append(task)
-            
-            logger.debug(f"EventBus: 已为事件 '{event_name}' 创建 {len(tasks)} 个监听任务。") 
-        else: 
-           logger.debug(f"EventBus: 事件 '{event_name}' 没有注册任何监听器。") 
-
-    async def _execute_listener(self, callback, event_name: str, args: tuple, kwargs: dict):
+        self._emit_counts[event_name] += 1
+        listeners_to_run = self._listeners.get(event_name)
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        if not listeners_to_run:
+            if debug_enabled: logger.debug(f"EventBus: 事件 '{event_name}' 没有注册任何监听器。")
+            return
+
+        scheduled = 0; skipped = 0
+        for listener in listeners_to_run:
+            if listener.when is not None:
+                try:
+                    if not listener.when(*args, **kwargs):
+                        listener.skipped += 1; skipped += 1; continue
+                except Exception as e:
+                    logger.error(f"EventBus: 监听器 '{listener.name}' 的预过滤条件执行出错 (事件 '{event_name}'): {e}", exc_info=True)
+                    listener.skipped += 1; skipped += 1; continue
+            if listener.inline:
+                await self._execute_inline(listener, event_name, args, kwargs)
+            elif listener.max_concurrency and listener.active >= listener.max_concurrency:
+                self._enqueue_pending(listener, event_name, args, kwargs)
+            else:
+                self._spawn(listener, event_name, args, kwargs)
+            scheduled += 1
+
+        if debug_enabled:
+            logger.debug(f"EventBus: 事件 '{event_name}' (Args: {len(args)}, Kwargs: {len(kwargs)}) 已调度 {scheduled} 个监听器，预过滤跳过 {skipped} 个。")
+
+    def _spawn(self, listener: _Listener, event_name: str, args: tuple, kwargs: dict):
+        listener.active += 1
+        task = asyncio.create_task(self._execute_listener(listener, event_name, args, kwargs))
+        self._running_tasks.add(task)
+        task.add_done_callback(self._running_tasks.discard)
+
+    def _enqueue_pending(self, listener: _Listener, event_name: str, args: tuple, kwargs: dict):
+        """监听器已达并发上限: 按溢出策略将事件排队"""
+        key = None
+        if listener.overflow == OVERFLOW_COALESCE:
+            try: key = listener.coalesce_key(*args, **kwargs)
+            except Exception as e: logger.error(f"EventBus: 监听器 '{listener.name}' 的合并键计算出错: {e}")
+            if key is not None:
+                for entry in listener.pending:
+                    if entry[0] == key:
+                        entry[1] = args; entry[2] = kwargs
+                        listener.coalesced += 1
+                        return
+        if len(listener.pending) >= listener.max_pending:
+            listener.dropped += 1
+            if listener.overflow == OVERFLOW_QUEUE:
+                logger.warning(f"EventBus: 监听器 '{listener.name}' 排队已满 ({listener.max_pending})，丢弃事件 '{event_name}'。")
+                return
+            listener.pending.popleft()
+            logger.warning(f"EventBus: 监听器 '{listener.name}' 排队已满 ({listener.max_pending})，丢弃最早排队的事件 '{event_name}'。")
+        listener.pending.append([key, args, kwargs])
+        listener.queued += 1
+
+    def _release(self, listener: _Listener, event_name: str):
+        """任务结束: 释放并发名额并调度下一条排队的事件"""
+        listener.active -= 1
+        if listener.pending and (not listener.max_concurrency or listener.active < listener.max_concurrency):
+            _, args, kwargs = listener.pending.popleft()
+            self._spawn(listener, event_name, args, kwargs)
+
+    def _begin(self, listener: _Listener) -> float:
+        listener.invocations += 1
+        listener.in_flight += 1
+        if listener.in_flight > listener.max_in_flight: listener.max_in_flight = listener.in_flight
+        return time.perf_counter()
+
+    def _finish(self, listener: _Listener, event_name: str, started: float, failed: bool):
+        duration = time.perf_counter() - started
+        listener.in_flight -= 1
+        listener.durations.append(duration)
+        if duration > listener.max_duration: listener.max_duration = duration
+        if failed: listener.failures += 1
+        threshold = listener.slow_threshold if listener.slow_threshold is not None else self.slow_listener_threshold
+        if threshold and duration > threshold:
+            listener.slow += 1
+            logger.warning(f"EventBus: 监听器 '{listener.name}' 处理事件 '{event_name}' 耗时 {duration:.2f} 秒 (阈值 {threshold} 秒)。")
+
+    async def _execute_inline(self, listener: _Listener, event_name: str, args: tuple, kwargs: dict):
+        """在 emit 调用方中直接执行 inline 监听器"""
+        started = self._begin(listener); failed = False
+        try:
+            result = listener.callback(*args, **kwargs)
+            if inspect.isawaitable(result): await result
+        except Exception as e:
+            failed = True
+            logger.error(
+                f"执行事件 '{event_name}' 的 inline 监听器 '{listener.name}' 时出错: "
+                f"{e.__class__.__name__}: {e}. (Args: {len(args)}, Kwargs: {len(kwargs)})",
+                exc_info=True
+            )
+        finally:
+            self._finish(listener, event_name, started, failed)
+
+    async def _execute_listener(self, listener: _Listener, event_name: str, args: tuple, kwargs: dict):
         """安全地执行单个事件监听器"""
-        callback_name = f"{getattr(callback, '__module__', '?')}.{getattr(callback, '__name__', 'Unknown')}" # (修改: 包含模块名)
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
         # --- (新增 Debug 日志) ---
-        logger.debug(f"EventBus: 开始执行监听器 '{callback_name}' for event '{event_name}'...")
+        if debug_enabled: logger.debug(f"EventBus: 开始执行监听器 '{listener.name}' for event '{event_name}'...")
+        started = self._begin(listener); failed = False
         try:
-            await callback(*args, **kwargs) 
-            logger.debug(f"EventBus: 监听器 '{callback_name}' 执行完毕。") # (新增)
+            if listener.timeout:
+                await asyncio.wait_for(listener.callback(*args, **kwargs), timeout=listener.timeout)
+            else:
+                await listener.callback(*args, **kwargs)
+            if debug_enabled: logger.debug(f"EventBus: 监听器 '{listener.name}' 执行完毕。") # (新增)
         # --- (新增结束) ---
+        except asyncio.TimeoutError:
+            failed = True
+            listener.timeouts += 1
+            logger.error(f"EventBus: 监听器 '{listener.name}' 处理事件 '{event_name}' 超过 {listener.timeout} 秒，已取消。")
         except Exception as e:
+            failed = True
             log_message = (
-                f"执行事件 '{event_name}' 的监听器 '{callback_name}' 时出错: "
+                f"执行事件 '{event_name}' 的监听器 '{listener.name}' 时出错: "
                 f"{e.__class__.__name__}: {e}. (Args: {len(args)}, Kwargs: {len(kwargs)})"
             )
             logger.error(log_message, exc_info=True)
+        finally:
+            self._finish(listener, event_name, started, failed)
+            self._release(listener, event_name)
+
+    # --- 新增: 统计导出 ---
+    def get_stats(self) -> dict:
+        """返回事件与监听器统计 (可直接序列化为 JSON)"""
+        events = {}
+        for event_name in sorted(set(self._listeners) | set(self._emit_counts)):
+            events[event_name] = {
+                "emitted": self._emit_counts.get(event_name, 0),
+                "listeners": [listener.get_stats() for listener in self._listeners.get(event_name, [])],
+            }
+        return {
+            "uptime_seconds": round(time.time() - self._started_at, 1),
+            "running_tasks": len(self._running_tasks),
+            "slow_listener_threshold": self.slow_listener_threshold,
+            "events": events,
+        }
@@ -24,13 +24,49 @@ DEFAULT_CONFIG = {
         'target_chat_id': 0, # 占位符
         'control_chat_id': 0, # 占位符
         'game_bot_ids': [], # 占位符
-        'command_delay': 10.5 # 默认指令延迟
+        'command_delay': 10.5, # 默认指令延迟 (ack 模式下为等待回复的上限)
+        'pacing_mode': 'fixed', # fixed: 固定延迟; ack: 收到游戏 Bot 回复后即放行下一条
+        'min_command_gap': 3.0, # ack 模式下两条指令的最小间隔 (秒)
+        'command_rate_per_minute': 20, # 令牌桶: 每分钟最多指令数
+        'command_burst': 3, # 令牌桶: 允许的突发指令数
+        'correlator_retention': 900, # 指令/响应关联记录保留时间 (秒)
+        'outbound_rate_per_minute': 40, # 所有出站发送/编辑的全局速率 (FloodWait 后自动降速并逐步恢复)
+        'outbound_burst': 5,
+        'outbound_chat_rate_per_minute': 20, # 单个会话的速率
+        'outbound_chat_burst': 3,
+        'outbound_max_flood_sleep': 120, # 超过该秒数的 FloodWait 不自动重试
+        'edit_coalesce_mode': 'settle', # 游戏 Bot 编辑消息合并: settle / change / off
+        'edit_settle_seconds': 1.5, # settle 模式下同一消息静默多少秒后分发最后一次编辑
+        'edit_max_delay': 10.0, # 持续编辑时最迟在首次编辑后多少秒分发一次
+        'command_lane_ttl': { # 各优先级通道指令的默认有效期 (秒)，过期未发出则丢弃
+            'urgent': 90,
+            'normal': 1800,
+            'bulk': 3600
+        }
+    },
+    'notifications': {
+        'batch_window_seconds': 5.0, # 合并窗口 (秒)，窗口内的普通通知合并为一条消息 (0 为不合并)
+        'digest_mode': 'off', # off / hourly / daily: 普通通知改为每小时或每日汇总发送 (critical 通知始终立即发送)
+        'digest_hour': 21, # daily 模式下发送摘要的整点 (本地时间)
+    },
+    'event_bus': {
+        'slow_listener_threshold': 10.0, # 监听器单次处理超过该秒数时记录慢处理警告 (0 为关闭)
     },
     'redis': {
         'host': 'localhost',
         'port': 6379,
         'db': 0,
-        'password': None
+        'password': None,
+        'transport': 'pubsub', # pubsub / streams (Streams: 消费组 + XACK，断线期间的消息不丢失)
+        'stream_channels': [], # 使用 Streams 的频道 (为空则除 pubsub_channels 外的全部频道)
+        'pubsub_channels': None, # 始终使用 PubSub 的广播频道 (None 为默认: 缓存失效 / 全局数据更新 / 交易请求频道)
+        'stream_maxlen': 1000, # 每个 Stream 保留的最大条数 (近似截断)
+        'stream_reclaim_idle_seconds': 60, # 未确认超过该时间的消息由 XAUTOCLAIM 回收重投
+        'consumer_name': None # 消费者名称 (streams 时必填: 每个助手唯一且重启后不变，如 Telegram 账号名)
+    },
+    'communication': {
+        'task_channel': 'assistant_tasks',
+        'task_routing': 'shared' # shared: 所有实例收全部任务再过滤 / addressed: 发布到 {task_channel}:{目标ID}，只收自己的任务
     },
     'api_services': {
         'shared_cookie': ''
@@ -64,6 +100,28 @@ DEFAULT_CONFIG = {
         'item_master': 90000,
         'shop': 90000
     },
+    'character_sync': {
+        'debounce_seconds': 10, # 该时间内的多次同步请求合并为一次
+        'min_interval_seconds': 30 # 两次 API 同步的最小间隔 (urgent 请求除外)
+    },
+    'cache_refresh': {
+        'redis_lock': False, # 多个进程共用同一账号时开启: 同一时间只有一个进程调用 API 刷新角色缓存
+        'lock_ttl': 30, # 刷新锁有效期 (秒)，也是其他进程等待的最长时间
+        'stale_while_revalidate': True, # 超过 cache_ttl 的角色数据先返回旧值并在后台刷新
+        'hard_ttl_factor': 2.0, # Redis 实际过期时间 = cache_ttl × 该倍数，超过后读取才阻塞等待 API
+        'l1_ttl_seconds': 10, # 进程内 L1 缓存 (已解码对象) 的有效期，0 为关闭
+        'l1_max_entries': 256,
+        'invalidation_channel': 'cache_invalidate' # 写入缓存后通知其他进程丢弃 L1 的频道
+    },
+    'warmup': { # 启动预热: TG 客户端启动后按依赖并发加载物品主数据 / 商店 / 角色缓存，完成后触发 system_ready
+        'max_concurrency': 3, # 同时进行的预热步骤数
+        'step_timeout': 60 # 单个步骤的超时 (秒)，超时后不再阻塞 system_ready
+    },
+    'shared_data': { # 物品主数据 / 商店等全局数据 (所有账号共用一份)
+        'min_refresh_interval': 21600, # 任一实例在该秒数内已刷新过时，定时/启动同步跳过 API 调用
+        'lease_ttl': 60, # 刷新租约有效期 (秒): 同一时间只有一个实例调用 API，其余实例最多等待该时间
+        'update_channel': 'game_data_updated' # 全局数据更新后通知其他实例的频道
+    },
     'logging': {
         'level': 'INFO'
     },
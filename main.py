@@ -23,6 +23,7 @@ from modules.http_client import HTTPClient
 from modules.gemini_client import GeminiClient
 from modules.scheduler import Scheduler
 from modules.game_data_manager import GameDataManager
+from modules.warmup import build_startup_warmup
 from plugins import load_plugins, loaded_plugins_status
 
 PLUGIN_NAME_MAP = {
@@ -58,9 +59,10 @@ PLUGIN_NAME_MAP = {
     "recipe_sharing_plugin": "配方共享",
     "star_platform_plugin": "自动观星台",
     "auto_duel_plugin": "自动斗法", # <-- 新增自动斗法
+    "performance_plugin": "性能统计",
 }
 
-event_bus = EventBus()
+event_bus = EventBus(slow_listener_threshold=config.get("event_bus.slow_listener_threshold", 10.0))
 sys.path.append('.')
 
 @asynccontextmanager
@@ -68,6 +70,7 @@ async def lifespan(ctx: AppContext):
     logger.info("应用程序启动中...")
     if ctx.redis: await ctx.redis.connect()
     else: logger.error("Lifespan: RedisClient 未初始化!")
+    if ctx.redis and ctx.data_manager: await ctx.data_manager.start_invalidation_listener()
 
     if ctx.http: await ctx.http.create_session()
     else: logger.error("Lifespan: HTTPClient 未初始化!")
@@ -123,6 +126,10 @@ async def main():
     app_context.telegram_client = telegram_client
     app_context.data_manager = GameDataManager(app_context)
     logger.info("GameDataManager 已实例化并添加到 AppContext。")
+    # --- 新增: 启动预热 (TG 客户端启动后并发加载缓存，完成后触发 system_ready) ---
+    app_context.warmup = build_startup_warmup(app_context)
+    event_bus.on("telegram_client_started", app_context.warmup.run)
+    # --- 新增结束 ---
 
     telegram_client.set_redis_client(redis_client)
 
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from core.logger import logger
+
+
+class _PendingCommand:
+    __slots__ = ("msg_id", "command", "sent_at", "future")
+
+    def __init__(self, msg_id: int, command: str, sent_at: float):
+        self.msg_id = msg_id
+        self.command = command
+        self.sent_at = sent_at # time.time()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class CommandCorrelator:
+    """
+    指令/响应关联器。
+    每条发出的游戏指令按 MsgID 登记一个 Future，游戏 Bot 回复 (或编辑后回复) 该 MsgID 时
+    Future 以 Bot 消息完成，插件可直接 await 结果而无需自行在 Redis 中记录等待状态。
+    """
+    def __init__(self, event_bus=None, retention_seconds: float = 900, max_entries: int = 500):
+        self.event_bus = event_bus
+        self.retention_seconds = retention_seconds
+        self.max_entries = max_entries
+        self._pending: "OrderedDict[int, _PendingCommand]" = OrderedDict()
+        self.stats = {"tracked": 0, "resolved": 0, "timeouts": 0, "expired": 0}
+
+    def track(self, msg_id: int, command: str) -> asyncio.Future:
+        """登记一条已发送的指令，返回其响应 Future"""
+        self._prune()
+        entry = _PendingCommand(msg_id, command, time.time())
+        self._pending[msg_id] = entry
+        self.stats["tracked"] += 1
+        return entry.future
+
+    def resolve(self, message: Any) -> bool:
+        """游戏 Bot 消息 (新消息或编辑) 回复了已登记的指令时完成对应 Future"""
+        reply_to_id = getattr(message, "reply_to_message_id", None)
+        if reply_to_id is None: return False
+        entry = self._pending.get(reply_to_id)
+        # 已完成的登记保留到过期清理，便于稍后调用 wait_for 的插件仍能拿到结果
+        if entry is None or entry.future.done(): return False
+        entry.future.set_result(message)
+        self.stats["resolved"] += 1
+        logger.debug(f"【指令关联】指令 '{entry.command[:30]}' (MsgID: {reply_to_id}) 已收到回复，用时 {time.time() - entry.sent_at:.1f} 秒。")
+        if self.event_bus:
+            asyncio.create_task(self.event_bus.emit("game_command_response", message, entry.command))
+        return True
+
+    async def wait_for(self, msg_id: int, timeout: float) -> Optional[Any]:
+        """等待指定 MsgID 的回复，超时或未登记返回 None"""
+        entry = self._pending.get(msg_id)
+        if entry is None: return None
+        try:
+            return await asyncio.wait_for(asyncio.shield(entry.future), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            self.discard(msg_id)
+            return None
+        except asyncio.CancelledError:
+            if entry.future.cancelled(): return None # 登记已被清理/丢弃
+            raise
+
+    def discard(self, msg_id: int):
+        entry = self._pending.pop(msg_id, None)
+        if entry and not entry.future.done(): entry.future.cancel()
+
+    def _prune(self):
+        """丢弃超过保留时间或超出容量的旧登记"""
+        cutoff = time.time() - self.retention_seconds
+        while self._pending:
+            msg_id, entry = next(iter(self._pending.items()))
+            if entry.sent_at >= cutoff and len(self._pending) < self.max_entries: break
+            self._pending.popitem(last=False)
+            if not entry.future.done(): entry.future.cancel()
+            self.stats["expired"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        waiting = sum(1 for entry in self._pending.values() if not entry.future.done())
+        return {"pending": waiting, **self.stats}
@@ -0,0 +1,194 @@
+import asyncio
+import re
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from core.logger import logger
+
+# --- 优先级通道 (按出队顺序排列) ---
+PRIORITY_URGENT = "urgent"   # 限时响应: 魔君事件、玄骨考核作答等
+PRIORITY_NORMAL = "normal"   # 普通指令 (默认)
+PRIORITY_BULK = "bulk"       # 批量/可延后: 药园、观星台等指令序列
+PRIORITY_LANES = (PRIORITY_URGENT, PRIORITY_NORMAL, PRIORITY_BULK)
+
+# 各通道默认有效期 (秒)，超过有效期仍未发出的指令将被丢弃
+DEFAULT_LANE_TTL = {
+    PRIORITY_URGENT: 90,
+    PRIORITY_NORMAL: 1800,
+    PRIORITY_BULK: 3600,
+}
+
+WAIT_SAMPLE_SIZE = 200 # 每个通道保留的等待时间样本数
+
+_LEGACY_REPLY_SUFFIX = re.compile(r" --reply_to (\d+)$") # 旧的字符串协议: "<指令> --reply_to <MsgID>"
+
+
+class GameCommand:
+    """
+    结构化的游戏指令。
+    text: 实际发送的文本；reply_to: 需要回复的 MsgID；priority: urgent / normal / bulk；
+    deadline: time.monotonic() 截止时间点 (None 时入队使用通道默认有效期)；origin: 发起的插件名。
+    """
+    __slots__ = ("text", "reply_to", "priority", "deadline", "origin", "retry_count",
+                 "correlation_id", "enqueued_at", "sent_future")
+
+    def __init__(self, text: str, reply_to: int | None = None, priority: str = PRIORITY_NORMAL,
+                 deadline: float | None = None, origin: str | None = None, correlation_id: str | None = None):
+        self.text = text
+        self.reply_to = reply_to
+        self.priority = priority
+        self.deadline = deadline
+        self.origin = origin
+        self.retry_count = 0
+        self.correlation_id = correlation_id or uuid.uuid4().hex[:12]
+        self.enqueued_at = time.monotonic()
+        self.sent_future: asyncio.Future | None = None # 可选: 发出后以 Message 完成，被丢弃/失败时以 None 完成
+
+    @classmethod
+    def from_text(cls, raw: str, **kwargs) -> "GameCommand":
+        """兼容旧的字符串形式，仅在入队时解析一次 ' --reply_to <id>' 后缀"""
+        match = _LEGACY_REPLY_SUFFIX.search(raw)
+        if match:
+            return cls(raw[:match.start()].strip(), reply_to=int(match.group(1)), **kwargs)
+        return cls(raw, **kwargs)
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"GameCommand({self.text!r}, reply_to={self.reply_to}, priority={self.priority}, origin={self.origin}, id={self.correlation_id})"
+
+    def settle(self, sent_message: Any = None):
+        """通知等待方指令的最终结果 (已发出的 Message 或 None)"""
+        if self.sent_future is not None and not self.sent_future.done():
+            self.sent_future.set_result(sent_message)
+
+    def is_expired(self, now: float | None = None) -> bool:
+        if self.deadline is None: return False
+        return (now if now is not None else time.monotonic()) > self.deadline
+
+    def waited(self, now: float | None = None) -> float:
+        return (now if now is not None else time.monotonic()) - self.enqueued_at
+
+
+class _LaneStats:
+    __slots__ = ("enqueued", "sent", "expired", "requeued", "max_wait", "waits", "sent_by_origin")
+
+    def __init__(self):
+        self.enqueued = 0; self.sent = 0; self.expired = 0; self.requeued = 0
+        self.sent_by_origin: Dict[str, int] = {}
+        self.max_wait = 0.0
+        self.waits: Deque[float] = deque(maxlen=WAIT_SAMPLE_SIZE)
+
+
+class PriorityCommandQueue:
+    """
+    多通道游戏指令队列。
+    出队时总是先取最高优先级通道的指令 (同通道内 FIFO)，并丢弃已过期的指令。
+    """
+    def __init__(self, lane_ttl: Optional[Dict[str, float]] = None):
+        self._lanes: Dict[str, Deque[GameCommand]] = {lane: deque() for lane in PRIORITY_LANES}
+        self._stats: Dict[str, _LaneStats] = {lane: _LaneStats() for lane in PRIORITY_LANES}
+        self._lane_ttl = dict(DEFAULT_LANE_TTL)
+        if isinstance(lane_ttl, dict):
+            for lane, ttl in lane_ttl.items():
+                if lane in self._lane_ttl:
+                    self._lane_ttl[lane] = float(ttl) if ttl else None
+        self._not_empty = asyncio.Event()
+
+    @staticmethod
+    def normalize_priority(priority: str | None) -> str:
+        if priority in PRIORITY_LANES: return priority
+        if priority is not None:
+            logger.warning(f"【消息队列】未知的优先级 '{priority}'，按 '{PRIORITY_NORMAL}' 处理。")
+        return PRIORITY_NORMAL
+
+    def put_nowait(self, item: GameCommand, ttl: float | None = None) -> GameCommand:
+        """
+        加入队列。
+        item.deadline 为空时按 ttl (秒) 计算截止时间，ttl 也未提供时使用通道默认有效期。
+        """
+        lane = item.priority = self.normalize_priority(item.priority)
+        item.enqueued_at = time.monotonic()
+        if item.deadline is None:
+            if ttl is None: ttl = self._lane_ttl.get(lane)
+            item.deadline = item.enqueued_at + ttl if ttl else None
+        self._lanes[lane].append(item)
+        self._stats[lane].enqueued += 1
+        self._not_empty.set()
+        return item
+
+    def requeue(self, item: GameCommand):
+        """将发送失败的指令放回其通道队首 (保持原截止时间)"""
+        self._lanes[item.priority].appendleft(item)
+        self._stats[item.priority].requeued += 1
+        self._not_empty.set()
+
+    def _pop_next(self) -> GameCommand | None:
+        now = time.monotonic()
+        for lane in PRIORITY_LANES:
+            queue = self._lanes[lane]
+            while queue:
+                item = queue.popleft()
+                if item.is_expired(now):
+                    self._stats[lane].expired += 1
+                    logger.warning(f"【消息队列】指令 '{item.text[:30]}...' ({lane}) 已超过截止时间 (等待 {item.waited(now):.1f} 秒)，丢弃。")
+                    item.settle(None)
+                    continue
+                return item
+        return None
+
+    async def get(self) -> GameCommand:
+        """等待并取出下一条未过期的最高优先级指令"""
+        while True:
+            item = self._pop_next()
+            if item is not None: return item
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+    def mark_sent(self, item: GameCommand):
+        """记录指令实际发出，用于统计等待时间"""
+        waited = item.waited()
+        stats = self._stats[item.priority]
+        stats.sent += 1
+        origin = item.origin or "unknown"
+        stats.sent_by_origin[origin] = stats.sent_by_origin.get(origin, 0) + 1
+        stats.waits.append(waited)
+        if waited > stats.max_wait: stats.max_wait = waited
+
+    def qsize(self, priority: str | None = None) -> int:
+        if priority is not None: return len(self._lanes.get(priority, ()))
+        return sum(len(q) for q in self._lanes.values())
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def clear(self) -> int:
+        dropped = self.qsize()
+        for queue in self._lanes.values():
+            for item in queue: item.settle(None)
+            queue.clear()
+        self._not_empty.clear()
+        return dropped
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """返回各通道的队列深度与等待时间统计"""
+        now = time.monotonic()
+        result = {}
+        for lane in PRIORITY_LANES:
+            stats = self._stats[lane]; queue = self._lanes[lane]
+            waits = sorted(stats.waits)
+            p50 = waits[len(waits) // 2] if waits else 0.0
+            p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0
+            result[lane] = {
+                "depth": len(queue),
+                "oldest_wait": round(queue[0].waited(now), 2) if queue else 0.0,
+                "enqueued": stats.enqueued, "sent": stats.sent,
+                "expired": stats.expired, "requeued": stats.requeued,
+                "wait_p50": round(p50, 2), "wait_p95": round(p95, 2),
+                "wait_max": round(stats.max_wait, 2),
+                "sent_by_origin": dict(stats.sent_by_origin),
+            }
+        return result
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from core.logger import logger
+
+# --- 编辑合并模式 ---
+EDIT_MODE_OFF = "off"         # 每次编辑都立即分发 (旧行为)
+EDIT_MODE_SETTLE = "settle"   # 同一消息在静默 settle_seconds 后只分发最后一次编辑
+EDIT_MODE_CHANGE = "change"   # 仅当分类或提取字段与上次分发时不同才分发
+EDIT_MODES = (EDIT_MODE_OFF, EDIT_MODE_SETTLE, EDIT_MODE_CHANGE)
+
+SIGNATURE_CACHE_SIZE = 500 # 记录最近分发过的消息签名数
+
+DispatchFunc = Callable[[Any, bool, bool, Any], Awaitable[None]]
+
+
+class _PendingEdit:
+    __slots__ = ("message", "is_reply_to_me", "is_mentioning_me", "game_message", "first_at", "edits", "handle")
+
+    def __init__(self, first_at: float):
+        self.first_at = first_at
+        self.edits = 0
+        self.handle: Optional[asyncio.TimerHandle] = None
+        self.message = None; self.is_reply_to_me = False; self.is_mentioning_me = False; self.game_message = None
+
+
+class EditCoalescer:
+    """
+    游戏 Bot 编辑消息合并器。
+    游戏 Bot 会反复编辑同一条消息 (炼制进度、闭关结果等)，合并器按 (chat_id, message_id)
+    将连续编辑折叠为一次分发，避免各插件对每次编辑都重新解析全文。
+    """
+    def __init__(self, dispatch: DispatchFunc, mode: str = EDIT_MODE_SETTLE,
+                 settle_seconds: float = 1.5, max_delay: float = 10.0):
+        self.dispatch = dispatch
+        if mode not in EDIT_MODES:
+            logger.warning(f"【编辑合并】未知的模式 '{mode}'，使用 {EDIT_MODE_SETTLE}。")
+            mode = EDIT_MODE_SETTLE
+        self.mode = mode
+        self.settle_seconds = settle_seconds
+        self.max_delay = max_delay # 持续编辑时最迟在首次编辑后多少秒分发一次
+        self._pending: Dict[Tuple[int, int], _PendingEdit] = {}
+        self._signatures: "OrderedDict[Tuple[int, int], tuple]" = OrderedDict()
+        self._tasks = set()
+        self.stats = {"edits": 0, "dispatched": 0, "coalesced": 0, "unchanged": 0}
+
+    @staticmethod
+    def _key(message: Any) -> Tuple[int, int]:
+        chat = getattr(message, "chat", None)
+        return (chat.id if chat else 0, message.id)
+
+    @staticmethod
+    def _signature(game_message: Any) -> tuple:
+        return (game_message.text, game_message.categories, tuple(sorted(game_message.fields.items())))
+
+    def _remember(self, key: Tuple[int, int], signature: tuple):
+        self._signatures[key] = signature
+        self._signatures.move_to_end(key)
+        while len(self._signatures) > SIGNATURE_CACHE_SIZE: self._signatures.popitem(last=False)
+
+    def _is_unchanged(self, key: Tuple[int, int], game_message: Any) -> bool:
+        """与上次分发的内容相比没有变化 (change 模式只比较分类与字段)"""
+        last = self._signatures.get(key)
+        if last is None: return False
+        current = self._signature(game_message)
+        if self.mode == EDIT_MODE_CHANGE: return last[1:] == current[1:]
+        return last == current
+
+    def note_new(self, message: Any, game_message: Any):
+        """记录新消息的初始内容，作为后续编辑的比较基准"""
+        if self.mode != EDIT_MODE_OFF: self._remember(self._key(message), self._signature(game_message))
+
+    async def submit(self, message: Any, is_reply_to_me: bool, is_mentioning_me: bool, game_message: Any):
+        """提交一次编辑，按模式立即分发、丢弃或延后合并分发"""
+        self.stats["edits"] += 1
+        if self.mode == EDIT_MODE_OFF:
+            self.stats["dispatched"] += 1
+            await self.dispatch(message, is_reply_to_me, is_mentioning_me, game_message)
+            return
+        key = self._key(message)
+        if self.mode == EDIT_MODE_CHANGE:
+            if self._is_unchanged(key, game_message):
+                self.stats["unchanged"] += 1; return
+            self._remember(key, self._signature(game_message))
+            self.stats["dispatched"] += 1
+            await self.dispatch(message, is_reply_to_me, is_mentioning_me, game_message)
+            return
+
+        now = time.monotonic()
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._pending[key] = _PendingEdit(now)
+        else:
+            self.stats["coalesced"] += 1
+            if entry.handle: entry.handle.cancel()
+        entry.message = message; entry.is_reply_to_me = is_reply_to_me
+        entry.is_mentioning_me = is_mentioning_me; entry.game_message = game_message
+        entry.edits += 1
+        delay = min(self.settle_seconds, max(0.0, entry.first_at + self.max_delay - now))
+        entry.handle = asyncio.get_running_loop().call_later(delay, self._flush, key)
+
+    def _flush(self, key: Tuple[int, int]):
+        entry = self._pending.pop(key, None)
+        if entry is None: return
+        if self._is_unchanged(key, entry.game_message):
+            self.stats["unchanged"] += 1; return
+        self._remember(key, self._signature(entry.game_message))
+        self.stats["dispatched"] += 1
+        logger.debug(f"【编辑合并】消息 {key[1]} 的 {entry.edits} 次编辑已合并分发。")
+        task = asyncio.create_task(self.dispatch(entry.message, entry.is_reply_to_me, entry.is_mentioning_me, entry.game_message))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "settle_seconds": self.settle_seconds, "pending": len(self._pending), **self.stats}
@@ -14,6 +14,12 @@ from plugins.character_sync_plugin import parse_iso_datetime, format_local_time
 # 从 collections 导入 defaultdict
 from collections import defaultdict
 import copy # 导入 copy 模块
+import time
+import uuid
+from modules.local_cache import LocalTTLCache
+from modules.snapshot_diff import content_of, changed_fields, diff_inventory, diff_plots
+from modules.game_models import Inventory, LearnedRecipes, SectInfo, HerbGarden
+from modules.item_catalog import ItemCatalog
 
 logger = logging.getLogger("GameDataManager")
 
@@ -28,9 +34,43 @@ CHAR_RECIPES_KEY = "char:recipes:{}" # 已学配方 (TTL 中/长)
 CHAR_STAR_PLATFORM_KEY = "char:star_platform:{}" # 观星台 (TTL 短)
 # --- 新增结束 ---
 GAME_ITEMS_MASTER_KEY = "game:items:master" # 物品主数据 (TTL 长)
-GAME_SHOP_KEY = "game:shop:{}" # 商店数据 (TTL 长)
+GAME_SHOP_KEY = "game:shop:shared" # 商店数据 (所有账号相同，全局只存一份，TTL 长)
+# --- 新增: 跨进程刷新锁 (多个进程共用同一账号时只有一个调用 API) ---
+CHAR_REFRESH_LOCK_KEY = "char:refresh_lock:{}"
+# --- 新增: 最近一次成功同步的时间 (未变化的 Key 不重写，读取时用它更新数据的获取时间) ---
+CHAR_SYNCED_AT_KEY = "char:synced_at:{}"
+REFRESH_LOCK_POLL_INTERVAL = 0.5 # 等待其他进程刷新时的轮询间隔 (秒)
 # --- Key 定义结束 ---
 
+# --- 新增: 角色缓存的软 TTL (cache_ttl.*) 默认值与 Key 对应的数据类型 ---
+# 超过软 TTL 的数据仍会立即返回并在后台刷新 (stale-while-revalidate)，
+# Redis 实际过期时间 (硬 TTL) = 软 TTL × cache_refresh.hard_ttl_factor，只有超过硬 TTL 才阻塞等待 API。
+DEFAULT_CACHE_TTL = {
+    'status': 360, 'inventory': 1200, 'sect': 3600, 'garden': 360,
+    'pagoda': 86400, 'recipes': 43200, 'star_platform': 360
+}
+CHAR_KEY_DATA_TYPES = {
+    CHAR_STATUS_KEY: 'status', CHAR_INVENTORY_KEY: 'inventory', CHAR_SECT_KEY: 'sect',
+    CHAR_GARDEN_KEY: 'garden', CHAR_PAGODA_KEY: 'pagoda', CHAR_RECIPES_KEY: 'recipes',
+    CHAR_STAR_PLATFORM_KEY: 'star_platform',
+}
+FETCHED_AT_FIELD = "_internal_fetched_at" # 写入缓存时的 Unix 时间戳
+# --- 新增: 全局共享数据 (物品主数据 / 商店) ---
+# 仅当锁仍由自己持有时删除 (锁过期后被其他进程重新获取时不误删)
+RELEASE_LOCK_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+SHARED_REFRESH_LEASE_KEY = "game:refresh_lease:{}" # 全局数据刷新租约 (值为持有实例 ID)
+GLOBAL_DATA_UPDATED_EVENT = "global_data_updated" # (名称, 版本)
+# --- 新增结束 ---
+CHAR_CACHE_KEYS = tuple(CHAR_KEY_DATA_TYPES) # 一次角色刷新会写入的全部 Key 模板
+
+# --- 新增: 角色数据变化事件 (同步时与上次快照比较后触发) ---
+CHARACTER_DATA_CHANGED_EVENT = "character_data_changed"     # (user_id, data_type, {字段: (旧值, 新值)})
+INVENTORY_CHANGED_EVENT = "inventory_changed"               # (user_id, item_id, 名称, 旧数量, 新数量)
+GARDEN_PLOT_CHANGED_EVENT = "garden_plot_changed"           # (user_id, plot_id, 旧地块, 新地块)
+STAR_PLATFORM_PLOT_CHANGED_EVENT = "star_platform_plot_changed" # (user_id, plot_id, 旧地块, 新地块)
+CULTIVATION_STAGE_CHANGED_EVENT = "cultivation_stage_changed"   # (user_id, 旧境界, 新境界)
+# --- 新增结束 ---
+
 # --- 辅助函数：格式化 TTL ---
 def format_ttl_internal(ttl_seconds: int | None) -> str:
     if ttl_seconds is None or ttl_seconds < 0: return "未知或已过期"
@@ -46,6 +86,33 @@ class GameDataManager:
         self.http = context.http
         self.config = context.config
         self._item_master_cache: Dict[str, Dict] = {} # 物品主数据内存缓存
+        # --- 新增: 物品目录 (名称 <-> ID 索引)，主数据版本变化时重建 ---
+        self._item_master_version: Any = None
+        self._item_catalog: Optional[ItemCatalog] = None
+        self.item_catalog_stats = {"builds": 0, "hits": 0}
+        # --- 新增: 全局数据通过 Redis 租约协调刷新，更新后经频道通知其他实例 ---
+        self.shared_update_channel = self.config.get("shared_data.update_channel", "game_data_updated")
+        self.shared_stats = {"fetches": 0, "skipped_fresh": 0, "lease_waits": 0, "notifications": 0}
+        # --- 新增: 单飞刷新 (同一 key 的并发刷新共享一个进行中的任务) ---
+        self._inflight_refreshes: Dict[Any, asyncio.Future] = {}
+        self.refresh_stats = {"started": 0, "joined": 0, "lock_waits": 0}
+        # --- 新增: 按数据类型统计缓存命中 / 过期 / 未命中 ---
+        self.cache_stats: Dict[str, Dict[str, Any]] = defaultdict(
+            lambda: {"hits": 0, "stale_hits": 0, "misses": 0, "too_old": 0, "background_refreshes": 0, "max_staleness": 0.0}
+        )
+        self._background_tasks = set()
+        # --- 新增: 进程内 L1 缓存 (已解码对象)，写入时失效，并通过 Redis 频道通知其他进程 ---
+        self.l1 = LocalTTLCache(
+            max_entries=self.config.get("cache_refresh.l1_max_entries", 256),
+            ttl_seconds=self.config.get("cache_refresh.l1_ttl_seconds", 10),
+        )
+        self.invalidation_channel = self.config.get("cache_refresh.invalidation_channel", "cache_invalidate")
+        self._instance_id = uuid.uuid4().hex # 忽略自己发出的失效通知；也作为刷新锁 / 租约的持有者标识
+        self._model_cache: Dict[str, Tuple[Any, Any]] = {} # key -> (快照标记, 解码后的模型)，见 _snapshot_stamp
+        # --- 新增: 差异同步 ---
+        self._last_snapshots: Dict[int, Dict[str, Dict]] = {} # user_id -> 上次同步写入的 {Key: 数据}
+        self.sync_stats = {"syncs": 0, "keys_written": 0, "keys_unchanged": 0, "bytes_written": 0, "events": 0,
+                           "api_ms_total": 0.0, "process_ms_total": 0.0, "last_api_ms": 0.0, "last_process_ms": 0.0}
 
     async def _get_redis_client(self):
         """获取 Redis 客户端，带重连尝试"""
@@ -61,31 +128,136 @@ class GameDataManager:
                 logger.error(f"【数据管理器】Redis 重连时出错: {e}")
         return client
 
+    # --- 新增: 单飞刷新 ---
+    async def _single_flight(self, key: Any, factory) -> Any:
+        """同一 key 同时只运行一个刷新，并发调用者等待并共享其结果"""
+        future = self._inflight_refreshes.get(key)
+        if future is not None:
+            self.refresh_stats["joined"] += 1
+            logger.debug(f"【数据管理器】刷新 {key} 已在进行中，等待其结果。")
+            return await asyncio.shield(future)
+        self.refresh_stats["started"] += 1
+        future = asyncio.ensure_future(factory())
+        self._inflight_refreshes[key] = future
+        future.add_done_callback(lambda _: self._inflight_refreshes.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _release_lock(self, redis_client, lock_key: str):
+        """原子地释放本进程持有的锁 / 租约 (值为 _instance_id)"""
+        try:
+            released = await redis_client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, self._instance_id)
+            if not released: logger.warning(f"【数据管理器】锁 {lock_key} 已过期或被其他进程持有，未删除。")
+        except Exception as e: logger.warning(f"【数据管理器】释放锁 {lock_key} 失败: {e}")
+
+    async def _refresh_with_redis_lock(self, user_id: int, username: str) -> Optional[Dict[str, Any]]:
+        """
+        跨进程去重: 抢到 Redis 锁的进程调用 API，其余进程等待锁释放后直接使用其写入的缓存
+        (此时返回空字典，调用方需从 Redis 读取)。
+        """
+        redis_client = await self._get_redis_client()
+        if not redis_client or not self.config.get("cache_refresh.redis_lock", False):
+            return await self._fetch_and_store_character_data(user_id, username)
+        lock_key = CHAR_REFRESH_LOCK_KEY.format(user_id)
+        lock_ttl = self.config.get("cache_refresh.lock_ttl", 30)
+        try:
+            acquired = await redis_client.set(lock_key, self._instance_id, ex=lock_ttl, nx=True)
+        except Exception as e:
+            logger.warning(f"【数据管理器】获取刷新锁 {lock_key} 失败: {e}，直接刷新。")
+            return await self._fetch_and_store_character_data(user_id, username)
+        if acquired:
+            try:
+                return await self._fetch_and_store_character_data(user_id, username)
+            finally:
+                await self._release_lock(redis_client, lock_key)
+
+        self.refresh_stats["lock_waits"] += 1
+        logger.info(f"【数据管理器】用户 {user_id} 的缓存正由其他进程刷新，等待其完成...")
+        deadline = asyncio.get_running_loop().time() + lock_ttl
+        while asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(REFRESH_LOCK_POLL_INTERVAL)
+            try:
+                if not await redis_client.exists(lock_key):
+                    return {} if await redis_client.exists(CHAR_STATUS_KEY.format(user_id)) else None
+            except Exception as e:
+                logger.warning(f"【数据管理器】检查刷新锁 {lock_key} 时出错: {e}"); break
+        logger.warning(f"【数据管理器】等待其他进程刷新用户 {user_id} 超时，自行刷新。")
+        return await self._fetch_and_store_character_data(user_id, username)
+    # --- 新增结束 ---
+
+    # --- 新增: L1 缓存失效 ---
+    async def start_invalidation_listener(self):
+        """订阅缓存失效频道 (其他进程写入 Redis 缓存后通知本进程丢弃 L1 中的旧对象) 及全局数据更新频道"""
+        if self.shared_update_channel:
+            await self.redis.subscribe(self.shared_update_channel, self._handle_shared_update)
+        if not self.l1.enabled or not self.invalidation_channel: return
+        await self.redis.subscribe(self.invalidation_channel, self._handle_invalidation)
+
+    async def _handle_invalidation(self, channel: str, data: Any):
+        if not isinstance(data, dict) or data.get("origin") == self._instance_id: return
+        keys = [key for key in data.get("keys", []) if isinstance(key, str)]
+        self.l1.invalidate(keys)
+        if GAME_ITEMS_MASTER_KEY in keys: self._item_master_cache = {}; self._item_master_version = None # 下次读取 Redis 中的新版本
+        logger.debug(f"【数据管理器】收到其他进程的缓存失效通知: {keys}")
+
+    def _drop_local_copies(self, key: str):
+        """丢弃本进程中 key 的已解码副本 (L1 / 物品主数据内存缓存)"""
+        self.l1.invalidate([key])
+        if key == GAME_ITEMS_MASTER_KEY: self._item_master_cache = {}; self._item_master_version = None
+
+    async def _handle_shared_update(self, channel: str, data: Any):
+        if not isinstance(data, dict) or data.get("origin") == self._instance_id: return
+        key = data.get("key")
+        if not isinstance(key, str): return
+        self._drop_local_copies(key)
+        self.shared_stats["notifications"] += 1
+        logger.info(f"【数据管理器】其他实例已更新全局数据 {data.get('name')} (版本: {data.get('version')})。")
+        if self.context.event_bus: await self.context.event_bus.emit(GLOBAL_DATA_UPDATED_EVENT, data.get("name"), data.get("version"))
+
+    async def _invalidate_keys(self, keys: List[str]):
+        """丢弃本进程 L1 中的 keys 并通知其他进程"""
+        self.l1.invalidate(keys)
+        if self.l1.enabled and self.invalidation_channel:
+            await self.redis.publish(self.invalidation_channel, {"origin": self._instance_id, "keys": keys})
+    # --- 新增结束 ---
+
     # --- 数据更新核心方法 (内部调用或由同步插件调用) ---
 
-    async def _update_cache_from_api_internal(self, user_id: int, username: str) -> bool:
-        """【内部核心】调用 /api/cultivator 并更新所有相关的 Redis 缓存"""
+    async def _update_cache_from_api_internal(self, user_id: int, username: str) -> Optional[Dict[str, Any]]:
+        """
+        【内部核心】刷新用户的全部角色缓存 (进程内单飞，可选 Redis 锁跨进程去重)。
+        成功时返回本次写入的 {Redis Key: 数据对象} (等待的调用者共享同一份)，失败返回 None。
+        """
+        return await self._single_flight(("character", user_id), lambda: self._refresh_with_redis_lock(user_id, username))
+
+    async def _fetch_and_store_character_data(self, user_id: int, username: str) -> Optional[Dict[str, Any]]:
+        """调用 /api/cultivator 并更新所有相关的 Redis 缓存，返回写入的 {Key: 数据对象}"""
         logger.debug(f"【数据管理器】内部更新开始: 用户 {user_id} ({username})")
         redis_client = await self._get_redis_client()
         if not redis_client:
             logger.error(f"【数据管理器】内部更新失败 (用户 {user_id})：无法连接 Redis。")
-            return False
+            return None
 
         try:
+            api_started = time.perf_counter()
             raw_data = await self.http.get_cultivator_data(username)
             if not raw_data:
                 logger.error(f"【数据管理器】内部更新失败 (用户 {user_id})：API 请求失败或返回空数据。")
-                return False
+                return None
+            process_started = time.perf_counter()
 
             now_aware_dt = datetime.now().astimezone()
             now_aware_str = now_aware_dt.strftime("%Y-%m-%d %H:%M:%S %Z%z")
 
-            DEFAULT_TTL = {
-                'status': 360, 'inventory': 1200, 'sect': 3600, 'garden': 360,
-                'pagoda': 86400, 'recipes': 43200, 'star_platform': 360 # <-- 添加观星台默认 TTL
-            }
+            # --- 修改: Redis 过期时间使用硬 TTL，并为每份数据记录获取时间 ---
+            fetched_at = now_aware_dt.timestamp()
             def get_ttl(key_type: str) -> int:
-                return self.config.get(f"cache_ttl.{key_type}", DEFAULT_TTL.get(key_type, 600))
+                return self._hard_ttl(key_type)
+            written: Dict[str, Dict] = {} # 本次写入的数据对象，刷新后直接返回给调用方
+            written_ttls: Dict[str, int] = {}
+            previous = self._last_snapshots.get(user_id, {})
+            changed_keys: List[str] = []; bytes_written = 0
+            expire_checks: List[Tuple[int, str]] = []; command_count = 0 # (pipeline 结果下标, Key): 仅续期的 Key
+            # --- 修改结束 ---
 
             status_ttl = get_ttl('status')
             inv_ttl = get_ttl('inventory')
@@ -96,6 +268,17 @@ class GameDataManager:
             star_platform_ttl = get_ttl('star_platform') # <-- 获取观星台 TTL
 
             async with redis_client.pipeline(transaction=False) as pipe:
+                def store(key: str, data: Dict, ttl: int):
+                    nonlocal bytes_written, command_count
+                    data[FETCHED_AT_FIELD] = fetched_at
+                    written[key] = data; written_ttls[key] = ttl
+                    # 与上次同步内容相同时只延长过期时间，不重写整份 JSON (Key 已不存在时执行后补写，见下方)
+                    if key in previous and content_of(previous[key]) == content_of(data):
+                        pipe.expire(key, ttl); expire_checks.append((command_count, key)); command_count += 1; return
+                    payload = json.dumps(data, ensure_ascii=False)
+                    pipe.set(key, payload, ex=ttl); command_count += 1
+                    changed_keys.append(key); bytes_written += len(payload)
+
                 executed_pipe = False
 
                 # --- 1. 处理角色核心状态 (移除 herb_garden, pagoda_progress 初始化) ---
@@ -174,7 +357,7 @@ class GameDataManager:
                         # status_data[key] = raw_data[key]
 
                 status_key = CHAR_STATUS_KEY.format(user_id)
-                pipe.set(status_key, json.dumps(status_data, ensure_ascii=False), ex=status_ttl)
+                store(status_key, status_data, status_ttl)
                 logger.debug(f"【数据管理器】准备更新 {status_key} (TTL: ~{status_ttl}s)")
                 executed_pipe = True
 
@@ -182,7 +365,7 @@ class GameDataManager:
                 inventory_data_processed = await self._process_inventory_data(raw_data.get("inventory"), now_aware_str)
                 if inventory_data_processed:
                     inv_key = CHAR_INVENTORY_KEY.format(user_id)
-                    pipe.set(inv_key, json.dumps(inventory_data_processed, ensure_ascii=False), ex=inv_ttl)
+                    store(inv_key, inventory_data_processed, inv_ttl)
                     logger.debug(f"【数据管理器】准备更新 {inv_key} (TTL: ~{inv_ttl}s)")
                     executed_pipe = True
                 else: logger.warning("【数据管理器】API 返回的背包数据为空或处理失败，未更新背包缓存。")
@@ -199,7 +382,7 @@ class GameDataManager:
                 if sect_data.get("sect_leave_cooldown_until"):
                      parsed_dt_s = parse_iso_datetime(sect_data["sect_leave_cooldown_until"]); sect_data["sect_leave_cooldown_until_formatted"] = format_local_time(parsed_dt_s)
                 sect_key = CHAR_SECT_KEY.format(user_id)
-                pipe.set(sect_key, json.dumps(sect_data, ensure_ascii=False), ex=sect_ttl)
+                store(sect_key, sect_data, sect_ttl)
                 logger.debug(f"【数据管理器】准备更新 {sect_key} (TTL: ~{sect_ttl}s)")
                 executed_pipe = True
 
@@ -207,7 +390,7 @@ class GameDataManager:
                 if "herb_garden" in processed_nested_data and processed_nested_data["herb_garden"] is not None:
                      garden_data_to_store = { "_internal_last_updated": now_aware_str, **processed_nested_data["herb_garden"] }
                      garden_key = CHAR_GARDEN_KEY.format(user_id)
-                     pipe.set(garden_key, json.dumps(garden_data_to_store, ensure_ascii=False), ex=garden_ttl)
+                     store(garden_key, garden_data_to_store, garden_ttl)
                      logger.debug(f"【数据管理器】准备更新 {garden_key} (TTL: ~{garden_ttl}s)")
                      executed_pipe = True
                 else: logger.info("【数据管理器】API 未返回药园数据或解析失败/为None，不更新药园缓存。")
@@ -230,7 +413,7 @@ class GameDataManager:
                          pagoda_data_to_store["claimed_floors"] = []
 
                      pagoda_key = CHAR_PAGODA_KEY.format(user_id)
-                     pipe.set(pagoda_key, json.dumps(pagoda_data_to_store, ensure_ascii=False), ex=pagoda_ttl)
+                     store(pagoda_key, pagoda_data_to_store, pagoda_ttl)
                      logger.debug(f"【数据管理器】准备更新 {pagoda_key} (TTL: ~{pagoda_ttl}s)")
                      executed_pipe = True
                 else: logger.info("【数据管理器】API 未返回闯塔进度数据或解析失败/为None，不更新闯塔缓存。")
@@ -244,7 +427,7 @@ class GameDataManager:
                 if isinstance(recipes_list_processed, list):
                      recipes_data_to_store = { "_internal_last_updated": now_aware_str, "known_ids": recipes_list_processed }
                      recipes_key = CHAR_RECIPES_KEY.format(user_id)
-                     pipe.set(recipes_key, json.dumps(recipes_data_to_store, ensure_ascii=False), ex=recipes_ttl)
+                     store(recipes_key, recipes_data_to_store, recipes_ttl)
                      logger.debug(f"【数据管理器】准备更新 {recipes_key} (TTL: ~{recipes_ttl}s)")
                      executed_pipe = True
                 else: logger.warning("【数据管理器】API 未返回已学配方数据或解析失败，未更新配方缓存。")
@@ -253,7 +436,7 @@ class GameDataManager:
                 if "star_platform" in processed_nested_data and processed_nested_data["star_platform"] is not None:
                      star_platform_data_to_store = { "_internal_last_updated": now_aware_str, **processed_nested_data["star_platform"] }
                      star_platform_key = CHAR_STAR_PLATFORM_KEY.format(user_id)
-                     pipe.set(star_platform_key, json.dumps(star_platform_data_to_store, ensure_ascii=False), ex=star_platform_ttl)
+                     store(star_platform_key, star_platform_data_to_store, star_platform_ttl)
                      logger.debug(f"【数据管理器】准备更新 {star_platform_key} (TTL: ~{star_platform_ttl}s)")
                      executed_pipe = True
                 else: logger.info("【数据管理器】API 未返回观星台数据或解析失败/为None，不更新观星台缓存。")
@@ -261,21 +444,77 @@ class GameDataManager:
 
                 # --- 执行 Pipeline ---
                 if executed_pipe:
-                    await pipe.execute()
-                    logger.info(f"【数据管理器】用户 {user_id} ({username}) 的缓存更新完成。")
-                    return True
+                    pipe.set(CHAR_SYNCED_AT_KEY.format(user_id), fetched_at, ex=max(written_ttls.values()))
+                    results = await pipe.execute()
+                    # --- 修改: EXPIRE 返回 0 说明 Key 已过期/被淘汰 (API 长时间不可用、Redis 重启等)，需重新写入 ---
+                    missing_keys = [key for index, key in expire_checks if not results[index]]
+                    # 内容未变化的 Key: 已解码的模型仍然有效，只更新其快照标记，避免下次读取时重新解码
+                    for _, key in expire_checks:
+                        cached_model = self._model_cache.get(key)
+                        if cached_model is not None: self._model_cache[key] = (fetched_at, cached_model[1])
+                    if missing_keys:
+                        async with redis_client.pipeline(transaction=False) as rewrite_pipe:
+                            for key in missing_keys:
+                                payload = json.dumps(written[key], ensure_ascii=False)
+                                rewrite_pipe.set(key, payload, ex=written_ttls[key]); bytes_written += len(payload)
+                            await rewrite_pipe.execute()
+                        changed_keys.extend(missing_keys)
+                        logger.info(f"【数据管理器】用户 {user_id} 的 {len(missing_keys)} 个未变化 Key 已不在 Redis 中，已重新写入: {missing_keys}")
+                    # --- 修改结束 ---
+                    if changed_keys: await self._invalidate_keys(changed_keys)
+                    # 新写入的对象直接放入 L1，后续读取无需再访问 Redis
+                    for key, data in written.items():
+                        self.l1.set(key, (data, time.monotonic() + written_ttls[key], now_aware_str), ttl=written_ttls[key])
+                    self._last_snapshots[user_id] = dict(written)
+                    events = await self._emit_change_events(user_id, previous, written, changed_keys) if previous else 0
+                    # --- 新增: 同步开销统计 ---
+                    api_ms = (process_started - api_started) * 1000; process_ms = (time.perf_counter() - process_started) * 1000
+                    stats = self.sync_stats
+                    stats["syncs"] += 1; stats["events"] += events; stats["bytes_written"] += bytes_written
+                    stats["keys_written"] += len(changed_keys); stats["keys_unchanged"] += len(written) - len(changed_keys)
+                    stats["api_ms_total"] += api_ms; stats["process_ms_total"] += process_ms
+                    stats["last_api_ms"] = round(api_ms, 1); stats["last_process_ms"] = round(process_ms, 1)
+                    logger.info(
+                        f"【数据管理器】用户 {user_id} ({username}) 的缓存更新完成: 写入 {len(changed_keys)}/{len(written)} 个 Key "
+                        f"({bytes_written} 字节)，触发 {events} 个变化事件，API {api_ms:.0f}ms / 处理 {process_ms:.0f}ms。"
+                    )
+                    return written
                 else:
                     logger.warning(f"【数据管理器】用户 {user_id} ({username}) 无任何缓存需要更新?")
-                    return False
+                    return None
 
         except Exception as e:
             logger.error(f"【数据管理器】内部更新缓存时发生意外错误: {e}", exc_info=True)
-            return False
+            return None
+
+    # --- 新增: 变化事件 ---
+    async def _emit_change_events(self, user_id: int, previous: Dict[str, Dict], current: Dict[str, Dict], changed_keys: List[str]) -> int:
+        """比较上次快照与本次数据，按变化触发细粒度事件，返回触发的事件数"""
+        event_bus = self.context.event_bus
+        if not event_bus: return 0
+        count = 0
+        for key in changed_keys:
+            old, new = previous.get(key), current.get(key)
+            data_type = CHAR_KEY_DATA_TYPES.get(key.rpartition(":")[0] + ":{}")
+            fields = changed_fields(old, new)
+            if not fields: continue
+            await event_bus.emit(CHARACTER_DATA_CHANGED_EVENT, user_id, data_type, fields); count += 1
+            if data_type == "inventory":
+                for item_id, name, old_quantity, new_quantity in diff_inventory(old, new):
+                    await event_bus.emit(INVENTORY_CHANGED_EVENT, user_id, item_id, name, old_quantity, new_quantity); count += 1
+            elif data_type in ("garden", "star_platform"):
+                event_name = GARDEN_PLOT_CHANGED_EVENT if data_type == "garden" else STAR_PLATFORM_PLOT_CHANGED_EVENT
+                for plot_id, old_plot, new_plot in diff_plots(old, new):
+                    await event_bus.emit(event_name, user_id, plot_id, old_plot, new_plot); count += 1
+            elif data_type == "status" and "cultivation_level" in fields:
+                await event_bus.emit(CULTIVATION_STAGE_CHANGED_EVENT, user_id, *fields["cultivation_level"]); count += 1
+        return count
+    # --- 新增结束 ---
 
     # ... (update_cache_from_api, _process_inventory_data, update_item_master_cache, update_shop_cache 保持不变) ...
     async def update_cache_from_api(self, user_id: int, username: str) -> bool:
         """【公开】调用 /api/cultivator 并更新缓存"""
-        return await self._update_cache_from_api_internal(user_id, username)
+        return await self._update_cache_from_api_internal(user_id, username) is not None
 
     async def _process_inventory_data(self, inventory_data: Optional[Dict], updated_time_str: str) -> Optional[Dict]:
         """【内部】处理来自 API 的 inventory 字典"""
@@ -313,8 +552,73 @@ class GameDataManager:
         logger.debug(f"【数据管理器】背包数据处理完成，共 {total_items_count} 种物品。")
         return full_inventory_data
 
-    async def update_item_master_cache(self) -> bool:
-        """【公开】调用 /api/all_items 并更新 game:items:master 缓存"""
+    # --- 新增: 全局共享数据刷新 (租约 + 更新通知) ---
+    async def _refresh_global(self, name: str, key: str, fetch_and_store, fresh_within: Optional[float]) -> bool:
+        """
+        刷新全局数据 (所有实例共用同一个 Key):
+        fresh_within 秒内已由任一实例刷新过则跳过；否则通过 Redis 租约保证只有一个实例调用 API，
+        其余实例等待租约释放后直接使用其写入的数据。fresh_within 为 None 时总是刷新。
+        """
+        redis_client = await self._get_redis_client()
+        if not redis_client: return False
+        if fresh_within is not None and await self._global_data_fresh(redis_client, key, fresh_within):
+            self.shared_stats["skipped_fresh"] += 1
+            self._drop_local_copies(key) # 本进程的副本可能早于 Redis 中的版本
+            logger.info(f"【数据管理器】全局数据 {name} 在 {fresh_within}s 内已刷新过，跳过 API 调用。")
+            return True
+        lease_key = SHARED_REFRESH_LEASE_KEY.format(name)
+        lease_ttl = self.config.get("shared_data.lease_ttl", 60)
+        try:
+            acquired = await redis_client.set(lease_key, self._instance_id, ex=lease_ttl, nx=True)
+        except Exception as e:
+            logger.warning(f"【数据管理器】获取全局数据租约 {lease_key} 失败: {e}，直接刷新。"); acquired = True
+        if acquired:
+            self.shared_stats["fetches"] += 1
+            try:
+                return await fetch_and_store()
+            finally:
+                await self._release_lock(redis_client, lease_key)
+
+        self.shared_stats["lease_waits"] += 1
+        logger.info(f"【数据管理器】全局数据 {name} 正由其他实例刷新，等待其完成...")
+        deadline = asyncio.get_running_loop().time() + lease_ttl
+        while asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(REFRESH_LOCK_POLL_INTERVAL)
+            try:
+                if not await redis_client.exists(lease_key):
+                    self._drop_local_copies(key)
+                    return bool(await redis_client.exists(key))
+            except Exception as e:
+                logger.warning(f"【数据管理器】检查全局数据租约 {lease_key} 时出错: {e}"); break
+        logger.warning(f"【数据管理器】等待其他实例刷新全局数据 {name} 超时，自行刷新。")
+        self.shared_stats["fetches"] += 1
+        return await fetch_and_store()
+
+    async def _global_data_fresh(self, redis_client, key: str, fresh_within: float) -> bool:
+        try: data_json = await redis_client.get(key)
+        except Exception as e: logger.warning(f"【数据管理器】读取全局数据 {key} 失败: {e}"); return False
+        if not data_json: return False
+        try: age = self._snapshot_age(json.loads(data_json))
+        except json.JSONDecodeError: return False
+        return age is not None and age <= fresh_within
+
+    async def _announce_global_update(self, name: str, key: str, version: Any):
+        """写入全局数据后: 丢弃本进程副本，并通知其他实例"""
+        self.l1.invalidate([key])
+        if self.shared_update_channel:
+            await self.redis.publish(self.shared_update_channel, {"origin": self._instance_id, "name": name, "key": key, "version": version})
+        if self.context.event_bus: await self.context.event_bus.emit(GLOBAL_DATA_UPDATED_EVENT, name, version)
+    # --- 新增结束 ---
+
+    async def update_item_master_cache(self, force: bool = True) -> bool:
+        """
+        【公开】调用 /api/all_items 并更新 game:items:master 缓存 (并发调用共享同一次刷新)。
+        force=False 时，若任一实例在 shared_data.min_refresh_interval 内已刷新过则跳过。
+        """
+        fresh_within = None if force else self.config.get("shared_data.min_refresh_interval", 21600)
+        return await self._single_flight("item_master", lambda: self._refresh_global("item_master", GAME_ITEMS_MASTER_KEY, self._fetch_and_store_item_master, fresh_within))
+
+    async def _fetch_and_store_item_master(self) -> bool:
         logger.info("【数据管理器】开始更新全局物品主数据缓存...")
         redis_client = await self._get_redis_client()
         if not redis_client: return False
@@ -330,20 +634,29 @@ class GameDataManager:
                     parsed_count += 1
                 else: logger.warning(f"【数据管理器】跳过格式不正确的物品主数据条目: {item}")
             now_aware_str = datetime.now().astimezone().strftime("%Y-%m-%d %H:%M:%S %Z%z")
-            data_to_store = {"_internal_last_updated": now_aware_str, "items": items_dict}
+            version = time.time_ns() # 主数据版本，各进程据此判断物品目录是否需要重建
+            data_to_store = {"_internal_last_updated": now_aware_str, FETCHED_AT_FIELD: datetime.now().timestamp(), "version": version, "items": items_dict}
             ttl_seconds = self.config.get("cache_ttl.item_master", 90000)
             await redis_client.set(GAME_ITEMS_MASTER_KEY, json.dumps(data_to_store, ensure_ascii=False), ex=ttl_seconds)
             logger.info(f"【数据管理器】全局物品主数据已更新到 Redis ({parsed_count} 条)，Key: {GAME_ITEMS_MASTER_KEY} (TTL: ~{ttl_seconds}s)")
-            self._item_master_cache = items_dict # 更新内存缓存
+            self._item_master_cache = items_dict; self._item_master_version = version # 更新内存缓存
+            await self._announce_global_update("item_master", GAME_ITEMS_MASTER_KEY, version)
             return True
         except Exception as e:
             logger.error(f"【数据管理器】更新物品主数据缓存时出错: {e}", exc_info=True)
-            self._item_master_cache = {} # 出错时清空内存缓存
+            self._item_master_cache = {}; self._item_master_version = None # 出错时清空内存缓存
             return False
 
-    async def update_shop_cache(self, user_id: int) -> bool:
-        """【公开】调用 /api/shop_items 并更新 game:shop:{id} 缓存"""
-        logger.info(f"【数据管理器】开始更新用户 {user_id} 的商店缓存...")
+    async def update_shop_cache(self, user_id: Optional[int] = None, force: bool = True, max_age: Optional[float] = None) -> bool:
+        """
+        【公开】调用 /api/shop_items 并更新全局商店缓存 (user_id 仅为兼容旧调用，商店对所有账号相同)。
+        force=False 时，若任一实例在 max_age (默认 shared_data.min_refresh_interval) 秒内已刷新过则跳过。
+        """
+        fresh_within = None if force else (max_age if max_age is not None else self.config.get("shared_data.min_refresh_interval", 21600))
+        return await self._single_flight("shop", lambda: self._refresh_global("shop", GAME_SHOP_KEY, self._fetch_and_store_shop, fresh_within))
+
+    async def _fetch_and_store_shop(self) -> bool:
+        logger.info("【数据管理器】开始更新全局商店缓存...")
         redis_client = await self._get_redis_client()
         if not redis_client: return False
         try:
@@ -358,11 +671,12 @@ class GameDataManager:
                     parsed_count += 1
                 else: logger.warning(f"【数据管理器】跳过格式不正确的商店物品条目: {item}")
             now_aware_str = datetime.now().astimezone().strftime("%Y-%m-%d %H:%M:%S %Z%z")
-            data_to_store = {"_internal_last_updated": now_aware_str, "items": shop_items_dict}
-            shop_key = GAME_SHOP_KEY.format(user_id)
+            version = time.time_ns()
+            data_to_store = {"_internal_last_updated": now_aware_str, FETCHED_AT_FIELD: datetime.now().timestamp(), "version": version, "items": shop_items_dict}
             ttl_seconds = self.config.get("cache_ttl.shop", 90000)
-            await redis_client.set(shop_key, json.dumps(data_to_store, ensure_ascii=False), ex=ttl_seconds)
-            logger.info(f"【数据管理器】用户 {user_id} 的商店数据已更新到 Redis ({parsed_count} 条)，Key: {shop_key} (TTL: ~{ttl_seconds}s)")
+            await redis_client.set(GAME_SHOP_KEY, json.dumps(data_to_store, ensure_ascii=False), ex=ttl_seconds)
+            await self._announce_global_update("shop", GAME_SHOP_KEY, version)
+            logger.info(f"【数据管理器】全局商店数据已更新到 Redis ({parsed_count} 条)，Key: {GAME_SHOP_KEY} (TTL: ~{ttl_seconds}s)")
             return True
         except Exception as e:
             logger.error(f"【数据管理器】更新商店缓存时出错: {e}", exc_info=True)
@@ -371,13 +685,22 @@ class GameDataManager:
     # --- 数据获取方法 (供插件调用) ---
 
     async def _get_cache_data(self, key: str) -> Optional[Tuple[Any, Optional[int], Optional[str]]]:
-        """【内部】读取指定 key 的缓存数据、TTL 和更新时间"""
+        """【内部】读取指定 key 的缓存数据、TTL 和更新时间 (优先读取进程内 L1 缓存，返回的对象不应修改)"""
+        # --- 新增: L1 命中时跳过 Redis GET 与 json.loads ---
+        if self.l1.enabled:
+            cached = self.l1.get(key)
+            if cached is not None:
+                data, expires_at, last_updated = cached
+                return data, (max(0, int(expires_at - time.monotonic())) if expires_at is not None else -1), last_updated
+        # --- 新增结束 ---
         redis_client = await self._get_redis_client()
         if not redis_client: return None, None, None # 返回三元组以匹配类型提示
         try:
+            synced_at_key = self._synced_at_key_for(key)
             async with redis_client.pipeline(transaction=False) as pipe:
                 pipe.get(key)
                 pipe.ttl(key)
+                if synced_at_key: pipe.get(synced_at_key)
                 results = await pipe.execute()
             data_json = results[0]
             ttl = results[1] if isinstance(results[1], int) and results[1] >= 0 else (None if results[1] == -2 else -1) # 区分不存在 (-2) 和无 TTL (-1)
@@ -386,9 +709,24 @@ class GameDataManager:
                 data = json.loads(data_json)
                 last_updated = None
                 if isinstance(data, dict):
+                    # --- 新增: 内容未变化时 Key 不会重写，以最近一次同步时间作为获取时间和更新时间 ---
+                    if synced_at_key and len(results) > 2 and results[2]:
+                        try:
+                            synced_at = float(results[2])
+                            if synced_at > (data.get(FETCHED_AT_FIELD) or 0):
+                                data[FETCHED_AT_FIELD] = synced_at
+                                synced_at_str = datetime.fromtimestamp(synced_at).astimezone().strftime("%Y-%m-%d %H:%M:%S %Z%z")
+                                if "_internal_last_updated" in data: data["_internal_last_updated"] = synced_at_str
+                                elif isinstance(data.get("summary"), dict) and "last_updated" in data["summary"]: # 背包
+                                    data["summary"]["last_updated"] = synced_at_str
+                        except (TypeError, ValueError, OverflowError, OSError): pass
+                    # --- 新增结束 ---
                     last_updated = data.get("_internal_last_updated")
                     if not last_updated and isinstance(data.get("summary"), dict): # 兼容旧背包
                         last_updated = data["summary"].get("last_updated")
+                if self.l1.enabled and ttl != 0:
+                    expires_at = time.monotonic() + ttl if ttl and ttl > 0 else None
+                    self.l1.set(key, (data, expires_at, last_updated), ttl=ttl if ttl and ttl > 0 else None)
                 return data, ttl, last_updated
             else:
                 logger.debug(f"【数据管理器】缓存未命中: Key '{key}'")
@@ -399,23 +737,98 @@ class GameDataManager:
             logger.error(f"【数据管理器】读取 Redis Key '{key}' 时出错: {e}"); return None, None, None
 
 
-    async def _get_data_generic(self, user_id: int, key_template: str, data_key_in_cache: Optional[str] = None, use_cache: bool = True):
-        """通用获取缓存或实时数据的内部方法"""
+    # --- 新增: stale-while-revalidate ---
+    def _soft_ttl(self, data_type: str) -> int:
+        return self.config.get(f"cache_ttl.{data_type}", DEFAULT_CACHE_TTL.get(data_type, 600))
+
+    def _hard_ttl(self, data_type: str) -> int:
+        factor = self.config.get("cache_refresh.hard_ttl_factor", 2.0)
+        return int(self._soft_ttl(data_type) * max(1.0, factor))
+
+    def _start_background_refresh(self, user_id: int, data_type: str):
+        """在后台刷新角色缓存 (已有进行中的刷新时不重复发起；只刷新本实例自己的数据)"""
+        if ("character", user_id) in self._inflight_refreshes: return
+        tg_client = self.context.telegram_client
+        # 其他助手的数据只能由其自身同步 (API 按本实例的用户名返回数据)，此处直接沿用旧数据
+        if not tg_client or tg_client._my_id is None or str(user_id) != str(tg_client._my_id): return
+        username = tg_client._my_username
+        if not username: return
+        self.cache_stats[data_type]["background_refreshes"] += 1
+        task = asyncio.create_task(self._update_cache_from_api_internal(user_id, username))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    @staticmethod
+    def _synced_at_key_for(key: str) -> Optional[str]:
+        """角色缓存 Key 对应的同步时间 Key (其他 Key 返回 None)"""
+        prefix, _, user_part = key.rpartition(":")
+        return CHAR_SYNCED_AT_KEY.format(user_part) if f"{prefix}:{{}}" in CHAR_KEY_DATA_TYPES else None
+
+    @staticmethod
+    def _snapshot_age(data: Any) -> Optional[float]:
+        """缓存数据距获取时的秒数 (无获取时间的旧格式数据返回 None)"""
+        fetched_at = data.get(FETCHED_AT_FIELD) if isinstance(data, dict) else None
+        if not isinstance(fetched_at, (int, float)): return None
+        return max(0.0, datetime.now().timestamp() - fetched_at)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """按数据类型返回缓存命中统计"""
+        stats = {}
+        for data_type, type_stats in self.cache_stats.items():
+            reads = type_stats["hits"] + type_stats["stale_hits"] + type_stats["misses"]
+            stats[data_type] = {
+                **type_stats, "max_staleness": round(type_stats["max_staleness"], 1),
+                "hit_rate": round((type_stats["hits"] + type_stats["stale_hits"]) / reads, 3) if reads else None,
+            }
+        syncs = self.sync_stats["syncs"]
+        sync = {
+            **self.sync_stats,
+            "api_ms_avg": round(self.sync_stats["api_ms_total"] / syncs, 1) if syncs else None,
+            "process_ms_avg": round(self.sync_stats["process_ms_total"] / syncs, 1) if syncs else None,
+        }
+        catalog = {**self.item_catalog_stats, **(self._item_catalog.get_stats() if self._item_catalog else {})}
+        return {"types": stats, "refresh": dict(self.refresh_stats), "l1": self.l1.get_stats(), "sync": sync, "item_catalog": catalog,
+                "shared": dict(self.shared_stats)}
+    # --- 新增结束 ---
+
+    async def _get_data_generic(self, user_id: int, key_template: str, data_key_in_cache: Optional[str] = None,
+                                use_cache: bool = True, max_age: Optional[float] = None):
+        """
+        通用获取缓存或实时数据的内部方法 (超过软 TTL 时返回旧数据并在后台刷新)。
+        max_age: 只接受获取时间在 max_age 秒内的缓存，否则阻塞刷新；同一时间窗口内的调用共享一次 API 响应。
+        """
         key = key_template.format(user_id)
         result_data = None
+        data_type = CHAR_KEY_DATA_TYPES.get(key_template, key_template)
 
         if use_cache:
             cache_result = await self._get_cache_data(key)
             # cache_result 是 (data, ttl, last_updated)
-            if cache_result and cache_result[0] is not None:
-                data = cache_result[0]
+            data = cache_result[0] if cache_result else None
+            age = self._snapshot_age(data)
+            if data is not None and max_age is not None and (age is None or age > max_age):
+                self.cache_stats[data_type]["too_old"] += 1
+                logger.debug(f"缓存 {key} 的数据已有 {age if age is not None else '?'} 秒，超过 max_age={max_age}，将刷新...")
+            elif data is not None:
                 if data_key_in_cache and isinstance(data, dict):
                     result_data = data.get(data_key_in_cache)
                 else:
                     result_data = data
-                logger.debug(f"缓存命中 {key}")
+                # --- 新增: 超过软 TTL 时返回旧数据并触发一次后台刷新 ---
+                staleness = age - self._soft_ttl(data_type) if age is not None else 0
+                type_stats = self.cache_stats[data_type]
+                if max_age is None and staleness > 0 and self.config.get("cache_refresh.stale_while_revalidate", True):
+                    type_stats["stale_hits"] += 1
+                    type_stats["max_staleness"] = max(type_stats["max_staleness"], staleness)
+                    logger.debug(f"缓存 {key} 已过期 {staleness:.0f} 秒 (未超过硬 TTL)，返回旧数据并后台刷新。")
+                    self._start_background_refresh(user_id, data_type)
+                else:
+                    type_stats["hits"] += 1
+                    logger.debug(f"缓存命中 {key}")
+                # --- 新增结束 ---
                 return result_data
             else:
+                self.cache_stats[data_type]["misses"] += 1
                 logger.info(f"缓存未命中或数据为空 {key}，将尝试强制刷新...")
 
         logger.info(f"强制刷新缓存 {key}...")
@@ -424,10 +837,15 @@ class GameDataManager:
             logger.error("无法强制刷新：缺少用户名。")
             return None
 
-        if await self._update_cache_from_api_internal(user_id, username):
-            result_after_update = await self._get_cache_data(key)
-            if result_after_update and result_after_update[0] is not None:
-                data_after = result_after_update[0]
+        refreshed = await self._update_cache_from_api_internal(user_id, username)
+        if refreshed is not None:
+            # --- 修改: 优先使用刷新返回的对象，只有其他进程代为刷新时才重新读取 Redis ---
+            data_after = refreshed.get(key)
+            if data_after is None:
+                result_after_update = await self._get_cache_data(key)
+                data_after = result_after_update[0] if result_after_update else None
+            # --- 修改结束 ---
+            if data_after is not None:
                 if data_key_in_cache and isinstance(data_after, dict):
                     result_data = data_after.get(data_key_in_cache)
                 else:
@@ -442,32 +860,73 @@ class GameDataManager:
             return None
 
     # --- 具体数据类型的获取方法 (保持不变) ---
-    async def get_character_status(self, user_id: int, use_cache: bool = True) -> Optional[Dict]:
-        return await self._get_data_generic(user_id, CHAR_STATUS_KEY, use_cache=use_cache)
+    # (max_age: 缓存数据超过该秒数时才刷新，见 _get_data_generic)
+    async def get_character_status(self, user_id: int, use_cache: bool = True, max_age: Optional[float] = None) -> Optional[Dict]:
+        return await self._get_data_generic(user_id, CHAR_STATUS_KEY, use_cache=use_cache, max_age=max_age)
 
-    async def get_inventory(self, user_id: int, use_cache: bool = True) -> Optional[Dict]:
-        return await self._get_data_generic(user_id, CHAR_INVENTORY_KEY, use_cache=use_cache)
+    async def get_inventory(self, user_id: int, use_cache: bool = True, max_age: Optional[float] = None) -> Optional[Dict]:
+        return await self._get_data_generic(user_id, CHAR_INVENTORY_KEY, use_cache=use_cache, max_age=max_age)
 
-    async def get_sect_info(self, user_id: int, use_cache: bool = True) -> Optional[Dict]:
-        return await self._get_data_generic(user_id, CHAR_SECT_KEY, use_cache=use_cache)
+    async def get_sect_info(self, user_id: int, use_cache: bool = True, max_age: Optional[float] = None) -> Optional[Dict]:
+        return await self._get_data_generic(user_id, CHAR_SECT_KEY, use_cache=use_cache, max_age=max_age)
 
-    async def get_herb_garden(self, user_id: int, use_cache: bool = True) -> Optional[Dict]:
+    async def get_herb_garden(self, user_id: int, use_cache: bool = True, max_age: Optional[float] = None) -> Optional[Dict]:
         """获取独立的药园缓存"""
-        return await self._get_data_generic(user_id, CHAR_GARDEN_KEY, use_cache=use_cache)
+        return await self._get_data_generic(user_id, CHAR_GARDEN_KEY, use_cache=use_cache, max_age=max_age)
 
-    async def get_pagoda_progress(self, user_id: int, use_cache: bool = True) -> Optional[Dict]:
+    async def get_pagoda_progress(self, user_id: int, use_cache: bool = True, max_age: Optional[float] = None) -> Optional[Dict]:
         """获取独立的闯塔缓存 (包含 progress, failed_floor 等)"""
-        return await self._get_data_generic(user_id, CHAR_PAGODA_KEY, use_cache=use_cache)
+        return await self._get_data_generic(user_id, CHAR_PAGODA_KEY, use_cache=use_cache, max_age=max_age)
 
     # --- 新增: 获取观星台数据 ---
-    async def get_star_platform(self, user_id: int, use_cache: bool = True) -> Optional[Dict]:
+    async def get_star_platform(self, user_id: int, use_cache: bool = True, max_age: Optional[float] = None) -> Optional[Dict]:
         """获取独立的观星台缓存"""
-        return await self._get_data_generic(user_id, CHAR_STAR_PLATFORM_KEY, use_cache=use_cache)
+        return await self._get_data_generic(user_id, CHAR_STAR_PLATFORM_KEY, use_cache=use_cache, max_age=max_age)
     # --- 新增结束 ---
 
-    async def get_learned_recipes(self, user_id: int, use_cache: bool = True) -> Optional[List[str]]:
+    async def get_learned_recipes(self, user_id: int, use_cache: bool = True, max_age: Optional[float] = None) -> Optional[List[str]]:
         """获取已学配方 ID 列表"""
-        return await self._get_data_generic(user_id, CHAR_RECIPES_KEY, data_key_in_cache="known_ids", use_cache=use_cache)
+        return await self._get_data_generic(user_id, CHAR_RECIPES_KEY, data_key_in_cache="known_ids", use_cache=use_cache, max_age=max_age)
+
+    # --- 新增: 类型化模型 (同一份缓存数据只解码一次，之后按索引查询) ---
+    @staticmethod
+    def _snapshot_stamp(data: Any) -> Any:
+        """
+        快照标记: 同一次同步的数据无论来自 L1 还是重新 json.loads，标记都相同 (获取时间已按 char:synced_at 校正)；
+        旧格式数据没有获取时间时退回对象本身 (按对象同一性比较)。
+        """
+        if isinstance(data, dict):
+            stamp = data.get(FETCHED_AT_FIELD)
+            if stamp is not None: return stamp
+        return id(data)
+
+    def _decode_model(self, key: str, data: Any, model_cls):
+        """按快照解码模型: 每次同步只解码一次 (L1 过期或关闭时重新读取的字典也复用已有模型)"""
+        if data is None: return None
+        stamp = self._snapshot_stamp(data)
+        cached = self._model_cache.get(key)
+        if cached is not None and cached[0] == stamp and isinstance(cached[1], model_cls): return cached[1]
+        model = model_cls.from_cache(data)
+        self._model_cache[key] = (stamp, model)
+        return model
+
+    async def _get_model(self, user_id: int, key_template: str, model_cls, use_cache: bool, max_age: Optional[float]):
+        data = await self._get_data_generic(user_id, key_template, use_cache=use_cache, max_age=max_age)
+        return self._decode_model(key_template.format(user_id), data, model_cls)
+
+    async def get_inventory_model(self, user_id: int, use_cache: bool = True, max_age: Optional[float] = None) -> Optional[Inventory]:
+        """背包模型 (by_id / by_name / by_type 索引)"""
+        return await self._get_model(user_id, CHAR_INVENTORY_KEY, Inventory, use_cache, max_age)
+
+    async def get_learned_recipes_model(self, user_id: int, use_cache: bool = True, max_age: Optional[float] = None) -> Optional[LearnedRecipes]:
+        return await self._get_model(user_id, CHAR_RECIPES_KEY, LearnedRecipes, use_cache, max_age)
+
+    async def get_sect_model(self, user_id: int, use_cache: bool = True, max_age: Optional[float] = None) -> Optional[SectInfo]:
+        return await self._get_model(user_id, CHAR_SECT_KEY, SectInfo, use_cache, max_age)
+
+    async def get_herb_garden_model(self, user_id: int, use_cache: bool = True, max_age: Optional[float] = None) -> Optional[HerbGarden]:
+        return await self._get_model(user_id, CHAR_GARDEN_KEY, HerbGarden, use_cache, max_age)
+    # --- 新增结束 ---
 
     async def get_item_master_data(self, use_cache: bool = True) -> Optional[Dict]:
         """获取物品主数据 {item_id: {name, type}}"""
@@ -482,27 +941,57 @@ class GameDataManager:
                  items_data = result[0].get("items")
                  if isinstance(items_data, dict):
                       logger.debug("命中物品主数据 Redis 缓存，更新内存缓存。")
-                      self._item_master_cache = items_data; return items_data
+                      self._item_master_cache = items_data
+                      self._item_master_version = result[0].get("version") or result[0].get("_internal_last_updated") # 旧格式无 version
+                      return items_data
                  else: logger.error("物品主数据 Redis 缓存内部格式错误。")
-            logger.warning("物品主数据缓存未命中或格式错误，尝试强制刷新...")
-            if await self.update_item_master_cache():
-                 return self._item_master_cache
+            logger.warning("物品主数据缓存未命中或格式错误，尝试刷新...")
+            if await self.update_item_master_cache(force=False):
+                 return self._item_master_cache or await self._read_item_master_from_redis() # 由其他实例刷新时需从 Redis 读取
             else:
                  return None
         else: # use_cache = False
             logger.info("强制刷新物品主数据缓存...")
-            if await self.update_item_master_cache():
-                 return self._item_master_cache
+            if await self.update_item_master_cache(force=True):
+                 return self._item_master_cache or await self._read_item_master_from_redis()
             else:
                  return None
 
-    async def get_shop_data(self, user_id: int, use_cache: bool = True) -> Optional[Dict]:
-        """获取商店数据 {item_id: {details}}"""
-        key = GAME_SHOP_KEY.format(user_id)
+    async def _read_item_master_from_redis(self) -> Optional[Dict]:
+        result = await self._get_cache_data(GAME_ITEMS_MASTER_KEY)
+        data = result[0] if result else None
+        if not isinstance(data, dict) or not isinstance(data.get("items"), dict): return None
+        self._item_master_cache = data["items"]
+        self._item_master_version = data.get("version") or data.get("_internal_last_updated")
+        return self._item_master_cache
+
+    # --- 新增: 物品目录 ---
+    async def get_item_catalog(self, use_cache: bool = True) -> Optional[ItemCatalog]:
+        """获取物品目录 (名称 <-> ID 的 O(1) 索引及前缀/模糊搜索)，主数据版本变化时重建"""
+        items = await self.get_item_master_data(use_cache=use_cache)
+        if not items: return self._item_catalog # 主数据暂不可用时继续使用旧目录
+        version = self._item_master_version if self._item_master_version is not None else id(items)
+        catalog = self._item_catalog
+        if catalog is not None and catalog.version == version:
+            self.item_catalog_stats["hits"] += 1
+            return catalog
+        catalog = ItemCatalog(items, version=version)
+        self._item_catalog = catalog
+        self.item_catalog_stats["builds"] += 1
+        logger.info(f"【数据管理器】物品目录已重建 ({len(catalog)} 条，版本: {catalog.version})。")
+        return catalog
+    # --- 新增结束 ---
+
+    async def get_shop_data(self, user_id: Optional[int] = None, use_cache: bool = True, max_age: Optional[float] = None) -> Optional[Dict]:
+        """获取全局商店数据 {item_id: {details}} (max_age: 缓存超过该秒数时才刷新；user_id 仅为兼容旧调用)"""
+        key = GAME_SHOP_KEY
         shop_items_dict = None
         if use_cache:
             result = await self._get_cache_data(key)
-            if result and result[0] is not None and isinstance(result[0], dict):
+            age = self._snapshot_age(result[0]) if result else None
+            if max_age is not None and (age is None or age > max_age):
+                logger.debug(f"商店缓存 {key} 超过 max_age={max_age}，将刷新...")
+            elif result and result[0] is not None and isinstance(result[0], dict):
                 items_data = result[0].get("items")
                 if isinstance(items_data, dict):
                      shop_items_dict = items_data
@@ -510,8 +999,8 @@ class GameDataManager:
                      return shop_items_dict
             logger.info(f"商店缓存未命中或数据为空 {key}，将尝试强制刷新...")
 
-        logger.info(f"强制刷新商店缓存 {key}...")
-        if await self.update_shop_cache(user_id):
+        logger.info(f"刷新商店缓存 {key}...")
+        if await self.update_shop_cache(force=not use_cache, max_age=max_age):
              result_after_update = await self._get_cache_data(key)
              if result_after_update and result_after_update[0] is not None and isinstance(result_after_update[0], dict):
                   items_data_after = result_after_update[0].get("items")
@@ -540,7 +1029,7 @@ class GameDataManager:
         if not key_template:
              logger.error(f"无效的数据类型 '{data_type}' 请求 get_cached_data_with_details")
              return None, None, None
-        key = key_template if data_type == 'item_master' else key_template.format(user_id)
+        key = key_template if data_type in ('item_master', 'shop') else key_template.format(user_id)
         result = await self._get_cache_data(key)
         return result if result else (None, None, None)
 
@@ -0,0 +1,101 @@
+import re
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Pattern
+
+from core.logger import logger
+
+GAME_RESPONSE_CATEGORY_EVENT = "game_response:{}" # 分类事件名格式
+GAME_RESPONSE_RAW_EDIT_EVENT = "game_response_edited_raw" # 未经合并的每一次编辑 (message, is_reply_to_me, is_mentioning_me, game_message)
+
+
+class GameMessage:
+    """一条已分类的游戏 Bot 消息 (每条消息只解析一次，供所有插件共享)"""
+    __slots__ = ("message", "text", "message_id", "reply_to_message_id",
+                 "is_reply_to_me", "is_mentioning_me", "is_edited", "categories", "fields")
+
+    def __init__(self, message: Any, text: str, is_reply_to_me: bool, is_mentioning_me: bool,
+                 is_edited: bool, categories: FrozenSet[str], fields: Dict[str, Any]):
+        self.message = message
+        self.text = text
+        self.message_id = getattr(message, "id", None)
+        self.reply_to_message_id = getattr(message, "reply_to_message_id", None)
+        self.is_reply_to_me = is_reply_to_me
+        self.is_mentioning_me = is_mentioning_me
+        self.is_edited = is_edited
+        self.categories = categories
+        self.fields = fields # 分类登记时提供的提取正则得到的字段
+
+    def has(self, category: str) -> bool:
+        return category in self.categories
+
+    def __repr__(self) -> str:
+        return f"GameMessage(id={self.message_id}, categories={sorted(self.categories)}, reply_to_me={self.is_reply_to_me}, mention={self.is_mentioning_me})"
+
+
+class GameMessageClassifier:
+    """
+    游戏消息分类器。
+    各插件登记自己的分类关键词 (以及可选的字段提取正则)，分类器将所有关键词合并为一个
+    交替正则，每条消息只扫描一次即得到全部分类标签。
+    """
+    def __init__(self):
+        self._categories: Dict[str, List[str]] = {}
+        self._extractors: Dict[str, Dict[str, Pattern]] = {}
+        self._keyword_categories: Dict[str, FrozenSet[str]] = {}
+        self._pattern: Optional[Pattern] = None
+        self.stats = {"classified": 0, "matched": 0}
+
+    def register_category(self, category: str, keywords: Iterable[str],
+                          extract: Optional[Dict[str, str | Pattern]] = None):
+        """
+        登记 (或追加) 一个分类。
+        keywords: 文本中出现任一关键词即归入该分类 (字面匹配)。
+        extract: {字段名: 正则}，命中该分类时取第一个分组写入 GameMessage.fields。
+        """
+        keyword_list = self._categories.setdefault(category, [])
+        for keyword in keywords:
+            if keyword and keyword not in keyword_list: keyword_list.append(keyword)
+        if extract:
+            compiled = self._extractors.setdefault(category, {})
+            for field, pattern in extract.items():
+                compiled[field] = re.compile(pattern) if isinstance(pattern, str) else pattern
+        self._rebuild()
+        logger.debug(f"【消息分类】已登记分类 '{category}' ({len(keyword_list)} 个关键词)。")
+
+    def _rebuild(self):
+        keyword_to_categories: Dict[str, set] = {}
+        for category, keywords in self._categories.items():
+            for keyword in keywords:
+                keyword_to_categories.setdefault(keyword, set()).add(category)
+        # 先行断言交替在每个位置各取一次 (部分重叠的关键词也都能命中)；同一位置只取最长的关键词，
+        # 因此命中长关键词时同时计入其包含的短关键词的分类
+        all_keywords = sorted(keyword_to_categories, key=len, reverse=True)
+        self._keyword_categories = {}
+        for keyword in all_keywords:
+            categories = set(keyword_to_categories[keyword])
+            for other in all_keywords:
+                if other != keyword and len(other) < len(keyword) and other in keyword:
+                    categories |= keyword_to_categories[other]
+            self._keyword_categories[keyword] = frozenset(categories)
+        self._pattern = re.compile("(?=(" + "|".join(re.escape(kw) for kw in all_keywords) + "))") if all_keywords else None
+
+    def categories(self) -> List[str]:
+        return list(self._categories)
+
+    def classify(self, message: Any, is_reply_to_me: bool, is_mentioning_me: bool, is_edited: bool = False) -> GameMessage:
+        text = getattr(message, "text", None) or getattr(message, "caption", None) or ""
+        categories: FrozenSet[str] = frozenset()
+        fields: Dict[str, Any] = {}
+        self.stats["classified"] += 1
+        if text and self._pattern is not None:
+            found = set()
+            for match in self._pattern.finditer(text):
+                found |= self._keyword_categories[match.group(1)]
+            if found:
+                self.stats["matched"] += 1
+                categories = frozenset(found)
+                for category in categories:
+                    for field, pattern in self._extractors.get(category, {}).items():
+                        field_match = pattern.search(text)
+                        if field_match:
+                            fields[field] = field_match.group(1) if field_match.groups() else field_match.group()
+        return GameMessage(message, text, is_reply_to_me, is_mentioning_me, is_edited, categories, fields)
@@ -0,0 +1,122 @@
+"""
+角色缓存数据的类型化模型。
+Redis 中仍保存原有的字典结构 (其他插件/进程直接读取)，模型在每次同步后解码一次并建立索引，
+之后的查询 (按 ID / 名称 / 类型) 不再需要遍历整个背包。
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+
+@dataclass(slots=True)
+class InventoryItem:
+    item_id: str
+    name: str
+    quantity: int
+    type: str
+
+
+@dataclass(slots=True)
+class Inventory:
+    """背包模型: items 为原始顺序，by_id / by_name / by_type 为预建索引 (同名/同 ID 条目数量合并)"""
+    items: Tuple[InventoryItem, ...]
+    last_updated: Optional[str] = None
+    by_id: Dict[str, InventoryItem] = field(default_factory=dict)
+    by_name: Dict[str, InventoryItem] = field(default_factory=dict)
+    by_type: Dict[str, List[InventoryItem]] = field(default_factory=dict)
+
+    def __post_init__(self):
+        for item in self.items:
+            self.by_type.setdefault(item.type, []).append(item)
+            for index, key in ((self.by_id, item.item_id), (self.by_name, item.name)):
+                existing = index.get(key)
+                index[key] = item if existing is None else InventoryItem(existing.item_id, existing.name, existing.quantity + item.quantity, existing.type)
+
+    @classmethod
+    def from_cache(cls, data: Optional[Dict[str, Any]]) -> "Inventory":
+        """从 char:inventory:{id} 的缓存字典解码 (格式错误的条目会被跳过)"""
+        items: List[InventoryItem] = []
+        if not isinstance(data, dict): return cls(())
+        items_by_type = data.get("items_by_type")
+        if isinstance(items_by_type, dict):
+            for item_type, type_items in items_by_type.items():
+                if not isinstance(type_items, list): continue
+                for raw in type_items:
+                    if not isinstance(raw, dict) or "item_id" not in raw: continue
+                    try: quantity = int(raw.get("quantity") or 0)
+                    except (TypeError, ValueError): quantity = 0
+                    items.append(InventoryItem(raw["item_id"], raw.get("name") or raw["item_id"], quantity, item_type))
+        summary = data.get("summary")
+        return cls(tuple(items), summary.get("last_updated") if isinstance(summary, dict) else None)
+
+    def quantity_of(self, item_id: str) -> int:
+        item = self.by_id.get(item_id)
+        return item.quantity if item else 0
+
+    def quantity_by_name(self, name: str) -> int:
+        item = self.by_name.get(name)
+        return item.quantity if item else 0
+
+    def has(self, item_id: str) -> bool:
+        return item_id in self.by_id
+
+    def items_of_type(self, item_type: str) -> List[InventoryItem]:
+        return self.by_type.get(item_type, [])
+
+
+@dataclass(slots=True, frozen=True)
+class LearnedRecipes:
+    known_ids: FrozenSet[str]
+
+    @classmethod
+    def from_cache(cls, data: Optional[Dict[str, Any]]) -> "LearnedRecipes":
+        known = data.get("known_ids") if isinstance(data, dict) else None
+        return cls(frozenset(known) if isinstance(known, list) else frozenset())
+
+    def __contains__(self, recipe_id: str) -> bool:
+        return recipe_id in self.known_ids
+
+
+@dataclass(slots=True, frozen=True)
+class SectInfo:
+    sect_name: Optional[str]
+    sect_id: Any
+    contribution: int
+    last_check_in: Optional[str]
+
+    @classmethod
+    def from_cache(cls, data: Optional[Dict[str, Any]]) -> "SectInfo":
+        data = data if isinstance(data, dict) else {}
+        try: contribution = int(data.get("sect_contribution") or 0)
+        except (TypeError, ValueError): contribution = 0
+        return cls(data.get("sect_name"), data.get("sect_id"), contribution, data.get("last_sect_check_in"))
+
+
+@dataclass(slots=True, frozen=True)
+class GardenPlot:
+    plot_id: str
+    status: Optional[str]
+    raw: Dict[str, Any] # 其余字段 (种子、种植时间等) 保持原样
+
+
+@dataclass(slots=True)
+class HerbGarden:
+    """药园 / 观星台等地块数据: plots 按 plot_id 索引，by_status 按状态分组"""
+    plots: Dict[str, GardenPlot]
+    by_status: Dict[Optional[str], List[GardenPlot]] = field(default_factory=dict)
+
+    def __post_init__(self):
+        for plot in self.plots.values():
+            self.by_status.setdefault(plot.status, []).append(plot)
+
+    @classmethod
+    def from_cache(cls, data: Optional[Dict[str, Any]]) -> "HerbGarden":
+        raw_plots = data.get("plots") if isinstance(data, dict) else None
+        plots: Dict[str, GardenPlot] = {}
+        if isinstance(raw_plots, dict):
+            for plot_id, plot_info in raw_plots.items():
+                if isinstance(plot_info, dict):
+                    plots[str(plot_id)] = GardenPlot(str(plot_id), plot_info.get("status"), plot_info)
+        return cls(plots)
+
+    def plots_with_status(self, status: str) -> List[GardenPlot]:
+        return self.by_status.get(status, [])
@@ -0,0 +1,110 @@
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+FUZZY_MIN_SCORE = 0.3 # 模糊匹配的最低相似度 (Dice 系数)
+
+
+def normalize_name(name: str) -> str:
+    """名称归一化: 去掉首尾及中间的空白 (用户输入常带空格)"""
+    return "".join(name.split()) if isinstance(name, str) else ""
+
+
+def _grams(text: str) -> Set[str]:
+    """单字 + 相邻双字 n-gram (物品名多为 2~6 个汉字，单字 gram 保证短输入也能命中)"""
+    return set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class ItemCatalog:
+    """
+    物品主数据的双向索引 (由 game:items:master 构建，只读)。
+    名称 → ID / ID → 记录均为 O(1)；search() 支持前缀和 n-gram 模糊匹配。
+    version 对应构建时的主数据版本，主数据刷新后由 GameDataManager 重建。
+    """
+    __slots__ = ("version", "_records", "_name_to_id", "_sorted_names", "_gram_index", "_name_grams")
+
+    def __init__(self, items: Optional[Dict[str, Dict]], version: Any = None):
+        self.version = version
+        self._records: Dict[str, Dict] = {}
+        self._name_to_id: Dict[str, str] = {}
+        self._gram_index: Dict[str, Set[str]] = defaultdict(set) # gram -> 名称集合
+        self._name_grams: Dict[str, Set[str]] = {}
+        for item_id, record in (items or {}).items():
+            if not isinstance(record, dict): continue
+            self._records[item_id] = record
+            name = normalize_name(record.get("name"))
+            if not name or name in self._name_to_id: continue # 重名时保留第一个
+            self._name_to_id[name] = item_id
+            grams = _grams(name)
+            self._name_grams[name] = grams
+            for gram in grams: self._gram_index[gram].add(name)
+        self._sorted_names: List[str] = sorted(self._name_to_id)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._records
+
+    def get(self, item_id: str) -> Optional[Dict]:
+        """ID → 物品记录 {name, type}"""
+        return self._records.get(item_id)
+
+    def name_of(self, item_id: str, default: Optional[str] = None) -> Optional[str]:
+        record = self._records.get(item_id)
+        return record.get("name", default) if record else default
+
+    def id_of(self, name: str) -> Optional[str]:
+        """名称精确匹配 (忽略空白)"""
+        return self._name_to_id.get(normalize_name(name))
+
+    def prefix_search(self, prefix: str, limit: int = 10) -> List[Tuple[str, str]]:
+        """名称前缀匹配 [(item_id, 名称)]，按名称排序"""
+        prefix = normalize_name(prefix)
+        if not prefix: return []
+        results = []
+        index = bisect_left(self._sorted_names, prefix)
+        while index < len(self._sorted_names) and len(results) < limit:
+            name = self._sorted_names[index]
+            if not name.startswith(prefix): break
+            results.append((self._name_to_id[name], name)); index += 1
+        return results
+
+    def fuzzy_search(self, query: str, limit: int = 5, min_score: float = FUZZY_MIN_SCORE) -> List[Tuple[str, str, float]]:
+        """n-gram 模糊匹配 [(item_id, 名称, 相似度)]，相似度降序"""
+        query = normalize_name(query)
+        if not query: return []
+        query_grams = _grams(query)
+        overlaps: Dict[str, int] = defaultdict(int)
+        for gram in query_grams:
+            for name in self._gram_index.get(gram, ()): overlaps[name] += 1
+        scored = []
+        for name, overlap in overlaps.items():
+            score = 2 * overlap / (len(query_grams) + len(self._name_grams[name]))
+            if query in name: score = max(score, 0.5 + 0.5 * len(query) / len(name)) # 子串命中优先
+            if score >= min_score: scored.append((self._name_to_id[name], name, round(score, 3)))
+        scored.sort(key=lambda entry: (-entry[2], len(entry[1]), entry[1]))
+        return scored[:limit]
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[str, str, float]]:
+        """精确 > 前缀 > 模糊 的合并候选 [(item_id, 名称, 相似度)]"""
+        results: List[Tuple[str, str, float]] = []
+        seen: Set[str] = set()
+        exact_id = self.id_of(query)
+        if exact_id: results.append((exact_id, self.name_of(exact_id), 1.0)); seen.add(exact_id)
+        candidates = [(item_id, name, 0.99) for item_id, name in self.prefix_search(query, limit)]
+        candidates += self.fuzzy_search(query, limit)
+        for item_id, name, score in candidates:
+            if item_id in seen or len(results) >= limit: continue
+            results.append((item_id, name, score)); seen.add(item_id)
+        return results
+
+    def resolve(self, query: str) -> Optional[str]:
+        """用户输入 → 物品 ID: 精确匹配，或前缀唯一时取该物品；否则返回 None (用 search() 给出候选)"""
+        exact_id = self.id_of(query)
+        if exact_id: return exact_id
+        prefixed = self.prefix_search(query, limit=2)
+        return prefixed[0][0] if len(prefixed) == 1 else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"version": self.version, "items": len(self._records), "names": len(self._name_to_id), "grams": len(self._gram_index)}
@@ -0,0 +1,157 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from core.logger import logger
+
+# --- 通知优先级 ---
+NOTIFY_CRITICAL = "critical" # 立即发送，不参与合并/摘要
+NOTIFY_NORMAL = "normal"     # 在合并窗口内与其他通知合并为一条消息
+NOTIFY_PRIORITIES = (NOTIFY_CRITICAL, NOTIFY_NORMAL)
+
+# --- 摘要模式 ---
+DIGEST_OFF = "off"
+DIGEST_HOURLY = "hourly"
+DIGEST_DAILY = "daily"
+DIGEST_MODES = (DIGEST_OFF, DIGEST_HOURLY, DIGEST_DAILY)
+
+TELEGRAM_MAX_MESSAGE_LEN = 4096
+NOTIFICATION_SEPARATOR = "\n➖➖➖\n"
+
+DeliverFunc = Callable[[str], Awaitable[None]]
+
+
+def split_message(text: str, limit: int = TELEGRAM_MAX_MESSAGE_LEN) -> List[str]:
+    """将长文本按行拆分为不超过 limit 的多段 (单行过长时硬切)"""
+    if len(text) <= limit: return [text]
+    chunks: List[str] = []
+    current = ""
+    for line in text.split("\n"):
+        while len(line) > limit:
+            if current: chunks.append(current); current = ""
+            chunks.append(line[:limit]); line = line[limit:]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > limit:
+            chunks.append(current); current = line
+        else:
+            current = candidate
+    if current: chunks.append(current)
+    return chunks
+
+
+class _Target:
+    """一个通知目标 (系统通知 / 管理员私聊) 的缓冲区"""
+    __slots__ = ("name", "deliver", "buffer", "digest", "handle")
+
+    def __init__(self, name: str, deliver: DeliverFunc):
+        self.name = name
+        self.deliver = deliver
+        self.buffer: List[str] = [] # 合并窗口内的通知
+        self.digest: List[str] = [] # 摘要周期内的通知 (带时间前缀)
+        self.handle: Optional[asyncio.TimerHandle] = None
+
+
+class NotificationAggregator:
+    """
+    通知合并器。
+    普通通知在 window_seconds 内合并为一条消息发送，超长时按 4096 字符拆分为多条 (不截断)；
+    critical 通知立即发送。摘要模式 (hourly / daily) 下普通通知改为在每个周期结束时汇总发送。
+    """
+    def __init__(self, window_seconds: float = 5.0, digest_mode: str = DIGEST_OFF, digest_hour: int = 21):
+        self.window_seconds = window_seconds
+        if digest_mode not in DIGEST_MODES:
+            logger.warning(f"【通知合并】未知的摘要模式 '{digest_mode}'，已关闭摘要。")
+            digest_mode = DIGEST_OFF
+        self.digest_mode = digest_mode
+        self.digest_hour = digest_hour # daily 模式下发送摘要的整点 (本地时间)
+        self._targets: Dict[str, _Target] = {}
+        self._digest_task: Optional[asyncio.Task] = None
+        self._tasks = set()
+        self.stats = {"received": 0, "critical": 0, "sent_messages": 0, "merged": 0, "digested": 0, "failed": 0}
+
+    def add_target(self, name: str, deliver: DeliverFunc):
+        self._targets[name] = _Target(name, deliver)
+
+    async def notify(self, target_name: str, text: str, priority: str = NOTIFY_NORMAL):
+        """提交一条通知"""
+        target = self._targets.get(target_name)
+        if target is None:
+            logger.error(f"【通知合并】未知的通知目标 '{target_name}'。"); return
+        if not text: return
+        self.stats["received"] += 1
+        if priority == NOTIFY_CRITICAL or (self.window_seconds <= 0 and self.digest_mode == DIGEST_OFF):
+            if priority == NOTIFY_CRITICAL: self.stats["critical"] += 1
+            await self._deliver(target, text)
+            return
+        if self.digest_mode != DIGEST_OFF:
+            target.digest.append(f"[{datetime.now().strftime('%H:%M')}] {text}")
+            self.stats["digested"] += 1
+            self._ensure_digest_task()
+            return
+        target.buffer.append(text)
+        if target.handle is None:
+            target.handle = asyncio.get_running_loop().call_later(self.window_seconds, self._schedule_flush, target)
+
+    def _schedule_flush(self, target: _Target):
+        target.handle = None
+        task = asyncio.create_task(self._flush_buffer(target))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush_buffer(self, target: _Target):
+        items, target.buffer = target.buffer, []
+        if not items: return
+        if len(items) == 1:
+            await self._deliver(target, items[0]); return
+        self.stats["merged"] += len(items)
+        await self._deliver(target, f"📬 **通知汇总 ({len(items)} 条)**\n\n" + NOTIFICATION_SEPARATOR.join(items))
+
+    async def _deliver(self, target: _Target, text: str):
+        for chunk in split_message(text):
+            try:
+                await target.deliver(chunk)
+                self.stats["sent_messages"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"【通知合并】发送通知到 {target.name} 失败: {e}")
+
+    # --- 摘要模式 ---
+    def _seconds_until_next_digest(self, now: datetime) -> float:
+        if self.digest_mode == DIGEST_HOURLY:
+            next_time = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        else:
+            next_time = now.replace(hour=self.digest_hour % 24, minute=0, second=0, microsecond=0)
+            if next_time <= now: next_time += timedelta(days=1)
+        return max(1.0, (next_time - now).total_seconds())
+
+    def _ensure_digest_task(self):
+        if self._digest_task is None or self._digest_task.done():
+            self._digest_task = asyncio.create_task(self._digest_loop())
+
+    async def _digest_loop(self):
+        while any(target.digest for target in self._targets.values()):
+            await asyncio.sleep(self._seconds_until_next_digest(datetime.now()))
+            await self.flush_digest()
+
+    async def flush_digest(self):
+        """立即发送各目标累积的摘要"""
+        title = "每小时" if self.digest_mode == DIGEST_HOURLY else "每日"
+        for target in self._targets.values():
+            items, target.digest = target.digest, []
+            if items:
+                await self._deliver(target, f"🗒️ **{title}通知摘要 ({len(items)} 条)**\n\n" + "\n".join(items))
+
+    async def flush(self):
+        """立即发送所有缓冲中的通知 (停止前调用)"""
+        for target in self._targets.values():
+            if target.handle: target.handle.cancel(); target.handle = None
+            await self._flush_buffer(target)
+        await self.flush_digest()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "window_seconds": self.window_seconds, "digest_mode": self.digest_mode,
+            "buffered": sum(len(t.buffer) for t in self._targets.values()),
+            "digest_pending": sum(len(t.digest) for t in self._targets.values()),
+            **self.stats,
+        }
@@ -0,0 +1,155 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Dict
+
+from core.logger import logger
+
+
+class TokenBucket:
+    """
+    异步令牌桶限速器。
+    rate: 每秒补充的令牌数；capacity: 桶容量 (允许的突发数量)。
+    收到 FloodWait 时调用 penalize()，在等待期结束前所有 acquire() 都会阻塞。
+    """
+    def __init__(self, rate: float, capacity: float, name: str = "default"):
+        self.name = name
+        self.rate = max(float(rate), 1e-6)
+        self.capacity = max(float(capacity), 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+        self.flood_wait_count = 0
+        self.total_wait_seconds = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated_at = now
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """获取令牌，必要时等待。返回实际等待的秒数。"""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    delay = self._blocked_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= tokens:
+                        self._tokens -= tokens
+                        break
+                    delay = (tokens - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+        self.total_wait_seconds += waited
+        return waited
+
+    def penalize(self, seconds: float):
+        """FloodWait: 在指定秒数内阻塞并清空令牌"""
+        self.flood_wait_count += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + max(0.0, float(seconds)))
+        self._tokens = 0.0
+        self._updated_at = self._blocked_until
+        logger.warning(f"【限速器:{self.name}】收到 FloodWait，暂停发送 {seconds} 秒。")
+
+    def set_rate(self, rate: float):
+        """调整补充速率 (先按旧速率结算已累积的令牌)"""
+        now = time.monotonic()
+        if now >= self._blocked_until: self._refill(now)
+        self.rate = max(float(rate), 1e-6)
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        if now >= self._blocked_until: self._refill(now)
+        return {
+            "rate_per_minute": round(self.rate * 60, 2), "capacity": self.capacity,
+            "tokens": round(self._tokens, 2),
+            "blocked_for": round(max(0.0, self._blocked_until - now), 1),
+            "flood_waits": self.flood_wait_count,
+            "total_wait_seconds": round(self.total_wait_seconds, 1),
+        }
+
+
+FLOOD_HISTORY_SIZE = 20 # 保留最近的 FloodWait 记录数
+
+
+class AdaptiveRateLimiter:
+    """
+    所有出站 Telegram 调用共享的自适应限速器。
+    每次发送/编辑需先后获取所在会话的令牌桶和全局令牌桶；收到 FloodWait 时暂停并将速率乘以
+    backoff_factor (最低为基础速率的 min_rate_fraction)，之后每 recovery_interval 秒无 FloodWait
+    恢复 recovery_step 倍基础速率，直至回到基础速率。
+    """
+    def __init__(self, global_rate_per_minute: float = 40, global_burst: float = 5,
+                 chat_rate_per_minute: float = 20, chat_burst: float = 3,
+                 backoff_factor: float = 0.5, min_rate_fraction: float = 0.2,
+                 recovery_interval: float = 60, recovery_step: float = 0.1):
+        self.global_base_rate = float(global_rate_per_minute) / 60.0
+        self.chat_base_rate = float(chat_rate_per_minute) / 60.0
+        self.chat_burst = chat_burst
+        self.backoff_factor = backoff_factor
+        self.min_rate_fraction = min_rate_fraction
+        self.recovery_interval = recovery_interval
+        self.recovery_step = recovery_step
+        self.rate_fraction = 1.0 # 当前速率 / 基础速率
+        self._global = TokenBucket(self.global_base_rate, global_burst, name="出站全局")
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._last_adjusted_at = 0.0
+        self.flood_history: deque = deque(maxlen=FLOOD_HISTORY_SIZE)
+        self.stats = {"calls": 0, "throttled": 0, "throttled_seconds": 0.0, "flood_waits": 0}
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_base_rate * self.rate_fraction, self.chat_burst, name=f"会话 {chat_id}")
+        return bucket
+
+    def _apply_fraction(self):
+        self._global.set_rate(self.global_base_rate * self.rate_fraction)
+        for bucket in self._chats.values(): bucket.set_rate(self.chat_base_rate * self.rate_fraction)
+
+    def _maybe_recover(self, now: float):
+        if self.rate_fraction >= 1.0 or now - self._last_adjusted_at < self.recovery_interval: return
+        self.rate_fraction = min(1.0, self.rate_fraction + self.recovery_step)
+        self._last_adjusted_at = now
+        self._apply_fraction()
+        logger.info(f"【出站限速】一段时间内无 FloodWait，速率恢复至基础速率的 {self.rate_fraction:.0%}。")
+
+    async def acquire(self, chat_id: Any = None) -> float:
+        """发送/编辑前调用，必要时等待。返回等待的秒数。"""
+        self._maybe_recover(time.monotonic())
+        self.stats["calls"] += 1
+        waited = 0.0
+        if chat_id is not None: waited += await self._chat_bucket(chat_id).acquire()
+        waited += await self._global.acquire()
+        if waited > 0.01:
+            self.stats["throttled"] += 1
+            self.stats["throttled_seconds"] += waited
+        return waited
+
+    def on_flood_wait(self, seconds: float, chat_id: Any = None):
+        """收到 FloodWait: 暂停全局 (及该会话) 发送并降低速率"""
+        seconds = max(0.0, float(seconds or 0))
+        self.stats["flood_waits"] += 1
+        self.flood_history.append({"at": round(time.time()), "seconds": seconds, "chat_id": chat_id})
+        self._global.penalize(seconds)
+        if chat_id is not None: self._chat_bucket(chat_id).penalize(seconds)
+        self.rate_fraction = max(self.min_rate_fraction, self.rate_fraction * self.backoff_factor)
+        self._last_adjusted_at = time.monotonic() + seconds # 从暂停结束起计算恢复时间
+        self._apply_fraction()
+        logger.warning(f"【出站限速】FloodWait {seconds} 秒 (会话: {chat_id})，速率降至基础速率的 {self.rate_fraction:.0%}。")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "rate_fraction": round(self.rate_fraction, 2),
+            "global_rate_per_minute": round(self.global_base_rate * self.rate_fraction * 60, 2),
+            "chat_rate_per_minute": round(self.chat_base_rate * self.rate_fraction * 60, 2),
+            "global_bucket": self._global.get_stats(),
+            "chats": len(self._chats),
+            **{k: (round(v, 1) if isinstance(v, float) else v) for k, v in self.stats.items()},
+            "flood_history": list(self.flood_history),
+        }
@@ -4,8 +4,117 @@ import asyncio
 from core.config import Config
 from core.logger import logger
 import json
+import time
+from collections import deque
 from typing import Callable, Any, Coroutine, Dict # <--- 修正：导入 Coroutine, Dict
 
+ChannelHandler = Callable[[str, Any], Coroutine[Any, Any, None]]
+AckFunc = Callable[[], Coroutine[Any, Any, None]]
+LATENCY_SAMPLE_SIZE = 200 # 每个频道保留的处理耗时样本数
+
+# --- 传输方式 ---
+TRANSPORT_PUBSUB = "pubsub"   # PUBLISH/SUBSCRIBE: 即发即弃，断线期间的消息丢失
+TRANSPORT_STREAMS = "streams" # Redis Streams + 消费组: XACK 确认，断线/崩溃后可继续读取与回收
+STREAM_DATA_FIELD = "data"
+
+# --- 助手任务频道路由 (communication.task_routing) ---
+TASK_ROUTING_SHARED = "shared"       # 所有实例订阅同一个任务频道，各自按 target_user_id 过滤
+TASK_ROUTING_ADDRESSED = "addressed" # 发布到 {任务频道}:{target_user_id}，实例只订阅自己的频道和广播频道
+TASK_BROADCAST_TARGET = "broadcast"
+
+
+def addressed_task_channel(base_channel: str, target_user_id: Any = None) -> str:
+    """定向任务频道名: {base}:{target_user_id}；target_user_id 为空时为广播频道 {base}:broadcast"""
+    return f"{base_channel}:{target_user_id if target_user_id is not None else TASK_BROADCAST_TARGET}"
+
+
+class _ChannelDispatcher:
+    """
+    单个 PubSub 频道的有界分发器。
+    监听器只负责把原始消息放入队列；由固定数量的 worker 解析 JSON 并调用处理器。
+    ordered=True 时只有一个 worker，消息严格按到达顺序处理。
+    """
+    def __init__(self, channel: str, handler: ChannelHandler, ordered: bool, max_workers: int, max_queue: int):
+        self.channel = channel
+        self.handler = handler
+        self.ordered = ordered
+        self.worker_count = 1 if ordered else max(1, max_workers)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_queue))
+        self._workers: list = []
+        self.stats = {"received": 0, "processed": 0, "failed": 0, "dropped": 0, "decode_errors": 0, "max_depth": 0}
+        self.latencies: deque = deque(maxlen=LATENCY_SAMPLE_SIZE)    # 处理器耗时
+        self.queue_waits: deque = deque(maxlen=LATENCY_SAMPLE_SIZE)  # 排队时间
+
+    def start(self):
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.worker_count:
+            self._workers.append(asyncio.create_task(self._worker(), name=f"redis_channel_worker:{self.channel}"))
+
+    async def stop(self):
+        for worker in self._workers: worker.cancel()
+        for worker in self._workers:
+            try: await worker
+            except asyncio.CancelledError: pass
+            except Exception as e: logger.warning(f"停止频道 '{self.channel}' 的 worker 时出错: {e}")
+        self._workers = []
+
+    def offer(self, data_str: str, ack: AckFunc | None = None) -> bool:
+        """
+        放入队列 (不阻塞监听器)，队列已满时丢弃并返回 False。
+        ack: 处理完成后调用 (Streams 的 XACK)；被丢弃的 Streams 消息不确认，之后由 XAUTOCLAIM 回收。
+        """
+        self.stats["received"] += 1
+        try:
+            self.queue.put_nowait((data_str, time.monotonic(), ack))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            logger.error(f"Redis 频道 '{self.channel}' 的处理队列已满 ({self.queue.maxsize})，丢弃消息: {data_str[:100]}...")
+            return False
+        depth = self.queue.qsize()
+        if depth > self.stats["max_depth"]: self.stats["max_depth"] = depth
+        return True
+
+    async def _worker(self):
+        while True:
+            data_str, received_at, ack = await self.queue.get()
+            try:
+                started = time.monotonic()
+                self.queue_waits.append(started - received_at)
+                try:
+                    data = json.loads(data_str)
+                except json.JSONDecodeError:
+                    self.stats["decode_errors"] += 1
+                    logger.error(f"处理频道 '{self.channel}' 消息时解析 JSON 失败: {data_str[:200]}...")
+                    continue
+                try:
+                    await self.handler(self.channel, data)
+                    self.stats["processed"] += 1
+                except Exception as handler_e:
+                    self.stats["failed"] += 1
+                    logger.error(f"调用频道 '{self.channel}' 处理器时出错: {handler_e}", exc_info=True)
+                finally:
+                    self.latencies.append(time.monotonic() - started)
+            finally:
+                if ack is not None:
+                    try: await ack()
+                    except Exception as ack_e: logger.warning(f"确认频道 '{self.channel}' 的 Streams 消息失败: {ack_e}")
+                self.queue.task_done()
+
+    @staticmethod
+    def _percentile(values, pct: float) -> float:
+        if not values: return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "ordered": self.ordered, "workers": self.worker_count, "depth": self.queue.qsize(), **self.stats,
+            "handler_p50_ms": round(self._percentile(self.latencies, 0.5) * 1000, 1),
+            "handler_p95_ms": round(self._percentile(self.latencies, 0.95) * 1000, 1),
+            "queue_wait_p95_ms": round(self._percentile(self.queue_waits, 0.95) * 1000, 1),
+        }
+
+
 class RedisClient:
     def __init__(self, config: Config):
         self.config = config
@@ -25,9 +134,39 @@ class RedisClient:
         self.client: aioredis.Redis | None = None
         self._pubsub_client: aioredis.Redis | None = None # PubSub 专用客户端
         self._pubsub_connection: aioredis.PubSub | None = None # PubSub 连接对象
-        self._channel_handlers: Dict[str, Callable[[str, Any], Coroutine[Any, Any, None]]] = {}
+        self._channel_handlers: Dict[str, ChannelHandler] = {}
+        self._dispatchers: Dict[str, _ChannelDispatcher] = {} # 每个频道的有界分发器
         self._pubsub_ready_event = asyncio.Event()
         self._listener_task: asyncio.Task | None = None
+        # --- 新增: Redis Streams 传输 (可靠投递，publish/subscribe 接口不变) ---
+        self.transport = str(self.config.get("redis.transport", TRANSPORT_PUBSUB)).lower()
+        if self.transport not in (TRANSPORT_PUBSUB, TRANSPORT_STREAMS):
+            logger.warning(f"未知的 Redis 传输方式 '{self.transport}'，使用 {TRANSPORT_PUBSUB}。")
+            self.transport = TRANSPORT_PUBSUB
+        self.stream_channels = set(self.config.get("redis.stream_channels", []) or []) # 为空时所有频道都走 Streams (pubsub_channels 除外)
+        # 广播 / 失效通知频道需要每个进程都收到，默认保留在 PubSub (Streams 消费组会在同组进程间分摊消息)
+        configured_pubsub_channels = self.config.get("redis.pubsub_channels")
+        if configured_pubsub_channels is None:
+            configured_pubsub_channels = [
+                self.config.get("cache_refresh.invalidation_channel", "cache_invalidate"),
+                self.config.get("shared_data.update_channel", "game_data_updated"),
+                self.config.get("marketplace_transfer.request_channel"),
+            ]
+        self.pubsub_channels = {channel for channel in configured_pubsub_channels if channel}
+        self.stream_prefix = self.config.get("redis.stream_prefix", "stream:")
+        self.stream_maxlen = int(self.config.get("redis.stream_maxlen", 1000))
+        self.stream_reclaim_idle_ms = int(float(self.config.get("redis.stream_reclaim_idle_seconds", 60)) * 1000)
+        # 消费者名称 (也是默认消费组名的一部分) 必须在容器重建后保持不变且每个助手唯一，才能读回断线期间的消息；
+        # 主机名在 Docker 中是随重建变化的容器 ID，因此 Streams 传输要求显式配置
+        self.consumer_name = str(self.config.get("redis.consumer_name") or "")
+        if self.transport == TRANSPORT_STREAMS and not self.consumer_name:
+            logger.error("Redis 传输方式为 streams 但未配置 redis.consumer_name (需每个助手唯一且重启后不变)，回退为 pubsub。")
+            self.transport = TRANSPORT_PUBSUB
+        self._stream_groups: Dict[str, str] = {} # channel -> 消费组
+        self._stream_tasks: Dict[str, asyncio.Task] = {}
+        self._stream_inflight: Dict[str, set] = {} # channel -> 已放入处理队列、尚未确认的条目 ID (避免回收时重复投递)
+        self.stream_stats: Dict[str, Dict[str, int]] = {}
+        # --- 新增结束 ---
 
     async def connect(self):
         # 连接主客户端 (逻辑不变)
@@ -96,6 +235,8 @@ class RedisClient:
     async def close(self):
         """关闭所有 Redis 连接"""
         await self.close_pubsub() # 先关闭 pubsub
+        await self._stop_stream_consumers()
+        for dispatcher in self._dispatchers.values(): await dispatcher.stop()
         if self.client:
              try:
                  await self.client.close()
@@ -145,15 +286,31 @@ class RedisClient:
         """获取主 Redis 客户端 (用于 GET, SET 等)"""
         return self.client
 
+    # --- 新增: Streams 辅助 ---
+    def uses_streams(self, channel: str) -> bool:
+        if self.transport != TRANSPORT_STREAMS: return False
+        if channel in self.stream_channels: return True
+        if channel in self.pubsub_channels: return False
+        if not self.stream_channels: return True
+        # 定向任务频道 ({base}:{目标ID}) 跟随其基础频道的配置
+        return channel.rpartition(":")[0] in self.stream_channels
+
+    def stream_key(self, channel: str) -> str:
+        return f"{self.stream_prefix}{channel}"
+    # --- 新增结束 ---
+
     async def publish(self, channel: str, message: Any):
-        """向指定频道发布消息 (序列化为 JSON)"""
+        """向指定频道发布消息 (序列化为 JSON)；启用 Streams 时写入 stream:{频道} (XADD，按 stream_maxlen 截断)"""
         client = self.get_client()
         if not client:
             logger.error(f"无法发布到频道 '{channel}'：Redis 主客户端未连接。")
             return False
         try:
             message_json = json.dumps(message, ensure_ascii=False)
-            await client.publish(channel, message_json)
+            if self.uses_streams(channel):
+                await client.xadd(self.stream_key(channel), {STREAM_DATA_FIELD: message_json}, maxlen=self.stream_maxlen, approximate=True)
+            else:
+                await client.publish(channel, message_json)
             logger.debug(f"已向 Redis 频道 '{channel}' 发布消息: {message_json[:100]}...")
             return True
         except TypeError as e:
@@ -163,12 +320,30 @@ class RedisClient:
             logger.error(f"发布到频道 '{channel}' 时出错: {e}", exc_info=True)
             return False
 
-    async def subscribe(self, channel: str, handler: Callable[[str, Any], Coroutine[Any, Any, None]]):
-        """注册指定频道的处理器并确保已订阅"""
+    async def subscribe(self, channel: str, handler: ChannelHandler, ordered: bool = False,
+                        max_workers: int = 4, max_queue: int = 1000, group: str | None = None):
+        """
+        注册指定频道的处理器并确保已订阅。
+        ordered: 按到达顺序逐条处理 (单 worker)；否则最多 max_workers 条并发处理。
+        max_queue: 等待处理的消息上限，超出时丢弃新消息并记录。
+        group: 仅 Streams 传输: 消费组名。默认每个助手一个消费组 (每个订阅者都收到全部消息)；
+               多个实例传入相同的组名时，每条消息只由其中一个实例处理。
+        """
         if channel in self._channel_handlers:
             logger.warning(f"频道 '{channel}' 的处理器已被覆盖。")
+            old_dispatcher = self._dispatchers.pop(channel, None)
+            if old_dispatcher: await old_dispatcher.stop()
         self._channel_handlers[channel] = handler
-        logger.info(f"已注册 Redis 频道 '{channel}' 的处理器。")
+        dispatcher = self._dispatchers[channel] = _ChannelDispatcher(channel, handler, ordered, max_workers, max_queue)
+        dispatcher.start()
+        logger.info(f"已注册 Redis 频道 '{channel}' 的处理器 ({'顺序处理' if ordered else f'最多 {dispatcher.worker_count} 并发'})。")
+
+        # --- 新增: Streams 传输由独立的消费任务读取，不经过 PubSub 连接 ---
+        if self.uses_streams(channel):
+            self._stream_groups[channel] = group or f"assistant:{self.consumer_name}"
+            self._start_stream_consumer(channel) # 消费组创建后由消费任务发出就绪事件
+            return
+        # --- 新增结束 ---
 
         if not self._pubsub_connection:
              logger.error(f"无法订阅频道 '{channel}'：PubSub 连接未建立。")
@@ -219,30 +394,23 @@ class RedisClient:
                 # --- 修改结束 ---
                 continue
             try:
-                message = await self._pubsub_connection.get_message(ignore_subscribe_messages=True, timeout=10)
-                if message is None:
-                    # logger.debug("PubSub 监听器：等待消息...")
-                    await asyncio.sleep(0.1) # 短暂休眠
-                    continue
-
-                if message.get("type") == "message":
+                # --- 修改: 阻塞式 listen()，消息到达即交给对应频道的分发器 (不再轮询/休眠) ---
+                async for message in self._pubsub_connection.listen():
+                    if message.get("type") != "message": continue
                     channel = message.get("channel")
                     data_str = message.get("data")
-                    if channel and data_str and channel in self._channel_handlers:
-                        logger.debug(f"收到来自 Redis 频道 '{channel}' 的消息: {data_str[:200]}...")
-                        handler = self._channel_handlers[channel]
-                        try:
-                            data = json.loads(data_str)
-                            asyncio.create_task(handler(channel, data))
-                        except json.JSONDecodeError:
-                             logger.error(f"处理频道 '{channel}' 消息时解析 JSON 失败: {data_str[:200]}...")
-                        except Exception as handler_e:
-                             logger.error(f"调用频道 '{channel}' 处理器时出错: {handler_e}", exc_info=True)
-                    elif channel and channel not in self._channel_handlers:
-                         logger.warning(f"收到频道 '{channel}' 的消息，但未找到对应的处理器。")
-
-            except redis.exceptions.TimeoutError: # 捕获 get_message 的超时
-                 logger.debug("PubSub get_message 超时，继续监听...")
+                    dispatcher = self._dispatchers.get(channel)
+                    if dispatcher is None:
+                        logger.warning(f"收到频道 '{channel}' 的消息，但未找到对应的处理器。")
+                        continue
+                    if data_str: dispatcher.offer(data_str)
+                # listen() 在没有任何订阅时返回，等待下一次订阅
+                self._pubsub_ready_event.clear()
+                await self._pubsub_ready_event.wait()
+                # --- 修改结束 ---
+
+            except redis.exceptions.TimeoutError:
+                 logger.debug("PubSub 读取超时，继续监听...")
                  continue
             except redis.exceptions.ConnectionError as conn_err:
                  logger.error(f"PubSub 监听器: Redis 连接错误: {conn_err}。尝试关闭并等待重连...")
@@ -264,8 +432,10 @@ class RedisClient:
         """重新订阅所有已注册的频道 (在连接恢复后)"""
         # --- 修改: 不再需要等待事件 ---
         # await self._pubsub_ready_event.wait() # 移除等待
+        for dispatcher in self._dispatchers.values(): dispatcher.start() # 确保 worker 在运行 (close 后重连)
+        for channel in self._stream_groups: self._start_stream_consumer(channel)
         if self._pubsub_connection: # 检查连接是否存在
-            channels_to_subscribe = list(self._channel_handlers.keys())
+            channels_to_subscribe = [channel for channel in self._channel_handlers if channel not in self._stream_groups]
             if channels_to_subscribe:
                 try:
                     logger.info(f"正在重新订阅 Redis 频道: {', '.join(channels_to_subscribe)}")
@@ -289,3 +459,94 @@ class RedisClient:
                     logger.info("PubSub 监听器已就绪 (无频道订阅)。")
     # --- 修改结束 ---
 
+    # --- 新增: 频道分发统计 ---
+    def get_pubsub_stats(self) -> Dict[str, Any]:
+        """返回各订阅频道的队列深度与处理耗时统计"""
+        stats = {channel: dispatcher.get_stats() for channel, dispatcher in self._dispatchers.items()}
+        for channel, stream_stats in self.stream_stats.items():
+            if channel in stats: stats[channel].update({"transport": TRANSPORT_STREAMS, "group": self._stream_groups.get(channel), **stream_stats})
+        return stats
+
+    # --- 新增: Redis Streams 消费 ---
+    def _start_stream_consumer(self, channel: str):
+        task = self._stream_tasks.get(channel)
+        if task is None or task.done():
+            self._stream_tasks[channel] = asyncio.create_task(self._stream_consumer(channel), name=f"redis_stream_consumer:{channel}")
+
+    async def _stop_stream_consumers(self):
+        for task in self._stream_tasks.values(): task.cancel()
+        for task in self._stream_tasks.values():
+            try: await task
+            except asyncio.CancelledError: pass
+            except Exception as e: logger.warning(f"停止 Streams 消费任务时出错: {e}")
+        self._stream_tasks = {}
+
+    async def _ensure_stream_group(self, client: aioredis.Redis, key: str, group: str):
+        try:
+            # 新建消费组从当前末尾开始，避免首次启动时重放历史消息；之后进度由 Redis 保存
+            await client.xgroup_create(key, group, id="$", mkstream=True)
+            logger.info(f"已创建 Redis Streams 消费组 '{group}' (Stream: {key})。")
+        except redis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e): raise
+
+    def _offer_stream_entries(self, channel: str, key: str, group: str, entries) -> int:
+        dispatcher = self._dispatchers.get(channel)
+        if dispatcher is None: return 0
+        inflight = self._stream_inflight.setdefault(channel, set())
+        offered = 0
+        for entry_id, fields in entries or []:
+            if not fields or entry_id in inflight: continue # 已被截断删除，或仍在处理队列中
+            async def ack(entry_id=entry_id):
+                inflight.discard(entry_id)
+                client = self.get_client()
+                if client: await client.xack(key, group, entry_id)
+            if dispatcher.offer(fields.get(STREAM_DATA_FIELD, ""), ack=ack):
+                inflight.add(entry_id); offered += 1
+        return offered
+
+    async def _stream_consumer(self, channel: str):
+        """XREADGROUP 读取新消息；启动时先读回本消费者未确认的消息，并定期用 XAUTOCLAIM 回收空闲过久的消息"""
+        key = self.stream_key(channel); group = self._stream_groups[channel]
+        stats = self.stream_stats.setdefault(channel, {"read": 0, "reclaimed": 0, "errors": 0})
+        group_ready = False; read_own_pending = True; next_reclaim_at = 0.0
+        while True:
+            client = self.get_client()
+            if not client:
+                await asyncio.sleep(5); continue
+            try:
+                if not group_ready:
+                    await self._ensure_stream_group(client, key, group)
+                    group_ready = True
+                    # 消费组已存在后才发出就绪事件: 之后发布的消息一定会被本消费组读到
+                    asyncio.create_task(self._emit_channel_ready_event(channel))
+                if read_own_pending:
+                    # ID "0": 本消费者已读取但未确认的消息 (上次运行崩溃/断线时遗留)
+                    response = await client.xreadgroup(group, self.consumer_name, {key: "0"}, count=100)
+                    for _, entries in response or []:
+                        stats["reclaimed"] += self._offer_stream_entries(channel, key, group, entries)
+                    read_own_pending = False
+                now = time.monotonic()
+                if now >= next_reclaim_at:
+                    next_reclaim_at = now + max(5.0, self.stream_reclaim_idle_ms / 1000)
+                    claimed = await client.xautoclaim(key, group, self.consumer_name, min_idle_time=self.stream_reclaim_idle_ms, start_id="0-0", count=50)
+                    if claimed and len(claimed) > 1:
+                        reclaimed = self._offer_stream_entries(channel, key, group, claimed[1])
+                        if reclaimed:
+                            stats["reclaimed"] += reclaimed
+                            logger.info(f"【Redis Streams】已回收 '{key}' 中 {reclaimed} 条空闲未确认的消息。")
+                response = await client.xreadgroup(group, self.consumer_name, {key: ">"}, count=50, block=5000)
+                for _, entries in response or []:
+                    stats["read"] += len(entries)
+                    self._offer_stream_entries(channel, key, group, entries)
+            except asyncio.CancelledError:
+                logger.info(f"Redis Streams 消费任务 ({key}) 已取消。"); break
+            except redis.exceptions.ResponseError as e:
+                stats["errors"] += 1
+                if "NOGROUP" in str(e): group_ready = False # Stream 被删除后重建消费组
+                logger.error(f"Redis Streams 消费 ({key}) 出错: {e}")
+                await asyncio.sleep(1)
+            except Exception as e:
+                stats["errors"] += 1
+                logger.error(f"Redis Streams 消费 ({key}) 出错: {e.__class__.__name__}: {e}，5 秒后重试。")
+                await asyncio.sleep(5)
+    # --- 新增结束 ---
@@ -0,0 +1,61 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+# 每次同步都会变化、不代表内容变化的字段
+VOLATILE_FIELDS = ("_internal_last_updated", "_internal_fetched_at")
+
+
+def content_of(data: Optional[Dict]) -> Optional[Dict]:
+    """去掉易变字段后的内容 (用于判断两次同步的数据是否相同)"""
+    if not isinstance(data, dict): return data
+    content = {key: value for key, value in data.items() if key not in VOLATILE_FIELDS}
+    summary = content.get("summary")
+    if isinstance(summary, dict) and "last_updated" in summary: # 背包摘要中的更新时间
+        content["summary"] = {key: value for key, value in summary.items() if key != "last_updated"}
+    return content
+
+
+def changed_fields(old: Optional[Dict], new: Optional[Dict]) -> Dict[str, Tuple[Any, Any]]:
+    """顶层字段差异 {字段: (旧值, 新值)}，忽略易变字段"""
+    old_content = content_of(old) or {}; new_content = content_of(new) or {}
+    return {
+        key: (old_content.get(key), new_content.get(key))
+        for key in old_content.keys() | new_content.keys()
+        if old_content.get(key) != new_content.get(key)
+    }
+
+
+def _inventory_quantities(inventory: Optional[Dict]) -> Dict[str, Tuple[str, int]]:
+    quantities: Dict[str, Tuple[str, int]] = {}
+    if not isinstance(inventory, dict): return quantities
+    for items in (inventory.get("items_by_type") or {}).values():
+        if not isinstance(items, list): continue
+        for item in items:
+            if not isinstance(item, dict) or "item_id" not in item: continue
+            name, quantity = quantities.get(item["item_id"], (item.get("name"), 0))
+            quantities[item["item_id"]] = (name, quantity + (item.get("quantity") or 0))
+    return quantities
+
+
+def diff_inventory(old: Optional[Dict], new: Optional[Dict]) -> List[Tuple[str, str, int, int]]:
+    """背包数量变化 [(item_id, 名称, 旧数量, 新数量)]，新增/消失的物品数量记为 0"""
+    old_quantities = _inventory_quantities(old); new_quantities = _inventory_quantities(new)
+    changes = []
+    for item_id in old_quantities.keys() | new_quantities.keys():
+        old_name, old_quantity = old_quantities.get(item_id, (None, 0))
+        new_name, new_quantity = new_quantities.get(item_id, (None, 0))
+        if old_quantity != new_quantity:
+            changes.append((item_id, new_name or old_name, old_quantity, new_quantity))
+    return changes
+
+
+def diff_plots(old: Optional[Dict], new: Optional[Dict]) -> List[Tuple[str, Optional[Dict], Optional[Dict]]]:
+    """药园 / 观星台地块变化 [(plot_id, 旧地块, 新地块)]"""
+    old_plots = (old or {}).get("plots") if isinstance(old, dict) else None
+    new_plots = (new or {}).get("plots") if isinstance(new, dict) else None
+    old_plots = old_plots if isinstance(old_plots, dict) else {}
+    new_plots = new_plots if isinstance(new_plots, dict) else {}
+    return [
+        (plot_id, old_plots.get(plot_id), new_plots.get(plot_id))
+        for plot_id in sorted(old_plots.keys() | new_plots.keys(), key=str)
+        if old_plots.get(plot_id) != new_plots.get(plot_id)
+    ]
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from core.logger import logger
+
+SyncFunc = Callable[[List[str]], Awaitable[Any]] # 返回 False 视为同步失败
+
+
+class SyncCoordinator:
+    """
+    同步请求协调器。
+    debounce_seconds 内的多次请求合并为一次同步 (合并原因)，两次同步之间至少间隔 min_interval_seconds；
+    urgent 请求跳过防抖和最小间隔。同步进行中收到的请求在其完成后再合并执行一次。
+    """
+    def __init__(self, sync_func: SyncFunc, debounce_seconds: float = 10.0, min_interval_seconds: float = 30.0,
+                 name: str = "同步"):
+        self.sync_func = sync_func
+        self.debounce_seconds = debounce_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self.name = name
+        self._reasons: List[str] = []
+        self._pending = False
+        self._urgent = False
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._running: Optional[asyncio.Task] = None
+        self._last_sync_at: Optional[float] = None
+        self.stats = {"requests": 0, "urgent": 0, "suppressed": 0, "syncs": 0, "failures": 0}
+
+    def request(self, reason: Optional[str] = None, urgent: bool = False):
+        """提交一次同步请求"""
+        self.stats["requests"] += 1
+        if urgent: self.stats["urgent"] += 1
+        if self._pending: self.stats["suppressed"] += 1 # 与已在等待的请求合并
+        if reason and reason not in self._reasons: self._reasons.append(reason)
+        self._pending = True
+        self._urgent = self._urgent or urgent
+        if self._running and not self._running.done(): return # 完成后再处理
+        self._schedule()
+
+    def _schedule(self):
+        now = time.monotonic()
+        if self._urgent:
+            delay = 0.0
+        else:
+            delay = self.debounce_seconds
+            if self._last_sync_at is not None:
+                delay = max(delay, self._last_sync_at + self.min_interval_seconds - now)
+        if self._handle:
+            if not self._urgent: return # 保持第一次请求时确定的窗口，不无限顺延
+            self._handle.cancel()
+        self._handle = asyncio.get_running_loop().call_later(max(0.0, delay), self._start)
+
+    def _start(self):
+        self._handle = None
+        if not self._pending: return
+        reasons, self._reasons = self._reasons, []
+        self._pending = False; self._urgent = False
+        self._running = asyncio.create_task(self._run(reasons))
+
+    async def _run(self, reasons: List[str]):
+        self._last_sync_at = time.monotonic()
+        self.stats["syncs"] += 1
+        logger.info(f"【{self.name}】执行同步 (原因: {', '.join(reasons) or '未说明'})。")
+        try:
+            if await self.sync_func(reasons) is False: self.stats["failures"] += 1
+        except Exception as e:
+            self.stats["failures"] += 1
+            logger.error(f"【{self.name}】同步时出错: {e}", exc_info=True)
+        finally:
+            self._running = None
+            if self._pending: self._schedule()
+
+    def cancel(self):
+        if self._handle: self._handle.cancel(); self._handle = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "debounce_seconds": self.debounce_seconds, "min_interval_seconds": self.min_interval_seconds,
+            "pending": self._pending, "pending_reasons": list(self._reasons), **self.stats,
+        }
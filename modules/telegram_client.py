@@ -1,6 +1,7 @@
 from pyrogram import Client, filters, idle
 from pyrogram.types import Message, User, ReplyParameters, MessageEntity, LinkPreviewOptions
 from pyrogram.enums import ChatType, MessageEntityType
+from pyrogram.errors import FloodWait
 from core.config import Config
 from core.event_bus import EventBus
 from core.logger import logger
@@ -11,7 +12,14 @@ import re
 from typing import Tuple, Optional, Any
 # --- (修改结束) ---
 
-from asyncio import Queue
+from modules.command_queue import PriorityCommandQueue, GameCommand
+from modules.rate_limiter import TokenBucket, AdaptiveRateLimiter
+from modules.command_correlator import CommandCorrelator
+from modules.game_message_classifier import GameMessage, GameMessageClassifier, GAME_RESPONSE_CATEGORY_EVENT, GAME_RESPONSE_RAW_EDIT_EVENT
+from modules.edit_coalescer import EditCoalescer
+from modules.notification_aggregator import NotificationAggregator, NOTIFY_NORMAL
+from modules.redis_client import TASK_ROUTING_SHARED, TASK_ROUTING_ADDRESSED, addressed_task_channel
+import time
 
 class TelegramClient:
     def __init__(self, event_bus: EventBus, config: Config):
@@ -23,6 +31,7 @@ class TelegramClient:
         # --- 新增: 引用 RedisClient ---
         self.redis_client = None # 将在 AppContext 中设置
         self.task_channel = self.config.get("communication.task_channel", "assistant_tasks")
+        self.task_routing = self.config.get("communication.task_routing", TASK_ROUTING_SHARED)
         # --- 新增结束 ---
 
         session_path = "data/my_game_assistant"
@@ -43,10 +52,64 @@ class TelegramClient:
         self.control_chat_id = self.config.get("telegram.control_chat_id", 0)
         self.game_bot_ids = self.config.get("telegram.game_bot_ids", [])
 
-        self.command_queue = Queue()
+        # --- 修改: 按优先级分通道的指令队列 (urgent / normal / bulk) ---
+        self.command_queue = PriorityCommandQueue(self.config.get("telegram.command_lane_ttl", {}))
+        # --- 修改结束 ---
         self.queue_task: asyncio.Task | None = None
         self.COMMAND_DELAY_SECONDS = self.config.get("telegram.command_delay", 10.5)
         logger.info(f"【消息队列】游戏指令发送延迟设置为: {self.COMMAND_DELAY_SECONDS} 秒。")
+        # --- 新增: 响应驱动的发送节奏 ---
+        # fixed: 每条指令发送后固定等待 command_delay；
+        # ack: 收到游戏 Bot 对上一条指令的回复即放行下一条 (至少间隔 min_command_gap，最多等待 command_delay)
+        self.pacing_mode = str(self.config.get("telegram.pacing_mode", "fixed")).lower()
+        if self.pacing_mode not in ("fixed", "ack"):
+            logger.warning(f"【消息队列】未知的 pacing_mode '{self.pacing_mode}'，使用 fixed。")
+            self.pacing_mode = "fixed"
+        self.MIN_COMMAND_GAP_SECONDS = float(self.config.get("telegram.min_command_gap", 3.0))
+        self.command_bucket = TokenBucket(
+            rate=float(self.config.get("telegram.command_rate_per_minute", 20)) / 60.0,
+            capacity=float(self.config.get("telegram.command_burst", 3)),
+            name="游戏指令"
+        )
+        # --- 新增: 所有出站发送/编辑共享的自适应限速器 (全局 + 每会话令牌桶，FloodWait 时自动降速) ---
+        self.outbound_limiter = AdaptiveRateLimiter(
+            global_rate_per_minute=float(self.config.get("telegram.outbound_rate_per_minute", 40)),
+            global_burst=float(self.config.get("telegram.outbound_burst", 5)),
+            chat_rate_per_minute=float(self.config.get("telegram.outbound_chat_rate_per_minute", 20)),
+            chat_burst=float(self.config.get("telegram.outbound_chat_burst", 3))
+        )
+        self.OUTBOUND_FLOOD_RETRIES = 1 # FloodWait 后自动重试的次数
+        self.OUTBOUND_MAX_FLOOD_SLEEP = float(self.config.get("telegram.outbound_max_flood_sleep", 120)) # 超过该秒数的 FloodWait 不自动重试
+        # --- 新增结束 ---
+        # --- 新增: 游戏消息分类器 (插件在 register 时登记分类关键词) ---
+        self.classifier = GameMessageClassifier()
+        # --- 新增结束 ---
+        # --- 新增: 游戏 Bot 编辑消息合并 (settle: 静默后分发最后一次编辑; change: 分类/字段变化才分发; off: 每次都分发) ---
+        self.edit_coalescer = EditCoalescer(
+            self._dispatch_settled_edit,
+            mode=str(self.config.get("telegram.edit_coalesce_mode", "settle")).lower(),
+            settle_seconds=float(self.config.get("telegram.edit_settle_seconds", 1.5)),
+            max_delay=float(self.config.get("telegram.edit_max_delay", 10.0))
+        )
+        # --- 新增结束 ---
+        # --- 新增: 指令/响应关联器 ---
+        self.correlator = CommandCorrelator(event_bus, retention_seconds=float(self.config.get("telegram.correlator_retention", 900)))
+        # --- 新增结束 ---
+        # --- 新增: 通知合并 (合并窗口内的普通通知合并为一条消息，可选每小时/每日摘要) ---
+        self.notifier = NotificationAggregator(
+            window_seconds=float(self.config.get("notifications.batch_window_seconds", 5.0)),
+            digest_mode=str(self.config.get("notifications.digest_mode", "off")).lower(),
+            digest_hour=int(self.config.get("notifications.digest_hour", 21))
+        )
+        self.notifier.add_target("system", self._deliver_system_notification)
+        self.notifier.add_target("admin_private", self._deliver_admin_private_message)
+        # --- 新增结束 ---
+        self._awaiting_ack_msg_id: int | None = None
+        self._ack_event = asyncio.Event()
+        self.ack_stats = {"acked": 0, "ack_timeouts": 0, "flood_waits": 0}
+        if self.pacing_mode == "ack":
+            logger.info(f"【消息队列】发送节奏: ack (最小间隔 {self.MIN_COMMAND_GAP_SECONDS} 秒，最长等待 {self.COMMAND_DELAY_SECONDS} 秒)。")
+        # --- 新增结束 ---
 
     # --- 新增: 设置 RedisClient 引用 ---
     def set_redis_client(self, redis_client):
@@ -81,48 +144,55 @@ class TelegramClient:
         logger.info("【消息队列】游戏指令队列处理器已启动。")
         while True:
             try:
-                command_to_send_raw = await self.command_queue.get()
-                original_command = command_to_send_raw
-                command_to_send = command_to_send_raw
-                reply_to_id = None; reply_params = None
-
-                reply_match = re.search(r" --reply_to (\d+)$", command_to_send_raw)
-                if reply_match:
-                    try:
-                        reply_to_id = int(reply_match.group(1))
-                        command_to_send = command_to_send_raw[:reply_match.start()].strip()
-                        reply_params = ReplyParameters(message_id=reply_to_id)
-                        logger.debug(f"【消息队列】解析到回复标记，将回复 MsgID: {reply_to_id}，实际发送指令: '{command_to_send}'")
-                    except ValueError:
-                         logger.error(f"【消息队列】解析回复标记 MsgID 失败: '{reply_match.group(1)}'。按普通指令发送。")
-                         reply_to_id = None; reply_params = None; command_to_send = command_to_send_raw
+                game_command = await self.command_queue.get()
+                original_command = command_to_send = game_command.text
+                reply_to_id = game_command.reply_to
+                reply_params = ReplyParameters(message_id=reply_to_id) if reply_to_id else None
 
                 if not self.target_chat_id:
                     logger.error(f"【消息队列】无法发送指令 '{original_command}'：未配置 target_chat_id。")
-                    self.command_queue.task_done(); continue
+                    game_command.settle(None); continue
                 if not self.app.is_connected:
                      logger.error(f"【消息队列】无法发送指令 '{original_command}'：Telegram 客户端未连接。放回队列重试。")
-                     # 简单的重试逻辑，避免无限循环
-                     retry_count = getattr(command_to_send_raw, '_retry_count', 0)
+                     # 简单的重试逻辑，避免无限循环 (放回原通道队首，保留截止时间)
+                     retry_count = game_command.retry_count
                      if retry_count < 3:
-                        setattr(command_to_send_raw, '_retry_count', retry_count + 1)
-                        await self.command_queue.put(command_to_send_raw)
+                        game_command.retry_count = retry_count + 1
+                        self.command_queue.requeue(game_command)
                         logger.info(f"指令 '{original_command[:30]}...' 放回队列重试 ({retry_count + 1}/3)")
                      else:
                         logger.error(f"指令 '{original_command[:30]}...' 重试次数过多，丢弃。")
+                        game_command.settle(None)
                      await asyncio.sleep(self.COMMAND_DELAY_SECONDS * (retry_count + 1)) # 增加重试延迟
-                     self.command_queue.task_done(); continue
+                     continue
 
+                sent_message = None; sent_at = None
+                await self.command_bucket.acquire()
+                await self.outbound_limiter.acquire(self.target_chat_id)
                 try:
+                    self._ack_event.clear()
                     sent_message = await self.app.send_message(self.target_chat_id, command_to_send, reply_parameters=reply_params)
+                    self._awaiting_ack_msg_id = sent_message.id
+                    sent_at = time.monotonic()
+                    self.correlator.track(sent_message.id, original_command)
+                    game_command.settle(sent_message)
                     # --- 修改: 添加 try-except ---
                     try:
                         safe_log_preview = command_to_send[:30].encode('utf-8', errors='replace').decode('utf-8', errors='replace')
                     except Exception:
                         safe_log_preview = "[预览创建失败]"
                     # --- 修改结束 ---
-                    logger.info(f"【消息队列】已发送游戏指令: {safe_log_preview}... (MsgID: {sent_message.id}){' (回复 '+str(reply_to_id)+')' if reply_to_id else ''}")
+                    self.command_queue.mark_sent(game_command)
+                    logger.info(f"【消息队列】已发送游戏指令 [{game_command.priority}]: {safe_log_preview}... (MsgID: {sent_message.id}, 排队 {game_command.waited():.1f} 秒, 来源: {game_command.origin or '未知'}, ID: {game_command.correlation_id}){' (回复 '+str(reply_to_id)+')' if reply_to_id else ''}")
                     await self.event_bus.emit("game_command_sent", sent_message, original_command)
+                except FloodWait as fw:
+                    # --- 新增: FloodWait 时暂停令牌桶并把指令放回原通道队首 ---
+                    wait_seconds = getattr(fw, "value", None) or 30
+                    self.ack_stats["flood_waits"] += 1
+                    self.command_bucket.penalize(wait_seconds)
+                    self.outbound_limiter.on_flood_wait(wait_seconds, self.target_chat_id)
+                    self.command_queue.requeue(game_command)
+                    logger.warning(f"【消息队列】发送指令 '{original_command[:30]}...' 触发 FloodWait ({wait_seconds} 秒)，已放回队列。")
                 except Exception as e:
                     # --- 修改: 添加 try-except ---
                     try:
@@ -131,10 +201,10 @@ class TelegramClient:
                          safe_log_preview_err = "[预览创建失败]"
                     # --- 修改结束 ---
                     logger.error(f"【消息队列】发送游戏指令 '{safe_log_preview_err}...' 时失败: {e}")
+                    game_command.settle(None)
                     await self.event_bus.emit("game_command_failed", original_command, str(e))
                 finally:
-                    self.command_queue.task_done()
-                    await asyncio.sleep(self.COMMAND_DELAY_SECONDS)
+                    await self._pace_after_send(sent_message, sent_at)
             except asyncio.CancelledError:
                  logger.info("【消息队列】队列处理器任务被取消。"); break
             except Exception as e:
@@ -142,15 +212,47 @@ class TelegramClient:
                 await asyncio.sleep(60)
                 try:
                     # 尝试清空可能的坏消息
-                    while not self.command_queue.empty():
-                        bad_item = self.command_queue.get_nowait()
-                        logger.warning(f"从队列中丢弃潜在的错误项: {str(bad_item)[:50]}")
-                        self.command_queue.task_done()
-                except asyncio.QueueEmpty:
-                    pass
+                    dropped = self.command_queue.clear()
+                    if dropped: logger.warning(f"从队列中丢弃 {dropped} 条潜在的错误项。")
                 except Exception as td_err:
                     logger.error(f"【消息队列】严重错误处理中尝试清空队列时发生未知错误: {td_err}")
 
+    async def _pace_after_send(self, sent_message: Message | None, sent_at: float | None):
+        """发送后的节奏控制: fixed 模式固定等待；ack 模式等待游戏 Bot 回复该 MsgID"""
+        if self.pacing_mode != "ack" or sent_message is None or sent_at is None:
+            await asyncio.sleep(self.COMMAND_DELAY_SECONDS)
+            return
+        try:
+            await asyncio.wait_for(self._ack_event.wait(), timeout=self.COMMAND_DELAY_SECONDS)
+            self.ack_stats["acked"] += 1
+            logger.debug(f"【消息队列】收到对 MsgID {sent_message.id} 的回复 (用时 {time.monotonic() - sent_at:.1f} 秒)。")
+        except asyncio.TimeoutError:
+            self.ack_stats["ack_timeouts"] += 1
+            logger.debug(f"【消息队列】等待 MsgID {sent_message.id} 的回复超时，按 command_delay 放行下一条。")
+        finally:
+            self._awaiting_ack_msg_id = None
+        remaining_gap = self.MIN_COMMAND_GAP_SECONDS - (time.monotonic() - sent_at)
+        if remaining_gap > 0: await asyncio.sleep(remaining_gap)
+
+    def _note_command_ack(self, message: Message):
+        """游戏 Bot 回复了正在等待的指令时，唤醒队列处理器"""
+        if self._awaiting_ack_msg_id is not None and message.reply_to_message_id == self._awaiting_ack_msg_id:
+            self._ack_event.set()
+
+    async def _dispatch_game_response(self, message: Message, is_reply_to_me: bool, is_mentioning_me: bool, is_edited: bool,
+                                      game_message: Optional[GameMessage] = None):
+        """对游戏消息分类一次，然后触发通用事件和各分类事件 game_response:{分类}"""
+        if game_message is None:
+            game_message = self.classifier.classify(message, is_reply_to_me, is_mentioning_me, is_edited=is_edited)
+        if not is_edited: self.edit_coalescer.note_new(message, game_message)
+        await self.event_bus.emit("game_response_received", message, is_reply_to_me, is_mentioning_me)
+        for category in game_message.categories:
+            await self.event_bus.emit(GAME_RESPONSE_CATEGORY_EVENT.format(category), message, is_reply_to_me, is_mentioning_me, game_message)
+
+    async def _dispatch_settled_edit(self, message: Message, is_reply_to_me: bool, is_mentioning_me: bool, game_message: GameMessage):
+        """编辑合并器的回调: 按普通游戏消息分发合并后的编辑"""
+        await self._dispatch_game_response(message, is_reply_to_me, is_mentioning_me, is_edited=True, game_message=game_message)
+
     def _is_from_game_bot(self, message: Message) -> bool:
         """检查消息是否来自配置的游戏机器人ID之一"""
         if not self.game_bot_ids: return False
@@ -203,8 +305,9 @@ class TelegramClient:
 
         my_current_id = await self.get_my_id()
 
-        # 检查是否是发给自己的任务
-        if target_user_id is None or target_user_id != my_current_id:
+        # 检查是否是发给自己的任务 (广播频道的任务所有实例都执行)
+        is_broadcast = channel == addressed_task_channel(self.task_channel)
+        if not is_broadcast and (target_user_id is None or target_user_id != my_current_id):
             # logger.debug(f"忽略非本实例的任务 (Target: {target_user_id}, MyID: {my_current_id})")
             return
 
@@ -251,6 +354,8 @@ class TelegramClient:
 
              @self.app.on_message(game_filter, group=1)
              async def on_game_response(client: Client, message: Message):
+                 self._note_command_ack(message)
+                 self.correlator.resolve(message)
                  is_reply_to_me, is_mentioning_me = await self._calculate_target_flags(message)
 
                  raw_text = message.text or message.caption or ""
@@ -271,7 +376,7 @@ class TelegramClient:
                  if is_reply_to_me: logger.info(f"【TG交互】游戏 Bot ({sender_type}:{sender_id}) 回复了我: {log_content}...")
                  if is_mentioning_me: logger.info(f"【TG交互】游戏 Bot ({sender_type}:{sender_id}) @提及了我: {log_content}...")
 
-                 await self.event_bus.emit("game_response_received", message, is_reply_to_me, is_mentioning_me)
+                 await self._dispatch_game_response(message, is_reply_to_me, is_mentioning_me, is_edited=False)
         else:
              logger.warning("游戏消息监听器未启动: 配置缺失 game_bot_ids 或 target_chat_id。")
 
@@ -304,6 +409,7 @@ class TelegramClient:
                  logger.info(f"游戏机器人编辑消息监听器: 监听群组 {self.target_chat_id}。")
                  @self.app.on_edited_message(game_filter, group=2) # 使用与 on_game_response 相同的过滤器
                  async def on_game_edited_response(client: Client, message: Message):
+                     self.correlator.resolve(message)
                      is_reply_to_me, is_mentioning_me = await self._calculate_target_flags(message)
 
                      raw_text = message.text or message.caption or ""
@@ -320,8 +426,11 @@ class TelegramClient:
                      sender_type = "Channel" if message.sender_chat else ("User" if message.from_user else "未知")
                      logger.debug(f"收到游戏回复 (编辑) (From {sender_type}:{sender_id}, RTM:{is_reply_to_me}, MM:{is_mentioning_me}): {log_content}...")
 
-                     # 触发 game_response_received 事件
-                     await self.event_bus.emit("game_response_received", message, is_reply_to_me, is_mentioning_me)
+                     # --- 修改: 每次编辑触发原始编辑事件，合并后再触发 game_response_received 及分类事件 ---
+                     game_message = self.classifier.classify(message, is_reply_to_me, is_mentioning_me, is_edited=True)
+                     await self.event_bus.emit(GAME_RESPONSE_RAW_EDIT_EVENT, message, is_reply_to_me, is_mentioning_me, game_message)
+                     await self.edit_coalescer.submit(message, is_reply_to_me, is_mentioning_me, game_message)
+                     # --- 修改结束 ---
         else:
              logger.warning("通用/编辑消息日志监听器未启动: 未配置 target_chat_id。")
 
@@ -334,31 +443,118 @@ class TelegramClient:
         self.event_bus.on("send_admin_private_notification", self.send_admin_private_message) # 新增
         logger.info("Telegram 事件监听器已注册。")
 
-    async def send_game_command(self, command: str) -> bool:
-        """将指令放入当前实例的发送队列""" #<-- 修改注释
-        if not command:
+    def _build_game_command(self, command: GameCommand | str, priority: str | None,
+                            deadline: float | None, origin: str | None) -> GameCommand:
+        """将字符串或 GameCommand 统一为 GameCommand，显式传入的参数覆盖指令自带的值"""
+        if isinstance(command, GameCommand):
+            game_command = command
+        else:
+            game_command = GameCommand.from_text(command)
+        if priority is not None: game_command.priority = priority
+        if deadline is not None: game_command.deadline = deadline
+        if origin is not None: game_command.origin = origin
+        return game_command
+
+    async def send_game_command(self, command: GameCommand | str, priority: str | None = None,
+                                deadline: float | None = None, ttl: float | None = None,
+                                origin: str | None = None) -> bool:
+        """
+        将指令放入当前实例的发送队列。
+        command: GameCommand，或兼容旧协议的字符串 (可带 ' --reply_to <id>' 后缀)。
+        priority: urgent / normal / bulk；deadline (time.monotonic() 时间点) 或 ttl (秒) 指定截止时间，
+        未指定时使用通道默认有效期，过期未发出的指令会被丢弃。
+        """
+        if not command or (isinstance(command, GameCommand) and not command.text):
             logger.warning("【消息队列】尝试发送空指令，已忽略。")
             return False
         try:
-            await self.command_queue.put(command)
+            game_command = self._build_game_command(command, priority, deadline, origin)
+            self.command_queue.put_nowait(game_command, ttl=ttl)
             # --- 修改: 添加 try-except ---
             try:
-                safe_log_preview_q = command[:30].encode('utf-8', errors='replace').decode('utf-8', errors='replace')
+                safe_log_preview_q = game_command.text[:30].encode('utf-8', errors='replace').decode('utf-8', errors='replace')
             except Exception:
                  safe_log_preview_q = "[预览创建失败]"
             # --- 修改结束 ---
-            logger.info(f"【消息队列】指令 '{safe_log_preview_q}...' 已加入本实例队列 (当前队列大小: {self.command_queue.qsize()})。")
+            logger.info(f"【消息队列】指令 '{safe_log_preview_q}...' 已加入本实例队列 [{game_command.priority}] (当前队列大小: {self.command_queue.qsize()})。")
             return True
         except Exception as e:
             # --- 修改: 添加 try-except ---
             try:
-                safe_log_preview_q_err = command[:30].encode('utf-8', errors='replace').decode('utf-8', errors='replace')
+                safe_log_preview_q_err = str(command)[:30].encode('utf-8', errors='replace').decode('utf-8', errors='replace')
             except Exception:
                  safe_log_preview_q_err = "[预览创建失败]"
             # --- 修改结束 ---
             logger.error(f"【消息队列】将指令 '{safe_log_preview_q_err}...' 加入队列时失败: {e}", exc_info=True)
             return False
 
+    async def send_game_command_and_wait(self, command: GameCommand | str, timeout: float = 60, priority: str | None = None,
+                                         deadline: float | None = None, ttl: float | None = None,
+                                         origin: str | None = None) -> Optional[Message]:
+        """
+        将指令加入队列，并等待游戏 Bot 对该指令的回复。
+        返回回复 (或编辑后回复) 该指令的 Bot 消息；指令未能发出或在 timeout 秒内无回复时返回 None。
+        """
+        if not command or (isinstance(command, GameCommand) and not command.text):
+            logger.warning("【消息队列】尝试发送空指令，已忽略。")
+            return None
+        try:
+            game_command = self._build_game_command(command, priority, deadline, origin)
+            game_command.sent_future = asyncio.get_running_loop().create_future()
+            self.command_queue.put_nowait(game_command, ttl=ttl)
+        except Exception as e:
+            logger.error(f"【消息队列】将指令 '{str(command)[:30]}...' 加入队列时失败: {e}", exc_info=True)
+            return None
+        logger.info(f"【消息队列】指令 '{game_command.text[:30]}...' 已加入本实例队列并等待回复 [{game_command.priority}] (当前队列大小: {self.command_queue.qsize()})。")
+        sent_message = await game_command.sent_future
+        if sent_message is None:
+            logger.warning(f"【消息队列】指令 '{game_command.text[:30]}...' 未能发出，不再等待回复。")
+            return None
+        reply = await self.correlator.wait_for(sent_message.id, timeout)
+        if reply is None:
+            logger.warning(f"【消息队列】等待指令 '{game_command.text[:30]}...' (MsgID: {sent_message.id}) 的回复超时 ({timeout} 秒)。")
+        return reply
+
+    def get_command_queue_stats(self) -> dict:
+        """返回指令队列各优先级通道的深度与等待时间统计"""
+        stats = self.command_queue.get_stats()
+        stats["correlator"] = self.correlator.get_stats()
+        stats["pacing"] = {"mode": self.pacing_mode, **self.ack_stats, "bucket": self.command_bucket.get_stats()}
+        stats["edits"] = self.edit_coalescer.get_stats()
+        stats["notifications"] = self.notifier.get_stats()
+        stats["outbound"] = self.outbound_limiter.get_stats()
+        return stats
+
+
+    # --- 新增: 经过出站限速器的发送/编辑 (插件应使用这些方法而非直接调用 self.app) ---
+    async def _call_outbound(self, chat_id: Any, api_call, *args, **kwargs):
+        """先获取限速令牌再调用 Telegram API；FloodWait 时通知限速器，并在等待不太长时重试"""
+        attempt = 0
+        while True:
+            await self.outbound_limiter.acquire(chat_id)
+            try:
+                return await api_call(*args, **kwargs)
+            except FloodWait as fw:
+                wait_seconds = float(getattr(fw, "value", None) or 30)
+                self.outbound_limiter.on_flood_wait(wait_seconds, chat_id)
+                if attempt >= self.OUTBOUND_FLOOD_RETRIES or wait_seconds > self.OUTBOUND_MAX_FLOOD_SLEEP: raise
+                attempt += 1
+
+    async def send_message(self, chat_id: Any, text: str, **kwargs) -> Message:
+        """发送消息 (参数同 pyrogram Client.send_message)"""
+        return await self._call_outbound(chat_id, self.app.send_message, chat_id, text, **kwargs)
+
+    async def edit_message_text(self, chat_id: Any, message_id: int, text: str, **kwargs) -> Message:
+        """编辑消息 (参数同 pyrogram Client.edit_message_text)"""
+        return await self._call_outbound(chat_id, self.app.edit_message_text, chat_id, message_id, text, **kwargs)
+
+    async def send_document(self, chat_id: Any, document: Any, **kwargs) -> Message:
+        """发送文件 (参数同 pyrogram Client.send_document)；内存文件在 FloodWait 重试前回到开头"""
+        async def upload():
+            if hasattr(document, "seek"): document.seek(0)
+            return await self.app.send_document(chat_id, document, **kwargs)
+        return await self._call_outbound(chat_id, upload)
+    # --- 新增结束 ---
 
     async def send_admin_reply(self, text: str, original_message: Message):
         if not original_message:
@@ -378,7 +574,7 @@ class TelegramClient:
                  text = text[:MAX_LEN - 15] + "\n...(消息过长截断)"
 
             reply_params = ReplyParameters(message_id=original_message.id)
-            await self.app.send_message(
+            await self.send_message(
                 chat_to_reply_id, text,
                 reply_parameters=reply_params,
                 link_preview_options=LinkPreviewOptions(is_disabled=True)
@@ -393,7 +589,18 @@ class TelegramClient:
         except Exception as e:
             logger.error(f"回复管理员到 {chat_to_reply_id} 失败: {e}")
 
-    async def send_system_notification(self, text: str):
+    # --- 修改: 系统通知与管理员私聊经由通知合并器发送 ---
+    async def send_system_notification(self, text: str, priority: str = NOTIFY_NORMAL):
+        """发送系统通知 (控制群或管理员)。普通通知在合并窗口内合并，priority='critical' 立即发送"""
+        await self.notifier.notify("system", text, priority=priority)
+
+    async def send_admin_private_message(self, text: str, priority: str = NOTIFY_NORMAL):
+        """发送私聊消息给管理员 (不经过指令队列，经过通知合并器)"""
+        await self.notifier.notify("admin_private", text, priority=priority)
+    # --- 修改结束 ---
+
+    async def _deliver_system_notification(self, text: str):
+        """实际发送一条系统通知 (长度已由通知合并器拆分)"""
         notify_chat_id = self.control_chat_id or self.admin_id
         if not notify_chat_id:
             # --- 修改: 添加 try-except ---
@@ -414,11 +621,7 @@ class TelegramClient:
              logger.error(f"无法发送系统通知 (\"{safe_log_preview_sys_err2}...\")：Telegram 客户端未连接。")
              return
         try:
-            MAX_LEN = 4096
-            if len(text) > MAX_LEN:
-                 logger.warning(f"系统通知过长 ({len(text)} > {MAX_LEN})，将被截断。")
-                 text = text[:MAX_LEN - 15] + "\n...(消息过长截断)"
-            await self.app.send_message(
+            await self.send_message(
                  notify_chat_id, text,
                  link_preview_options=LinkPreviewOptions(is_disabled=True)
             )
@@ -432,8 +635,8 @@ class TelegramClient:
         except Exception as e:
             logger.error(f"发送系统通知到 {notify_chat_id} 失败: {e}")
 
-    async def send_admin_private_message(self, text: str):
-        """发送私聊消息给管理员 (不经过队列)"""
+    async def _deliver_admin_private_message(self, text: str):
+        """实际发送一条管理员私聊 (长度已由通知合并器拆分)"""
         if not self.admin_id:
             # --- 修改: 添加 try-except ---
             try:
@@ -453,11 +656,7 @@ class TelegramClient:
              logger.error(f"无法发送管理员私聊 (\"{safe_log_preview_priv_err2}...\")：Telegram 客户端未连接。")
              return
         try:
-            MAX_LEN = 4096
-            if len(text) > MAX_LEN:
-                 logger.warning(f"管理员私聊消息过长 ({len(text)} > {MAX_LEN})，将被截断。")
-                 text = text[:MAX_LEN - 15] + "\n...(消息过长截断)"
-            await self.app.send_message(
+            await self.send_message(
                  self.admin_id, text,
                  link_preview_options=LinkPreviewOptions(is_disabled=True)
             )
@@ -477,16 +676,25 @@ class TelegramClient:
         try:
             self.register_handlers()
             self.register_listeners()
-            # --- 新增: 注册 Redis 订阅 ---
-            if self.redis_client:
-                 await self.redis_client.subscribe(self.task_channel, self._handle_assistant_task)
-                 logger.info(f"已注册 Redis 任务频道 '{self.task_channel}' 的处理器。")
-            else:
+            # --- 新增: 注册 Redis 订阅 (shared 模式; addressed 模式需先获取自己的 ID) ---
+            if not self.redis_client:
                  logger.error("无法注册 Redis 任务频道处理器：RedisClient 未设置。")
+            elif self.task_routing != TASK_ROUTING_ADDRESSED:
+                 await self.redis_client.subscribe(self.task_channel, self._handle_assistant_task, ordered=True)
+                 logger.info(f"已注册 Redis 任务频道 '{self.task_channel}' 的处理器。")
             # --- 新增结束 ---
             logger.info("Telegram 客户端正在启动并连接...")
             await self.app.start()
             await self._ensure_me() # 确保获取到 _my_id
+            # --- 新增: addressed 模式只订阅本实例的任务频道和广播频道 ---
+            if self.redis_client and self.task_routing == TASK_ROUTING_ADDRESSED:
+                 if self._my_id:
+                     for channel in (addressed_task_channel(self.task_channel, self._my_id), addressed_task_channel(self.task_channel)):
+                         await self.redis_client.subscribe(channel, self._handle_assistant_task, ordered=True)
+                         logger.info(f"已注册 Redis 定向任务频道 '{channel}' 的处理器。")
+                 else:
+                     logger.error("无法注册 Redis 定向任务频道：未获取到自己的用户 ID。")
+            # --- 新增结束 ---
             user_id_str = str(self._my_id) if self._my_id else "N/A"
             username_str = self._my_username or 'Unknown'
             logger.info(f"Telegram 客户端已启动，用户: {username_str} (ID: {user_id_str})")
@@ -506,6 +714,11 @@ class TelegramClient:
             logger.critical(f"TG 客户端运行时发生严重错误: {e}", exc_info=True)
         finally:
             logger.info("Telegram 客户端正在停止...")
+            # --- 新增: 发送合并窗口/摘要中尚未发出的通知 ---
+            if hasattr(self, 'app') and self.app.is_connected:
+                try: await self.notifier.flush()
+                except Exception as flush_e: logger.error(f"停止前发送缓冲通知失败: {flush_e}")
+            # --- 新增结束 ---
             if self.queue_task and not self.queue_task.done():
                 logger.info("正在取消游戏指令队列处理器任务...")
                 self.queue_task.cancel()
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger("StartupWarmup")
+
+SYSTEM_READY_EVENT = "system_ready" # (预热报告)，启动预热完成后只触发一次
+
+WarmupFunc = Callable[[], Awaitable[Any]] # 返回 False 视为失败
+
+
+class _WarmupStep:
+    __slots__ = ("name", "func", "depends_on", "priority", "status", "started_at", "duration", "error")
+
+    def __init__(self, name: str, func: WarmupFunc, depends_on: Sequence[str], priority: int):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.priority = priority
+        self.status = "pending" # pending / running / ok / failed / timeout / skipped
+        self.started_at: Optional[float] = None
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+
+
+class StartupWarmup:
+    """
+    启动预热: 按依赖顺序并发加载缓存 (并发数受限，就绪步骤按优先级从高到低启动)，
+    全部完成后触发一次 system_ready 事件。依赖失败不阻止后续步骤 (数据管理器在读取时仍会按需刷新)。
+    """
+    def __init__(self, context, max_concurrency: int = 3, step_timeout: float = 60.0):
+        self.context = context
+        self.max_concurrency = max(1, max_concurrency)
+        self.step_timeout = step_timeout
+        self._steps: Dict[str, _WarmupStep] = {}
+        self._created_at = time.monotonic()
+        self._started_at: Optional[float] = None
+        self._ready_at: Optional[float] = None
+        self.ready = asyncio.Event()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._steps
+
+    def add(self, name: str, func: WarmupFunc, depends_on: Sequence[str] = (), priority: int = 0):
+        """注册预热步骤 (需在 run 之前调用；同名步骤会被替换)"""
+        if self._started_at is not None:
+            logger.warning(f"【启动预热】预热已开始，忽略新步骤 '{name}'。"); return
+        self._steps[name] = _WarmupStep(name, func, depends_on, priority)
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """等待预热完成，超时返回 False"""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def run(self):
+        """执行全部预热步骤并触发 system_ready (重复调用时直接返回)"""
+        if self._started_at is not None: return
+        self._started_at = time.monotonic()
+        logger.info(f"【启动预热】开始，共 {len(self._steps)} 个步骤 (并发上限 {self.max_concurrency})。")
+        try:
+            await self._run_steps()
+        except Exception as e:
+            logger.error(f"【启动预热】执行时出错: {e}", exc_info=True)
+        finally:
+            self._ready_at = time.monotonic()
+            self.ready.set()
+            report = self.get_report()
+            logger.info(
+                f"【启动预热】完成: 耗时 {report['warmup_seconds']}s (进程启动后 {report['time_to_ready']}s 就绪)，"
+                + ", ".join(f"{step['name']}={step['status']}" for step in report["steps"])
+            )
+            if self.context.event_bus: await self.context.event_bus.emit(SYSTEM_READY_EVENT, report)
+
+    async def _run_steps(self):
+        running: Dict[asyncio.Task, _WarmupStep] = {}
+        done_names = set()
+        while True:
+            waiting = [step for step in self._steps.values() if step.status == "pending"]
+            for step in waiting: # 依赖了不存在的步骤
+                missing = [dep for dep in step.depends_on if dep not in self._steps]
+                if missing:
+                    step.status = "skipped"; step.error = f"缺少依赖: {', '.join(missing)}"; done_names.add(step.name)
+            runnable = sorted(
+                (step for step in waiting if step.status == "pending" and all(dep in done_names for dep in step.depends_on)),
+                key=lambda step: -step.priority,
+            )
+            for step in runnable[:self.max_concurrency - len(running)]:
+                step.status = "running"; step.started_at = time.monotonic()
+                running[asyncio.create_task(self._run_step(step))] = step
+            if not running:
+                for step in self._steps.values():
+                    if step.status == "pending": step.status = "skipped"; step.error = "循环依赖"
+                return
+            finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished: done_names.add(running.pop(task).name)
+
+    async def _run_step(self, step: _WarmupStep):
+        try:
+            result = await asyncio.wait_for(step.func(), self.step_timeout)
+            step.status = "failed" if result is False else "ok"
+        except asyncio.TimeoutError:
+            step.status = "timeout"; step.error = f"超过 {self.step_timeout}s"
+        except Exception as e:
+            step.status = "failed"; step.error = str(e)
+            logger.error(f"【启动预热】步骤 '{step.name}' 出错: {e}", exc_info=True)
+        finally:
+            step.duration = time.monotonic() - step.started_at
+            logger.info(f"【启动预热】步骤 '{step.name}' {step.status} ({step.duration:.2f}s)")
+
+    def get_report(self) -> Dict[str, Any]:
+        steps: List[Dict[str, Any]] = [
+            {
+                "name": step.name, "status": step.status, "depends_on": list(step.depends_on), "priority": step.priority,
+                "start_offset": round(step.started_at - self._started_at, 2) if step.started_at and self._started_at else None,
+                "duration": round(step.duration, 2) if step.duration is not None else None, "error": step.error,
+            }
+            for step in self._steps.values()
+        ]
+        return {
+            "ready": self.ready.is_set(),
+            "warmup_seconds": round(self._ready_at - self._started_at, 2) if self._ready_at and self._started_at else None,
+            "time_to_ready": round(self._ready_at - self._created_at, 2) if self._ready_at else None,
+            "steps": steps,
+        }
+
+
+def build_startup_warmup(context) -> StartupWarmup:
+    """创建启动预热并注册默认步骤 (插件可在 register() 中通过 context.warmup.add 追加自己的步骤)"""
+    config = context.config
+    warmup = StartupWarmup(
+        context,
+        max_concurrency=config.get("warmup.max_concurrency", 3),
+        step_timeout=config.get("warmup.step_timeout", 60),
+    )
+    data_manager = context.data_manager
+
+    async def warm_character() -> bool:
+        client = context.telegram_client
+        user_id = await client.get_my_id() if client else None
+        username = await client.get_my_username() if client else None
+        if not user_id or not username: return False
+        return await data_manager.update_cache_from_api(user_id, username)
+
+    async def warm_item_catalog() -> bool:
+        return await data_manager.get_item_catalog() is not None
+
+    if data_manager:
+        if config.get("sync_on_startup.item", True):
+            warmup.add("item_master", lambda: data_manager.update_item_master_cache(force=False), priority=10)
+            warmup.add("item_catalog", warm_item_catalog, depends_on=("item_master",), priority=5)
+        if config.get("sync_on_startup.shop", True):
+            warmup.add("shop", lambda: data_manager.update_shop_cache(force=False), priority=0)
+        if config.get("sync_on_startup.character", True):
+            # 背包中的材料名称依赖物品主数据
+            depends_on = ("item_master",) if "item_master" in warmup else ()
+            warmup.add("character", warm_character, depends_on=depends_on, priority=8)
+    return warmup
@@ -55,7 +55,7 @@ COMMAND_MENU_TEXT = """
 
 ⚙️ **系统管理**
   📅`,任务列表` 📈`,日志级别` 🧹`,清除状态`
-  🧩`,插件` 🔧`,配置` 📄`,日志`
+  🧩`,插件` 🔧`,配置` 📄`,日志` 📊`,性能`
 
 ℹ️ **帮助**
   🧭`,菜单` ❓`,帮助`
@@ -84,6 +84,7 @@ HELP_DETAILS = {
     "删除题库": "根据 `,查询题库` 返回的编号删除问答对。\n用法: `,删除题库 <编号>`",
     "任务列表": "查询当前正在运行或计划中的定时任务列表。",
     "插件": "查看插件列表。\n用法: `,插件`",
+    "性能": "查看事件监听器耗时、失败次数、指令队列等运行统计。\n用法: `,性能` 或 `,性能 json` (以 JSON 文件发送完整统计)",
     "配置": "查看或设置功能模块。\n用法: `,配置` 或 `,配置 <配置项> <新值>`",
     "日志": "查看最近的日志信息。\n用法: `,日志 [类型] [行数]`",
     "日志级别": "查看或设置日志级别。\n用法: `,日志级别` 或 `,日志级别 <级别>`",
@@ -95,7 +96,7 @@ DIRECT_REPLY_COMMANDS = {
     "菜单", "帮助",
     "查询角色", "查询背包", "查询商店",
     "已学配方", "缓存状态", "任务列表",
-    "插件", "配置", "日志级别", "清除状态",
+    "插件", "配置", "日志级别", "清除状态", "性能",
 }
 
 class Plugin(BasePlugin):
@@ -156,7 +157,7 @@ class Plugin(BasePlugin):
 
         edit_target_id = None
         # ... (后续处理逻辑保持不变) ...
-        fast_view_commands_no_args = ["帮助", "配置", "日志级别", "插件", "清除状态"]
+        fast_view_commands_no_args = ["帮助", "配置", "日志级别", "插件", "清除状态", "性能"]
         always_direct_reply_commands = ["菜单", "查询角色", "查询背包", "查询商店", "已学配方", "缓存状态", "任务列表"]
         should_send_processing = True
         if command in always_direct_reply_commands: should_send_processing = False
@@ -244,7 +245,7 @@ class Plugin(BasePlugin):
                            await self._edit_or_reply(message.chat.id, edit_target_id, reply_text, original_message=message); return
                  self.info(f"检测到来自收藏夹的更新配方指令 (overwrite={overwrite_flag})，发送事件...")
                  await self.event_bus.emit("update_recipes_command", message, recipe_text_to_pass, overwrite_flag, edit_target_id)
-             else: await message.reply_text("❌ `,更新配方` 指令只能在您的“收藏夹”(Saved Messages)中使用。", quote=True)
+             else: await self._edit_or_reply(message.chat.id, None, "❌ `,更新配方` 指令只能在您的“收藏夹”(Saved Messages)中使用。", original_message=message)
         elif command == "查询题库":
             qa_type = "玄骨"; keyword = None
             if args:
@@ -268,6 +269,7 @@ class Plugin(BasePlugin):
         elif command == "任务列表":
             await self.event_bus.emit("system_show_tasks_command", message, edit_target_id)
         elif command == "插件": await self.event_bus.emit("system_plugins_command", message, args, edit_target_id)
+        elif command == "性能": await self.event_bus.emit("system_performance_command", message, args, edit_target_id)
         elif command == "配置": await self.event_bus.emit("system_config_command", message, args, edit_target_id)
         elif command == "日志": await self.event_bus.emit("system_log_command", message, args, edit_target_id)
         elif command == "日志级别": await self.event_bus.emit("system_loglevel_command", message, args, edit_target_id)
@@ -394,7 +396,7 @@ class Plugin(BasePlugin):
 
         if message_id:
             try:
-                await tg_client.app.edit_message_text(chat_id, message_id, text, link_preview_options=link_preview_options)
+                await tg_client.edit_message_text(chat_id, message_id, text, link_preview_options=link_preview_options)
                 edited = True
             except Exception as e:
                 if "MESSAGE_NOT_MODIFIED" not in str(e) and "MESSAGE_ID_INVALID" not in str(e):
@@ -414,10 +416,10 @@ class Plugin(BasePlugin):
                  return
             try:
                 reply_params = ReplyParameters(message_id=original_message.id)
-                await tg_client.app.send_message(chat_id, text, reply_parameters=reply_params, link_preview_options=link_preview_options)
+                await tg_client.send_message(chat_id, text, reply_parameters=reply_params, link_preview_options=link_preview_options)
             except Exception as e2:
                 self.error(f"直接回复原始消息 {original_message.id} 失败: {e2}，尝试不引用回复...")
-                try: await tg_client.app.send_message(chat_id, text, link_preview_options=link_preview_options)
+                try: await tg_client.send_message(chat_id, text, link_preview_options=link_preview_options)
                 except Exception as e3:
                      self.error(f"编辑、回复和直接发送均失败: {e3}")
                      await self._send_to_control_chat(f"(回复失败)\n{text[:1000]}...")
@@ -428,10 +430,10 @@ class Plugin(BasePlugin):
         link_preview_options = LinkPreviewOptions(is_disabled=True)
         try:
              reply_params = ReplyParameters(message_id=original_message.id)
-             return await tg_client.app.send_message(original_message.chat.id, status_text, reply_parameters=reply_params, link_preview_options=link_preview_options)
+             return await tg_client.send_message(original_message.chat.id, status_text, reply_parameters=reply_params, link_preview_options=link_preview_options)
         except Exception as e:
             self.warning(f"回复状态消息失败 ({e})，尝试直接发送...")
-            try: return await tg_client.app.send_message(original_message.chat.id, status_text, link_preview_options=link_preview_options)
+            try: return await tg_client.send_message(original_message.chat.id, status_text, link_preview_options=link_preview_options)
             except Exception as e2: self.error(f"直接发送状态消息也失败: {e2}"); return None
 
     async def _send_to_control_chat(self, text: str):
@@ -442,7 +444,7 @@ class Plugin(BasePlugin):
               return
          try:
               link_preview_options = LinkPreviewOptions(is_disabled=True)
-              await tg_client.app.send_message(fallback_chat_id, text, link_preview_options=link_preview_options)
+              await tg_client.send_message(fallback_chat_id, text, link_preview_options=link_preview_options)
          except Exception as final_err:
               self.critical(f"最终 fallback 发送失败: {final_err}")
 
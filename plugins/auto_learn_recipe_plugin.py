@@ -128,7 +128,7 @@ async def _check_and_learn_recipes():
                     logger.info(f"【自动学习配方】指令 '{learn_command}' 已成功加入发送队列。")
                     logger.info("【自动学习配方】触发角色数据同步...")
                     try:
-                        await context.event_bus.emit("trigger_character_sync_now")
+                        await context.event_bus.emit("trigger_character_sync_now", reason="自动学习配方")
                     except Exception as sync_e:
                         logger.error(f"【自动学习配方】尝试在发送学习指令后触发角色同步时出错: {sync_e}", exc_info=True)
                 else:
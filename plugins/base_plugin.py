@@ -1,4 +1,6 @@
 import logging
+from modules.game_message_classifier import GAME_RESPONSE_CATEGORY_EVENT, GAME_RESPONSE_RAW_EDIT_EVENT
+from core.event_bus import all_of, in_categories, not_edited
 # --- 导入 AppContext 类型提示 ---
 from typing import TYPE_CHECKING, Optional, Dict # 添加 Optional, Dict
 if TYPE_CHECKING:
@@ -8,6 +10,7 @@ if TYPE_CHECKING:
     from modules.gemini_client import GeminiClient
     from apscheduler.schedulers.asyncio import AsyncIOScheduler
     from modules.game_data_manager import GameDataManager
+    from modules.warmup import StartupWarmup
     from core.config import Config
     from core.event_bus import EventBus
 # --- 类型提示结束 ---
@@ -24,6 +27,7 @@ class AppContext:
         self.plugin_name_map: Dict[str, str] = {} # 插件英文名到中文名的映射
         self.data_manager: Optional['GameDataManager'] = None # GameDataManager 实例
         self.telegram_client: Optional['TelegramClient'] = None # TelegramClient 实例
+        self.warmup: Optional['StartupWarmup'] = None # 启动预热 (完成后触发 system_ready)
         self.plugin_statuses: Dict[str, str] = {} # 插件加载状态
 
 class BasePlugin:
@@ -58,6 +62,27 @@ class BasePlugin:
     def critical(self, msg: str, *args, **kwargs): self._log(logging.CRITICAL, msg, *args, **kwargs)
     # --- 日志辅助方法结束 ---
 
+    # --- 新增: 按消息分类订阅游戏响应 ---
+    def listen_game_category(self, category: str, keywords, handler, extract: Optional[Dict] = None, when=None,
+                             raw_edits: bool = False, **listen_options):
+        """
+        向 TelegramClient 的消息分类器登记分类关键词，并监听 game_response:{分类} 事件。
+        handler 签名: (message, is_reply_to_me, is_mentioning_me, game_message)；when 为 EventBus 预过滤条件。
+        raw_edits: 默认只接收合并后的编辑；为 True 时改为接收游戏 Bot 的每一次编辑。
+        listen_options: 透传给 EventBus.on (max_concurrency / overflow / timeout 等)。
+        """
+        tg_client = self.context.telegram_client
+        if not tg_client or not getattr(tg_client, "classifier", None):
+            self.warning(f"消息分类器不可用，改为监听 game_response_received (分类: {category})。")
+            self.event_bus.on("game_response_received", handler, when=when, **listen_options)
+            return
+        tg_client.classifier.register_category(category, keywords, extract=extract)
+        if raw_edits:
+            self.event_bus.on(GAME_RESPONSE_RAW_EDIT_EVENT, handler, when=all_of(when, in_categories(category)), **listen_options)
+            when = all_of(when, not_edited)
+        self.event_bus.on(GAME_RESPONSE_CATEGORY_EVENT.format(category), handler, when=when, **listen_options)
+    # --- 新增结束 ---
+
     def register(self):
         """插件注册方法，必须由子类实现"""
         raise NotImplementedError("插件必须实现 register() 方法")
@@ -3,6 +3,8 @@ import pytz
 from datetime import datetime, timedelta
 from typing import Optional, Tuple # 增加 Tuple 导入
 from plugins.base_plugin import BasePlugin, AppContext
+from modules.notification_aggregator import NOTIFY_CRITICAL
+from modules.sync_coordinator import SyncCoordinator
 from core.context import get_global_context
 from apscheduler.jobstores.base import JobLookupError
 import asyncio
@@ -15,6 +17,7 @@ trigger_logger = logging.getLogger("CharSync.Trigger")
 task_logger = logging.getLogger("CharSync.Task")
 
 CHARACTER_SYNC_JOB_ID = 'character_sync_job'
+SCHEDULED_SYNC_REASON = "定时同步"
 
 # --- 时间处理函数 ---
 def parse_iso_datetime(dt_str: Optional[str]) -> Optional[datetime]:
@@ -102,16 +105,9 @@ async def _character_sync_task():
         task_logger.info("【角色/背包同步】[定时任务] 功能未启用 (sync_on_startup.character: false)，任务跳过。")
         return
 
-    user_id = context.telegram_client._my_id
-    username = context.telegram_client._my_username
-    if not user_id or not username:
-        task_logger.error("【角色/背包同步】[定时任务] 无法获取 User ID 或 Username，任务终止。")
-        return
-
-    success, message = await trigger_character_sync(context, user_id, username)
-    if not success:
-        task_logger.error(f"【角色/背包同步】[定时任务] 触发失败: {message}")
-        await context.event_bus.emit("send_system_notification", f"⚠️ **角色/背包定时同步失败** ⚠️\n\n原因: {message}")
+    # --- 修改: 通过同步协调器执行，与其他插件的同步请求合并并遵守最小间隔 ---
+    await context.event_bus.emit("trigger_character_sync_now", reason=SCHEDULED_SYNC_REASON)
+    # --- 修改结束 ---
 
 
 # --- 插件类 (保持不变) ---
@@ -123,6 +119,7 @@ class Plugin(BasePlugin):
     def __init__(self, context: AppContext, plugin_name: str, cn_name: str | None = None):
         super().__init__(context, plugin_name, cn_name)
         self.load_config()
+        setattr(context, plugin_name, self) # 附加实例到 context (供 ,性能 读取同步统计)
         if self.sync_enabled: self.info(f"插件已加载。角色/背包将每隔 {self.sync_interval_minutes} 分钟自动同步一次。")
         else: self.info("插件已加载，但定时同步功能未启用 (sync_intervals.character <= 0)。")
 
@@ -130,6 +127,13 @@ class Plugin(BasePlugin):
         """加载配置"""
         self.sync_interval_minutes = self.config.get("sync_intervals.character", 5)
         self.sync_enabled = self.sync_interval_minutes > 0
+        # --- 新增: 同步请求防抖 / 最小间隔 ---
+        self.coordinator = SyncCoordinator(
+            self._run_sync,
+            debounce_seconds=self.config.get("character_sync.debounce_seconds", 10),
+            min_interval_seconds=self.config.get("character_sync.min_interval_seconds", 30),
+            name="角色/背包同步",
+        )
 
     def register(self):
         """注册定时任务和手动触发事件"""
@@ -150,18 +154,31 @@ class Plugin(BasePlugin):
         self.event_bus.on("trigger_character_sync_now", self.handle_trigger_now)
         self.info("已注册 'trigger_character_sync_now' 事件监听器。")
 
-    async def handle_trigger_now(self):
-        """处理手动立即触发同步的事件"""
-        self.info("【角色/背包同步】收到立即同步请求...")
+    async def handle_trigger_now(self, reason: str | None = None, urgent: bool = False):
+        """
+        处理立即同步请求: 交给同步协调器防抖合并。
+        reason: 请求来源 (合并后记录在日志中)；urgent: 跳过防抖和最小间隔。
+        """
+        self.debug(f"【角色/背包同步】收到同步请求 (原因: {reason or '未说明'}, 紧急: {urgent})。")
+        self.coordinator.request(reason, urgent=urgent)
+
+    def get_sync_stats(self):
+        return self.coordinator.get_stats()
+
+    async def _run_sync(self, reasons: list) -> bool:
+        """协调器实际执行的同步"""
         user_id = self.context.telegram_client._my_id
         username = self.context.telegram_client._my_username
         if not user_id or not username:
-            self.error("【角色/背包同步】无法获取 User ID 或 Username，无法执行立即同步。")
+            self.error("【角色/背包同步】无法获取 User ID 或 Username，无法执行同步。")
             # 即使无法获取用户信息，也无需发送通知
             # await self.context.event_bus.emit("send_system_notification", "❌ 无法执行角色/背包立即同步：缺少用户信息。")
-            return
+            return False
 
         success, message = await trigger_character_sync(self.context, user_id, username)
+        if not success and SCHEDULED_SYNC_REASON in reasons:
+            task_logger.error(f"【角色/背包同步】[定时任务] 触发失败: {message}")
+            await self.context.event_bus.emit("send_system_notification", f"⚠️ **角色/背包定时同步失败** ⚠️\n\n原因: {message}", priority=NOTIFY_CRITICAL)
         # --- 修改: 移除或注释掉发送通知的代码 ---
         # 手动触发时，将结果通知给管理员
         # try:
@@ -169,4 +186,4 @@ class Plugin(BasePlugin):
         # except Exception as e:
         #      self.error(f"发送手动同步结果通知失败: {e}")
         # --- 修改结束 ---
-
+        return success
@@ -358,7 +358,7 @@ class Plugin(BasePlugin):
         edited = False; link_preview_options = LinkPreviewOptions(is_disabled=True); MAX_LEN = 4096
         if len(text) > MAX_LEN: self.warning(f"即将发送/编辑的消息过长 ({len(text)} > {MAX_LEN})，将被截断。"); text = text[:MAX_LEN - 15] + "\n...(消息过长截断)"
         if message_id:
-            try: await tg_client.app.edit_message_text(chat_id, message_id, text, link_preview_options=link_preview_options); edited = True
+            try: await tg_client.edit_message_text(chat_id, message_id, text, link_preview_options=link_preview_options); edited = True
             except Exception as e:
                 if "MESSAGE_NOT_MODIFIED" not in str(e): self.warning(f"编辑消息 {message_id} 失败 ({e})，尝试回复..."); edited = False
                 else: self.debug(f"消息 {message_id} 未修改。"); edited = True
@@ -367,25 +367,25 @@ class Plugin(BasePlugin):
                  self.error("编辑失败且无法回复：缺少原始消息对象。")
                  fallback_chat_id = self.control_chat_id or self.config.get("telegram.admin_id")
                  if fallback_chat_id:
-                     try: await tg_client.app.send_message(fallback_chat_id, f"(Edit/Reply Failed)\n{text[:1000]}...", link_preview_options=link_preview_options)
+                     try: await tg_client.send_message(fallback_chat_id, f"(Edit/Reply Failed)\n{text[:1000]}...", link_preview_options=link_preview_options)
                      except Exception as final_err: self.critical(f"最终 fallback 发送失败: {final_err}")
                  return
             try:
                 reply_params = ReplyParameters(message_id=original_message.id)
-                await tg_client.app.send_message(chat_id, text, reply_parameters=reply_params, link_preview_options=link_preview_options)
+                await tg_client.send_message(chat_id, text, reply_parameters=reply_params, link_preview_options=link_preview_options)
             except Exception as e2:
                 self.error(f"编辑和回复均失败: {e2}")
                 fallback_chat_id = self.control_chat_id or self.config.get("telegram.admin_id")
                 if fallback_chat_id:
-                    try: await tg_client.app.send_message(fallback_chat_id, f"(Edit/Reply Failed)\n{text[:1000]}...", link_preview_options=link_preview_options)
+                    try: await tg_client.send_message(fallback_chat_id, f"(Edit/Reply Failed)\n{text[:1000]}...", link_preview_options=link_preview_options)
                     except Exception as final_err: self.critical(f"最终 fallback 发送失败: {final_err}")
 
     async def _send_status_message(self, original_message: Message, status_text: str) -> Message | None:
         tg_client = self.telegram_client_instance
         if not tg_client or not tg_client.app.is_connected: self.warning("无法发送状态消息：TG 客户端不可用。"); return None
         reply_params = ReplyParameters(message_id=original_message.id); link_preview_options = LinkPreviewOptions(is_disabled=True)
-        try: return await tg_client.app.send_message(original_message.chat.id, status_text, reply_parameters=reply_params, link_preview_options=link_preview_options)
+        try: return await tg_client.send_message(original_message.chat.id, status_text, reply_parameters=reply_params, link_preview_options=link_preview_options)
         except Exception as e:
             self.warning(f"回复状态消息失败 ({e})，尝试直接发送...")
-            try: return await tg_client.app.send_message(original_message.chat.id, status_text, link_preview_options=link_preview_options)
+            try: return await tg_client.send_message(original_message.chat.id, status_text, link_preview_options=link_preview_options)
             except Exception as e2: self.error(f"直接发送状态消息也失败: {e2}"); return None
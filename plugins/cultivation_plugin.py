@@ -5,7 +5,11 @@ import pytz
 from datetime import datetime, timedelta
 from typing import Optional
 from plugins.base_plugin import BasePlugin, AppContext
+from modules.notification_aggregator import NOTIFY_CRITICAL
 from pyrogram.types import Message
+from modules.game_message_classifier import GameMessage
+from core.event_bus import reply_to_me
+from modules.warmup import SYSTEM_READY_EVENT
 from plugins.character_sync_plugin import parse_iso_datetime, format_local_time # 时间处理仍需
 from apscheduler.jobstores.base import JobLookupError
 from core.context import get_global_context
@@ -19,7 +23,7 @@ REDIS_ERROR_NOTIFY_LOCK_KEY_FORMAT = "cultivation:error_notify_lock:{}" # Redis
 # --- 修改结束 ---
 ERROR_NOTIFY_LOCK_TTL = 3600
 RESPONSE_KEYWORDS = ["【闭关成功】", "【闭关失败】", "灵气尚未平复", "【走火入魔】"] # <-- 新增 "【走火入魔】"
-STARTUP_DELAY_SECONDS = 15
+STATUS_MAX_AGE = 30 # 闭关前确认状态时接受的缓存最大秒数
 
 async def _send_cultivation_command_to_queue():
     """由 APScheduler 调度的函数，用于将闭关指令加入队列"""
@@ -63,7 +67,7 @@ async def _send_cultivation_command_to_queue():
         logger.info("【自动闭关】检查 Redis 等待状态：当前非等待状态。")
 
         logger.info("【自动闭关】获取实时角色状态以确认是否可闭关...")
-        latest_status_data = await context.data_manager.get_character_status(my_id, use_cache=False)
+        latest_status_data = await context.data_manager.get_character_status(my_id, max_age=STATUS_MAX_AGE)
 
         if not latest_status_data:
              logger.error("【自动闭关】无法获取最新的角色状态，取消本次闭关并安排重试。")
@@ -126,7 +130,7 @@ async def _handle_cultivation_timeout():
             logger.info("【自动闭关】超时状态已从 Redis 清除。")
 
             logger.info("【自动闭关】超时后触发角色数据同步...")
-            try: await context.event_bus.emit("trigger_character_sync_now")
+            try: await context.event_bus.emit("trigger_character_sync_now", reason="自动闭关")
             except Exception as sync_e: logger.error(f"【自动闭关】超时后尝试触发角色同步时出错: {sync_e}", exc_info=True)
 
             logger.info("【自动闭关】超时后立即尝试安排下一次闭关任务...")
@@ -137,7 +141,7 @@ async def _handle_cultivation_timeout():
         logger.error(f"【自动闭关】处理闭关超时状态时出错: {e}", exc_info=True)
         logger.warning("【自动闭关】因超时处理出错，仍尝试触发同步并安排下次调度...")
         if context:
-            try: await context.event_bus.emit("trigger_character_sync_now")
+            try: await context.event_bus.emit("trigger_character_sync_now", reason="自动闭关")
             except Exception: pass
             asyncio.create_task(_schedule_next_cultivation())
 
@@ -252,7 +256,7 @@ async def _schedule_next_cultivation():
                     # --- 修改: 使用格式化后的 error_lock_key ---
                     if redis_client and event_bus and error_lock_key:
                         if await redis_client.set(error_lock_key, "1", ex=ERROR_NOTIFY_LOCK_TTL, nx=True):
-                            await event_bus.emit("send_system_notification", f"⚠️ **自动修炼 - 缓存数据错误** ⚠️\n\n无法解析缓存中的冷却时间戳 (收到字符串: `{cooldown_str}`)。\n自动修炼已暂停并进入重试循环。")
+                            await event_bus.emit("send_system_notification", f"⚠️ **自动修炼 - 缓存数据错误** ⚠️\n\n无法解析缓存中的冷却时间戳 (收到字符串: `{cooldown_str}`)。\n自动修炼已暂停并进入重试循环。", priority=NOTIFY_CRITICAL)
                     # --- 修改结束 ---
             else:
                  logger.error(f"【自动闭关】缓存中的 'cultivation_cooldown_until' 字段类型未知 ({type(cooldown_str)}) 或为空，将安排重试。 Value: '{cooldown_str}'")
@@ -260,7 +264,7 @@ async def _schedule_next_cultivation():
                  # --- 修改: 使用格式化后的 error_lock_key ---
                  if redis_client and event_bus and error_lock_key:
                      if await redis_client.set(error_lock_key, "1", ex=ERROR_NOTIFY_LOCK_TTL, nx=True):
-                         await event_bus.emit("send_system_notification", f"⚠️ **自动修炼 - 缓存数据错误** ⚠️\n\n缓存中 'cultivation_cooldown_until' 字段类型未知或为空 (收到: `{cooldown_str}`)。\n自动修炼已暂停并进入重试循环。")
+                         await event_bus.emit("send_system_notification", f"⚠️ **自动修炼 - 缓存数据错误** ⚠️\n\n缓存中 'cultivation_cooldown_until' 字段类型未知或为空 (收到: `{cooldown_str}`)。\n自动修炼已暂停并进入重试循环。", priority=NOTIFY_CRITICAL)
                  # --- 修改结束 ---
 
         else: # status_data 获取失败
@@ -271,7 +275,7 @@ async def _schedule_next_cultivation():
              if redis_client and event_bus and error_lock_key:
                   if await redis_client.set(error_lock_key, "1", ex=ERROR_NOTIFY_LOCK_TTL, nx=True):
                       error_reason = "获取状态缓存失败" if not status_data else "解析缓存时间戳失败"
-                      await event_bus.emit("send_system_notification", f"⚠️ **自动修炼 - 数据错误** ⚠️\n\n{error_reason}，自动修炼已暂停并进入重试循环。")
+                      await event_bus.emit("send_system_notification", f"⚠️ **自动修炼 - 数据错误** ⚠️\n\n{error_reason}，自动修炼已暂停并进入重试循环。", priority=NOTIFY_CRITICAL)
              # --- 修改结束 ---
 
         if next_run_utc_dt:
@@ -380,28 +384,25 @@ class Plugin(BasePlugin):
         """注册事件监听"""
         self.debug("register() 方法被调用。")
         try:
-            self.event_bus.on("telegram_client_started", self.initial_check_and_schedule)
+            self.event_bus.on(SYSTEM_READY_EVENT, self.initial_check_and_schedule)
             self.event_bus.on("game_command_sent", self.handle_command_sent)
-            self.event_bus.on("game_response_received", self.handle_game_response)
+            self.listen_game_category("cultivation", RESPONSE_KEYWORDS, self.handle_game_response, when=reply_to_me)
             self.event_bus.on("start_auto_cultivation", self.handle_start_auto_cultivation)
             self.event_bus.on("stop_auto_cultivation", self.handle_stop_auto_cultivation)
             self.info("已注册所有自动闭关相关事件监听器。")
         except Exception as e: self.error(f"注册事件监听器时发生错误: {e}", exc_info=True)
 
-    async def initial_check_and_schedule(self):
-        """启动时检查并开始调度"""
-        self.info("监听到 'telegram_client_started' 事件，开始启动时检查与调度...")
+    async def initial_check_and_schedule(self, report=None):
+        """启动预热完成后检查并开始调度"""
+        self.info(f"监听到 '{SYSTEM_READY_EVENT}' 事件，开始启动时检查与调度...")
         try:
             self.load_config()
             self.info(f"启动检查：当前配置 auto_enabled = {self.auto_enabled_config}")
             if self.auto_enabled_config:
-                self.info("配置为【启用】，准备延迟后开始调度...")
+                self.info("配置为【启用】，开始调度...")
                 self.is_running_manually = True
                 await self._ensure_no_duplicate_schedule()
-                delay = STARTUP_DELAY_SECONDS + random.uniform(0, 5)
-                self.info(f"启动延迟 {delay:.1f} 秒...")
-                await asyncio.sleep(delay)
-                self.info("启动延迟结束，调用主调度函数...")
+                self.info("调用主调度函数 (状态缓存已由启动预热加载)...")
                 await _schedule_next_cultivation()
                 self.info("启动时的主调度函数调用完成。")
             else:
@@ -449,7 +450,7 @@ class Plugin(BasePlugin):
             self.warning("因设置出错，安排重试调度...")
             asyncio.create_task(_schedule_retry_scheduling())
 
-    async def handle_game_response(self, message: Message, is_reply_to_me: bool, is_mentioning_me: bool):
+    async def handle_game_response(self, message: Message, is_reply_to_me: bool, is_mentioning_me: bool, game_message: Optional[GameMessage] = None):
         """处理游戏响应，清除等待状态、触发缓存更新并立即安排下次"""
         if not self.is_running_manually: return
         text = message.text or message.caption
@@ -484,7 +485,8 @@ class Plugin(BasePlugin):
             except JobLookupError: self.info(f"超时任务 '{TIMEOUT_JOB_ID}' 未找到。")
             except Exception as e: self.warning(f"移除超时任务失败: {e}")
             self.info("【自动闭关】收到有效回复后触发角色数据同步...")
-            try: await self.context.event_bus.emit("trigger_character_sync_now")
+            # 下一次闭关的调度依赖最新冷却时间，不参与防抖
+            try: await self.context.event_bus.emit("trigger_character_sync_now", reason="自动闭关", urgent=True)
             except Exception as sync_e: self.error(f"【自动闭关】尝试在收到回复后触发角色同步时出错: {sync_e}", exc_info=True)
             self.info("【自动闭关】收到有效回复后立即尝试安排下一次闭关任务...")
             asyncio.create_task(_schedule_next_cultivation())
@@ -493,7 +495,7 @@ class Plugin(BasePlugin):
             self.error(f"处理闭关响应状态时出错: {e}", exc_info=True)
             self.warning("【自动闭关】因处理响应出错，仍尝试触发同步并安排下次调度...")
             if self.context:
-                try: await self.context.event_bus.emit("trigger_character_sync_now")
+                try: await self.context.event_bus.emit("trigger_character_sync_now", reason="自动闭关")
                 except Exception: pass
                 asyncio.create_task(_schedule_next_cultivation())
 
@@ -5,6 +5,9 @@ import random
 from typing import Optional
 from plugins.base_plugin import BasePlugin, AppContext
 from pyrogram.types import Message
+from modules.command_queue import GameCommand, PRIORITY_URGENT
+from modules.game_message_classifier import GameMessage
+from core.event_bus import mentioning_me, OVERFLOW_COALESCE
 
 # --- 常量 ---
 HIGH_RISK_CMD = ".献上魂魄"
@@ -19,6 +22,7 @@ REGEX_DEMON_LORD_EVENT = re.compile(
     r"你感到一股无法抗拒的意志锁定了你的神魂.*?小辈，让老夫看看你的成色.*?做出抉择.*?\.献上魂魄.*?\收敛气息",
     re.DOTALL
 )
+DEMON_LORD_KEYWORDS = ["你感到一股无法抗拒的意志锁定了你的神魂"] # 消息分类用
 
 class Plugin(BasePlugin):
     """
@@ -60,10 +64,12 @@ class Plugin(BasePlugin):
     def register(self):
         """注册游戏响应事件监听器"""
         if self.auto_enabled:
-            self.event_bus.on("game_response_received", self.handle_game_response)
-            self.info("已注册 game_response_received 事件监听器。")
+            # 同一条魔君消息的多次编辑只保留最新一次；处理器含随机延迟，超时上限在最大延迟之上留出余量
+            self.listen_game_category("demon_lord", DEMON_LORD_KEYWORDS, self.handle_game_response, when=mentioning_me,
+                                      max_concurrency=2, overflow=OVERFLOW_COALESCE, timeout=self.max_delay + 30)
+            self.info("已注册 game_response:demon_lord 事件监听器。")
 
-    async def handle_game_response(self, message: Message, is_reply_to_me: bool, is_mentioning_me: bool):
+    async def handle_game_response(self, message: Message, is_reply_to_me: bool, is_mentioning_me: bool, game_message: Optional[GameMessage] = None):
         """处理游戏机器人回复，检查是否为魔君降临事件"""
         # 必须是提及我们的消息
         if not is_mentioning_me:
@@ -86,8 +92,8 @@ class Plugin(BasePlugin):
                 chosen_command = LOW_RISK_CMD
                 self.info(f"选择低风险选项: {chosen_command}")
 
-            # 构造带回复标记的完整指令
-            command_to_send = f"{chosen_command} --reply_to {message.id}"
+            # 构造回复魔君消息的指令
+            command_to_send = GameCommand(chosen_command, reply_to=message.id, priority=PRIORITY_URGENT, origin=self.plugin_name)
 
             # 计算随机延迟
             delay = random.uniform(self.min_delay, self.max_delay)
@@ -3,6 +3,7 @@ import re
 from typing import Optional, Dict, Any, List, Tuple
 from plugins.base_plugin import BasePlugin, AppContext
 from pyrogram.types import Message
+from core.event_bus import OVERFLOW_COALESCE
 import asyncio # Import asyncio for call_later
 
 # --- 正则表达式 ---
@@ -68,7 +69,8 @@ class Plugin(BasePlugin):
 
     def register(self):
         """注册游戏响应事件监听器"""
-        self.event_bus.on("game_response_received", self.handle_game_response)
+        self.event_bus.on("game_response_received", self.handle_game_response,
+                          max_concurrency=4, overflow=OVERFLOW_COALESCE, timeout=60)
         self.event_bus.on("telegram_client_started", self._initialize_username)
         self.info("已注册 game_response_received 事件监听器。")
 
@@ -9,6 +9,8 @@ from plugins.base_plugin import BasePlugin, AppContext
 from core.context import get_global_context
 from apscheduler.jobstores.base import JobLookupError
 from pyrogram.types import Message # 导入 Message
+from modules.command_queue import PRIORITY_BULK
+from core.event_bus import reply_to_me
 import re # 导入 re
 
 # --- 常量 ---
@@ -27,6 +29,7 @@ STATE_TTL = 360 # 指令列表和索引的 TTL (6分钟)
 
 HERB_GARDEN_RESPONSE_TIMEOUT = 120 # 等待响应的超时时间 (秒)
 HERB_GARDEN_TIMEOUT_JOB_ID_PREFIX = "herb_garden_timeout:" # 超时任务ID前缀
+DATA_MAX_AGE = 30 # 检查前接受的缓存数据最大秒数 (同一窗口内的读取共享一次 API 调用)
 
 # 指令（不含购买）
 GARDEN_COMMANDS_CORE = {".采药", ".浇水", ".除草", ".除虫", ".播种"}
@@ -41,6 +44,11 @@ GARDEN_KEYWORDS: Dict[str, Dict[str, List[str]]] = {
     ".播种": {"success": ["播种成功！"], "no_need": ["没有空闲地块"], "fail": ["种子数量不足"]},
     ".兑换": {"success": ["兑换成功！", "获得了【.+?种子】"], "no_need": [], "fail": ["宗门贡献不足"]},
 }
+# 预编译的结果关键词正则
+GARDEN_KEYWORD_PATTERNS: Dict[str, Dict[str, List[re.Pattern]]] = {
+    cmd: {result: [re.compile(kw, re.IGNORECASE) for kw in kws] for result, kws in groups.items()}
+    for cmd, groups in GARDEN_KEYWORDS.items()
+}
 # --- 常量结束 ---
 
 # --- 辅助函数 (保持不变) ---
@@ -139,7 +147,7 @@ async def _handle_garden_timeout(user_id: int, expected_msg_id: int):
             await _clear_garden_state(redis_client, user_id, context.scheduler, release_lock=True)
             # --- 修改结束 ---
             timeout_logger.info("【自动药园】超时后触发角色数据同步...")
-            await context.event_bus.emit("trigger_character_sync_now")
+            await context.event_bus.emit("trigger_character_sync_now", reason="自动药园")
         else:
             timeout_logger.info(f"【自动药园】超时任务触发，但当前等待MsgID是 '{current_pending_msg_id_str}' (不是 {expected_msg_id}) 或无等待，忽略。")
     except ValueError:
@@ -147,13 +155,13 @@ async def _handle_garden_timeout(user_id: int, expected_msg_id: int):
         # --- 修改: 调用清理函数时传递 user_id ---
         await _clear_garden_state(redis_client, user_id, context.scheduler, release_lock=True)
         # --- 修改结束 ---
-        await context.event_bus.emit("trigger_character_sync_now")
+        await context.event_bus.emit("trigger_character_sync_now", reason="自动药园")
     except Exception as e:
         timeout_logger.error(f"【自动药园】处理药园响应超时状态时出错: {e}", exc_info=True)
         # --- 修改: 调用清理函数时传递 user_id ---
         await _clear_garden_state(redis_client, user_id, context.scheduler, release_lock=True) # 强制清理
         # --- 修改结束 ---
-        await context.event_bus.emit("trigger_character_sync_now")
+        await context.event_bus.emit("trigger_character_sync_now", reason="自动药园")
 
 
 async def _check_herb_garden():
@@ -214,10 +222,12 @@ async def _check_herb_garden():
 
     try:
         task_logger.info("【自动药园】正在通过 DataManager 强制获取宗门、背包、商店和药园数据...")
-        sect_info = await data_manager.get_sect_info(my_id, use_cache=False)
-        inventory_cache = await data_manager.get_inventory(my_id, use_cache=False)
-        shop_items_dict = await data_manager.get_shop_data(my_id, use_cache=False)
-        garden_data = await data_manager.get_herb_garden(my_id, use_cache=False) # <--- 改为调用 get_herb_garden
+        # --- 修改: 使用 max_age，宗门/背包/药园共享同一次角色数据刷新 ---
+        sect_info = await data_manager.get_sect_info(my_id, max_age=DATA_MAX_AGE)
+        inventory_cache = await data_manager.get_inventory(my_id, max_age=DATA_MAX_AGE)
+        # 商店为全局共享数据，只需种子价格存在即可，按 shared_data.min_refresh_interval 刷新
+        shop_items_dict = await data_manager.get_shop_data(my_id)
+        garden_data = await data_manager.get_herb_garden(my_id, max_age=DATA_MAX_AGE) # <--- 改为调用 get_herb_garden
 
         if not sect_info:
              task_logger.error("【自动药园】无法从 API 获取宗门信息，任务终止。")
@@ -304,7 +314,9 @@ async def _check_herb_garden():
                     actual_buy_quantity = max(buy_needed, buy_quantity_config)
 
                     if isinstance(shop_items_dict, dict):
-                        target_seed_id = find_item_id_by_name(shop_items_dict, target_seed_name)
+                        catalog = await data_manager.get_item_catalog() # 名称 -> ID 走物品目录索引
+                        target_seed_id = catalog.id_of(target_seed_name) if catalog else None
+                        if target_seed_id not in shop_items_dict: target_seed_id = find_item_id_by_name(shop_items_dict, target_seed_name)
                         if target_seed_id:
                             shop_item = shop_items_dict.get(target_seed_id)
                             if isinstance(shop_item, dict): seed_price = shop_item.get("price", 0)
@@ -345,7 +357,7 @@ async def _check_herb_garden():
 
                 first_command = commands_to_send[0]
                 task_logger.info(f"准备发送序列中的第一个指令: '{first_command}'")
-                success = await context.telegram_client.send_game_command(first_command)
+                success = await context.telegram_client.send_game_command(first_command, priority=PRIORITY_BULK, origin="herb_garden_plugin")
                 if success:
                     task_logger.info(f"第一个指令 '{first_command}' 已成功加入队列。等待响应...")
                     lock_acquired = False # 锁不由 finally 块释放，由序列完成或超时释放
@@ -419,7 +431,8 @@ class Plugin(BasePlugin):
                 self.info(f"已注册药园定时检查任务 (每 {self.check_interval} 分钟)。")
                 self.event_bus.on("telegram_client_started", self._initialize_id)
                 self.event_bus.on("game_command_sent", self.handle_command_sent)
-                self.event_bus.on("game_response_received", self.handle_game_response)
+                # 需要处理无法识别的回复 (立即中断序列并释放锁)，因此不按关键词分类监听
+                self.event_bus.on("game_response_received", self.handle_game_response, when=reply_to_me)
                 self.info("已注册药园相关的 game_command_sent 和 game_response_received 事件监听器。")
             else:
                  self.error("无法注册药园定时任务或监听器：Scheduler 不可用。")
@@ -529,13 +542,13 @@ class Plugin(BasePlugin):
 
             is_success = False; is_no_need = False; is_fail = False; result_type = "unknown"
             command_base = pending_command.split()[0]
-            keywords = GARDEN_KEYWORDS.get(command_base)
+            keywords = GARDEN_KEYWORD_PATTERNS.get(command_base)
             if keywords:
-                if any(re.search(kw, text, re.IGNORECASE) for kw in keywords.get("success", [])):
+                if any(pattern.search(text) for pattern in keywords.get("success", [])):
                     is_success = True; result_type = "成功"
-                elif any(re.search(kw, text, re.IGNORECASE) for kw in keywords.get("no_need", [])):
+                elif any(pattern.search(text) for pattern in keywords.get("no_need", [])):
                     is_no_need = True; result_type = "无需操作"
-                elif any(re.search(kw, text, re.IGNORECASE) for kw in keywords.get("fail", [])):
+                elif any(pattern.search(text) for pattern in keywords.get("fail", [])):
                      is_fail = True; result_type = "失败"
             else:
                  self.warning(f"【自动药园】无法找到指令 '{command_base}' 的关键词定义，将按失败处理。")
@@ -567,7 +580,7 @@ class Plugin(BasePlugin):
                     next_command = commands_in_list[next_index]
                     self.info(f"序列指令 {current_index + 1}/{len(commands_in_list)} 处理完成，准备发送下一条: '{next_command}'")
                     await redis_client.set(index_key, str(next_index), ex=STATE_TTL)
-                    success = await self.context.telegram_client.send_game_command(next_command)
+                    success = await self.context.telegram_client.send_game_command(next_command, priority=PRIORITY_BULK, origin=self.plugin_name)
                     if not success:
                          self.error(f"发送下一条指令 '{next_command}' 失败！清理状态。")
                          await _clear_garden_state(redis_client, self._my_id, self.scheduler, release_lock=True)
@@ -575,16 +588,16 @@ class Plugin(BasePlugin):
                     self.info(f"序列指令 {next_index}/{len(commands_in_list)} 全部处理完成！")
                     await _clear_garden_state(redis_client, self._my_id, self.scheduler, release_lock=True)
                     self.info("【自动药园】序列完成后触发角色数据同步...")
-                    await self.context.event_bus.emit("trigger_character_sync_now")
+                    await self.context.event_bus.emit("trigger_character_sync_now", reason="自动药园")
             elif is_fail:
                 self.error(f"指令 '{pending_command}' 执行失败！序列中断。")
                 await _clear_garden_state(redis_client, self._my_id, self.scheduler, release_lock=True)
                 self.info("【自动药园】指令失败后触发角色数据同步...")
-                await self.context.event_bus.emit("trigger_character_sync_now")
+                await self.context.event_bus.emit("trigger_character_sync_now", reason="自动药园")
             else: # 未知结果
                  self.warning(f"指令 '{pending_command}' 的回复无法判断结果 ({text[:50]}...)，序列中断。")
                  await _clear_garden_state(redis_client, self._my_id, self.scheduler, release_lock=True)
-                 await self.context.event_bus.emit("trigger_character_sync_now")
+                 await self.context.event_bus.emit("trigger_character_sync_now", reason="自动药园")
 
         except ValueError:
             self.error(f"Redis 中的 pending MsgID '{expected_msg_id_str}' 无效！清理状态。")
@@ -592,5 +605,5 @@ class Plugin(BasePlugin):
         except Exception as e:
             self.error(f"处理药园游戏响应时出错: {e}", exc_info=True)
             await _clear_garden_state(redis_client, self._my_id, self.scheduler, release_lock=True)
-            await self.context.event_bus.emit("trigger_character_sync_now")
+            await self.context.event_bus.emit("trigger_character_sync_now", reason="自动药园")
 
@@ -46,7 +46,7 @@ async def trigger_item_sync_update(context: AppContext, force: bool = False) ->
     logger.info("【物品同步触发器】请求 DataManager 更新全局物品主数据缓存...")
     try:
         # 调用 DataManager 的更新方法
-        success = await context.data_manager.update_item_master_cache()
+        success = await context.data_manager.update_item_master_cache(force=force) # 非强制时，其他实例近期已刷新则跳过
         if success:
             logger.info("【物品同步触发器】DataManager 缓存更新成功。")
             # 设置成功标志
@@ -7,12 +7,14 @@ import uuid # 用于生成唯一请求 ID
 from datetime import datetime
 from typing import Optional, Dict, List, Tuple, Any, Coroutine
 from plugins.base_plugin import BasePlugin, AppContext
+from modules.notification_aggregator import NOTIFY_CRITICAL
 from core.context import get_global_context
-from pyrogram.types import Message
+from pyrogram.types import Message, ReplyParameters
 # --- 修改: 导入 GameDataManager 定义的 Key ---
 from modules.game_data_manager import (
     CHAR_INVENTORY_KEY, GAME_ITEMS_MASTER_KEY
 )
+from modules.item_catalog import ItemCatalog
 # --- 修改结束 ---
 
 # --- 常量 ---
@@ -22,51 +24,36 @@ FIND_LISTING_MAX_ATTEMPTS = 12 # 最多尝试查找挂单次数 (5 * 12 = 60 秒
 REDIS_ORDER_EXEC_LOCK_PREFIX = "marketplace_order_exec:lock:" # 防止重复执行订单的锁
 
 # --- 辅助函数 ---
-_item_master_cache: Dict[str, Dict] = {} # 内存缓存物品主数据
-
-async def _get_item_master_data(context: AppContext) -> Dict[str, Dict]:
-    """获取物品主数据 (带内存缓存, 通过 DataManager)"""
-    global _item_master_cache
-    if _item_master_cache:
-        return _item_master_cache
-    # --- 修改: 通过 DataManager 获取 ---
+# --- 修改: 名称 <-> ID 走 DataManager 的物品目录 (主数据刷新后自动重建，不再使用永不失效的模块级缓存) ---
+async def _get_item_catalog(context: AppContext) -> Optional[ItemCatalog]:
+    """获取物品目录 (通过 DataManager)"""
     if not context.data_manager:
-        logging.getLogger("MarketplaceTransferPlugin.Utils").error("无法获取物品主数据：DataManager 未初始化。")
-        return {}
-    # 使用 DataManager 的方法获取数据
-    items_data = await context.data_manager.get_item_master_data(use_cache=True)
-    if items_data:
-        _item_master_cache = items_data # 更新内存缓存
-        logging.getLogger("MarketplaceTransferPlugin.Utils").debug(f"物品主数据已从 DataManager 加载到内存缓存，共 {len(_item_master_cache)} 条。")
-    else:
-        _item_master_cache = {} # 获取失败则清空
-        logging.getLogger("MarketplaceTransferPlugin.Utils").warning("无法从 DataManager 获取物品主数据。")
-    return _item_master_cache
-    # --- 修改结束 ---
+        logging.getLogger("MarketplaceTransferPlugin.Utils").error("无法获取物品目录：DataManager 未初始化。")
+        return None
+    catalog = await context.data_manager.get_item_catalog()
+    if not catalog: logging.getLogger("MarketplaceTransferPlugin.Utils").warning("无法从 DataManager 获取物品目录。")
+    return catalog
 
 async def get_item_id_by_name(context: AppContext, item_name: str) -> Optional[str]:
     """通过名称查找物品 ID"""
     if not item_name: return None
-    master_data = await _get_item_master_data(context) # 使用更新后的函数
-    if not master_data:
+    catalog = await _get_item_catalog(context)
+    if not catalog:
         logging.getLogger("MarketplaceTransferPlugin.Utils").error("物品主数据为空，无法通过名称查找 ID。")
         return None
-    name_to_find = item_name.strip()
-    for item_id, details in master_data.items():
-        if isinstance(details, dict) and details.get("name") == name_to_find:
-            return item_id
-    logging.getLogger("MarketplaceTransferPlugin.Utils").warning(f"物品主数据中未找到名称为 '{name_to_find}' 的物品。")
-    return None
+    item_id = catalog.id_of(item_name)
+    if not item_id: logging.getLogger("MarketplaceTransferPlugin.Utils").warning(f"物品主数据中未找到名称为 '{item_name.strip()}' 的物品。")
+    return item_id
 
 async def get_item_name_by_id(context: AppContext, item_id: str) -> Optional[str]:
     """通过 ID 查找物品名称"""
     if not item_id: return None
-    master_data = await _get_item_master_data(context) # 使用更新后的函数
-    if not master_data:
+    catalog = await _get_item_catalog(context)
+    if not catalog:
         logging.getLogger("MarketplaceTransferPlugin.Utils").error("物品主数据为空，无法通过 ID 查找名称。")
         return item_id # 返回原始 ID 作为后备
-    item_details = master_data.get(item_id)
-    return item_details.get("name", item_id) if isinstance(item_details, dict) else item_id
+    return catalog.name_of(item_id, item_id)
+# --- 修改结束 ---
 
 async def get_inventory_item_quantity(context: AppContext, user_id: int, item_id_to_check: str) -> int:
     """获取指定用户背包中指定物品 ID 的数量 (直接查 Redis，使用新 Key)"""
@@ -124,12 +111,12 @@ class Plugin(BasePlugin):
 
         self.info(f"实例初始化完成: ID={self._my_id}, Username={self._my_username}, 是否管理实例={self._is_admin_instance}")
 
-        await _get_item_master_data(self.context) # 预加载物品数据
-        self.info("物品主数据已预加载到内存缓存。")
+        await _get_item_catalog(self.context) # 预加载物品目录
+        self.info("物品目录已预加载。")
 
         if self.context.redis:
             if self._is_admin_instance and self.request_channel:
-                 await self.context.redis.subscribe(self.request_channel, self.handle_transfer_request)
+                 await self.context.redis.subscribe(self.request_channel, self.handle_transfer_request, ordered=True) # 逐条处理，避免并发请求选中同一卖家
                  self.info(f"已订阅交易请求频道: {self.request_channel}")
             if self.order_channel:
                 await self.context.redis.subscribe(self.order_channel, self.handle_assigned_order)
@@ -158,6 +145,14 @@ class Plugin(BasePlugin):
         self.info(f"已注册管理员指令和 TG 启动监听器。Pub/Sub 订阅将在初始化时进行。")
 
     # --- 接收方逻辑 (handle_admin_command 已在上次修改中优化) ---
+    async def _reply_to(self, message: Message, text: str):
+        """回复管理员消息 (经由 TelegramClient 的出站限速器)"""
+        tg_client = self.context.telegram_client
+        if tg_client:
+            await tg_client.send_message(message.chat.id, text, reply_parameters=ReplyParameters(message_id=message.id))
+        else:
+            await message.reply_text(text, quote=True)
+
     async def handle_admin_command(self, message: Message, my_username: str | None):
         """处理管理员发来的 ,收货 指令 (由接收方机器人处理)"""
         # ... (代码与上一次提供的相同，保持不变) ...
@@ -167,7 +162,7 @@ class Plugin(BasePlugin):
                  await asyncio.sleep(1)
                  if not self._my_id:
                       self.error("插件未完全初始化，无法处理收货指令。")
-                      try: await message.reply_text("❌ 错误：市场插件尚未完全初始化，请稍后再试。", quote=True)
+                      try: await self._reply_to(message, "❌ 错误：市场插件尚未完全初始化，请稍后再试。")
                       except: pass
                       return
              else: self.error("插件初始化不完整 (缺少用户名?)，无法处理收货指令。"); return
@@ -195,14 +190,14 @@ class Plugin(BasePlugin):
 
         reply_target = message
         if error_msg:
-            try: await reply_target.reply_text(error_msg, quote=True)
+            try: await self._reply_to(reply_target, error_msg)
             except Exception:
                 if self.context.telegram_client: await self.context.telegram_client.send_admin_reply(error_msg, original_message=message)
             return
 
         if receive_qty is None or pay_qty is None or receive_qty <= 0 or pay_qty <= 0:
             msg = "❌ 物品数量和支付数量必须大于 0。"
-            try: await reply_target.reply_text(msg, quote=True)
+            try: await self._reply_to(reply_target, msg)
             except Exception:
                  if self.context.telegram_client: await self.context.telegram_client.send_admin_reply(msg, original_message=message)
             return
@@ -212,13 +207,13 @@ class Plugin(BasePlugin):
 
         if not pay_item_id:
             msg = f"❌ 找不到支付物品 '{pay_item_name}' 的 ID。请先 `,同步物品`。"
-            try: await reply_target.reply_text(msg, quote=True)
+            try: await self._reply_to(reply_target, msg)
             except Exception:
                  if self.context.telegram_client: await self.context.telegram_client.send_admin_reply(msg, original_message=message)
             return
         if not receive_item_id:
             msg = f"❌ 找不到需求物品 '{receive_item_name}' 的 ID。请先 `,同步物品`。"
-            try: await reply_target.reply_text(msg, quote=True)
+            try: await self._reply_to(reply_target, msg)
             except Exception:
                 if self.context.telegram_client: await self.context.telegram_client.send_admin_reply(msg, original_message=message)
             return
@@ -257,7 +252,7 @@ class Plugin(BasePlugin):
             self.error(f"将上架指令 '{post_command}' 加入队列失败！")
 
         final_response_msg = "\n".join(response_lines)
-        try: await reply_target.reply_text(final_response_msg, quote=True)
+        try: await self._reply_to(reply_target, final_response_msg)
         except Exception:
             if self.context.telegram_client: await self.context.telegram_client.send_admin_reply(final_response_msg, original_message=message)
 
@@ -300,16 +295,16 @@ class Plugin(BasePlugin):
                         if self.context.telegram_client: await self.context.telegram_client.send_system_notification(admin_notify_text)
                     else:
                         self.error(f"向频道 '{self.order_channel}' 指派购买任务失败！")
-                        if self.context.telegram_client: await self.context.telegram_client.send_system_notification(f"⚠️ 交易任务 (ID: {request_id[:8]}...) 指派给卖家 {suitable_seller_id} 失败！(Redis 发布失败)")
+                        if self.context.telegram_client: await self.context.telegram_client.send_system_notification(f"⚠️ 交易任务 (ID: {request_id[:8]}...) 指派给卖家 {suitable_seller_id} 失败！(Redis 发布失败)", priority=NOTIFY_CRITICAL)
                 else:
                     self.error("无法指派购买任务：Redis 不可用或未配置指派频道。")
-                    if self.context.telegram_client: await self.context.telegram_client.send_system_notification(f"⚠️ 交易任务 (ID: {request_id[:8]}...) 指派给卖家 {suitable_seller_id} 失败！(Redis 不可用)")
+                    if self.context.telegram_client: await self.context.telegram_client.send_system_notification(f"⚠️ 交易任务 (ID: {request_id[:8]}...) 指派给卖家 {suitable_seller_id} 失败！(Redis 不可用)", priority=NOTIFY_CRITICAL)
             else:
                 self.warning(f"未能为交易请求 (ID: {request_id}) 找到拥有足够 '{receive_item_name}' x{receive_qty} 的卖家。")
-                if self.context.telegram_client: await self.context.telegram_client.send_system_notification(f"⚠️ 交易任务 (ID: {request_id[:8]}...)：未能找到拥有足够 {receive_item_name} x{receive_qty} 的卖家。")
+                if self.context.telegram_client: await self.context.telegram_client.send_system_notification(f"⚠️ 交易任务 (ID: {request_id[:8]}...)：未能找到拥有足够 {receive_item_name} x{receive_qty} 的卖家。", priority=NOTIFY_CRITICAL)
         except Exception as scan_e:
             self.error(f"扫描 Redis 库存键时出错: {scan_e}")
-            if self.context.telegram_client: await self.context.telegram_client.send_system_notification(f"⚠️ 交易任务 (ID: {request_id[:8]}...)：扫描 Redis 查找卖家失败！")
+            if self.context.telegram_client: await self.context.telegram_client.send_system_notification(f"⚠️ 交易任务 (ID: {request_id[:8]}...)：扫描 Redis 查找卖家失败！", priority=NOTIFY_CRITICAL)
             return
 
 
@@ -399,7 +394,7 @@ class Plugin(BasePlugin):
                 if success:
                     self.info(f"订单 {request_id}: 购买指令 '{buy_command}' 已成功加入队列。"); status = "success"; reason = f"购买指令已加入队列 (挂单 {listing_id_to_buy})"
                     await asyncio.sleep(1); self.info(f"订单 {request_id}: 购买指令已入队，触发角色数据同步...")
-                    try: await self.context.event_bus.emit("trigger_character_sync_now")
+                    try: await self.context.event_bus.emit("trigger_character_sync_now", reason="市场资源转移")
                     except Exception as sync_e: self.error(f"订单 {request_id}: 尝试在发送购买指令后触发同步时出错: {sync_e}", exc_info=True)
                 else:
                     self.error(f"订单 {request_id}: 将购买指令 '{buy_command}' 加入队列失败！"); status = "failed"; reason = f"将购买指令加入队列失败 (挂单 {listing_id_to_buy})"
@@ -438,6 +433,6 @@ class Plugin(BasePlugin):
             if status != "success":
                 notify_text = f"⚠️ **交易失败** (ID: {request_id[:8]}...)\n卖家: {seller}\n买家: {recipient}\n原因: {reason}\n"
                 if details: notify_text += f"详情: {details}\n"
-                if self.context.telegram_client: await self.context.telegram_client.send_system_notification(notify_text)
+                if self.context.telegram_client: await self.context.telegram_client.send_system_notification(notify_text, priority=NOTIFY_CRITICAL)
             else: self.info(f"交易成功记录 (ID: {request_id[:8]}...): 卖家 {seller} -> 买家 {recipient}. 原因: {reason}. 详情: {details}")
 
@@ -10,6 +10,7 @@ from core.context import get_global_context
 from plugins.character_sync_plugin import format_local_time # 导入时间处理
 from apscheduler.jobstores.base import JobLookupError
 from pyrogram.types import Message
+from core.event_bus import reply_to_me
 
 # --- 常量 ---
 NASCENT_SOUL_JOB_ID = 'auto_nascent_soul_job' # 唯一的智能调度任务
@@ -242,7 +243,7 @@ class Plugin(BasePlugin):
         try:
             if self.scheduler:
                 self.event_bus.on("telegram_client_started", self.initial_check_and_schedule)
-                self.event_bus.on("game_response_received", self.handle_game_response)
+                self.event_bus.on("game_response_received", self.handle_game_response, when=reply_to_me)
                 self.info("已注册元婴出窍相关的启动和游戏响应事件监听器。")
             else:
                  self.error("无法注册元婴出窍功能：Scheduler 不可用。")
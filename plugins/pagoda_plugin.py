@@ -8,6 +8,7 @@ from typing import Optional
 from plugins.base_plugin import BasePlugin, AppContext
 from core.context import get_global_context
 from apscheduler.jobstores.base import JobLookupError
+from modules.warmup import SYSTEM_READY_EVENT
 
 # --- 常量 ---
 PAGODA_JOB_ID = 'auto_pagoda_job'
@@ -17,6 +18,7 @@ REDIS_LAST_RUN_KEY_FORMAT = "daily_task_last_run:pagoda:{}:{}" # 格式: daily_t
 # --- 修改结束 ---
 RETRY_DELAY_MINUTES_CONFIG_KEY = "pagoda.retry_delay_minutes"
 DEFAULT_RETRY_DELAY_MINUTES = 60
+PAGODA_DATA_MAX_AGE = 60 # 判断今日是否已闯塔时接受的缓存最大秒数
 NEXT_DAY_SCHEDULE_HOUR_START = 1
 NEXT_DAY_SCHEDULE_MINUTE_START = 15
 NEXT_DAY_SCHEDULE_JITTER_SECONDS = 30 * 60
@@ -108,7 +110,7 @@ async def _execute_pagoda_and_reschedule():
     try:
         # ... (强制刷新闯塔数据逻辑不变) ...
         logger.info("【自动闯塔】正在通过 DataManager 强制刷新闯塔缓存数据...")
-        pagoda_cache_data = await context.data_manager.get_pagoda_progress(my_id, use_cache=False)
+        pagoda_cache_data = await context.data_manager.get_pagoda_progress(my_id, max_age=PAGODA_DATA_MAX_AGE)
         if isinstance(pagoda_cache_data, dict):
              pagoda_progress_data = pagoda_cache_data.get("progress")
              if isinstance(pagoda_progress_data, dict):
@@ -146,7 +148,7 @@ async def _execute_pagoda_and_reschedule():
                 logger.info(f"【自动闯塔】指令 '{PAGODA_COMMAND}' 已成功加入发送队列。")
                 logger.info("【自动闯塔】触发角色数据同步...")
                 try:
-                    await event_bus.emit("trigger_character_sync_now")
+                    await event_bus.emit("trigger_character_sync_now", reason="自动闯塔")
                 except Exception as sync_e:
                     logger.error(f"【自动闯塔】尝试在发送指令后触发角色同步时出错: {sync_e}", exc_info=True)
 
@@ -218,13 +220,12 @@ class Plugin(BasePlugin):
     def register(self):
         # ... (注册逻辑不变) ...
         if not self.auto_enabled: return
-        self.event_bus.on("telegram_client_started", self.initial_check_and_schedule)
-        self.info(f"已注册 'telegram_client_started' 监听器，用于启动时检查闯塔任务。")
+        self.event_bus.on(SYSTEM_READY_EVENT, self.initial_check_and_schedule) # 启动预热完成后再检查，无需固定延迟
+        self.info(f"已注册 '{SYSTEM_READY_EVENT}' 监听器，用于启动时检查闯塔任务。")
 
-    async def initial_check_and_schedule(self):
-        """应用启动时检查任务状态"""
-        self.info("【自动闯塔】TG 客户端已启动，开始启动时检查任务状态...")
-        await asyncio.sleep(random.uniform(10, 15)) # 随机延迟启动检查
+    async def initial_check_and_schedule(self, report=None):
+        """应用启动 (预热完成) 时检查任务状态"""
+        self.info("【自动闯塔】启动预热已完成，开始启动时检查任务状态...")
 
         context = self.context
         if not context or not context.scheduler or not context.data_manager or not context.redis or not context.telegram_client:
@@ -0,0 +1,175 @@
+import io
+import json
+import logging
+from typing import Any, Dict, List
+from plugins.base_plugin import BasePlugin, AppContext
+from pyrogram.types import Message, ReplyParameters
+from plugins.utils import edit_or_reply
+
+logger = logging.getLogger(__name__)
+
+TOP_LISTENER_COUNT = 10 # 文本输出中按 p95 耗时列出的监听器数量
+JSON_FILE_NAME = "performance_stats.json" # ,性能 json 以文件发送 (完整统计远超单条消息 4096 字符的上限)
+
+
+class Plugin(BasePlugin):
+    """处理 ,性能 指令: 输出事件总线、指令队列等运行时统计"""
+    def __init__(self, context: AppContext, plugin_name: str, cn_name: str | None = None):
+        super().__init__(context, plugin_name, cn_name or "性能统计")
+        self.info("插件已加载。")
+
+    def register(self):
+        """注册指令事件监听器"""
+        self.event_bus.on("system_performance_command", self.handle_performance_command)
+        self.info("已注册 system_performance_command 事件监听器。")
+
+    def collect_stats(self) -> Dict[str, Any]:
+        """汇总各组件统计 (可直接序列化为 JSON)"""
+        stats: Dict[str, Any] = {}
+        if hasattr(self.event_bus, "get_stats"):
+            stats["event_bus"] = self.event_bus.get_stats()
+        tg_client = self.context.telegram_client
+        if tg_client:
+            if hasattr(tg_client, "get_command_queue_stats"):
+                stats["command_queue"] = tg_client.get_command_queue_stats()
+            classifier = getattr(tg_client, "classifier", None)
+            if classifier is not None:
+                stats["classifier"] = {**classifier.stats, "categories": len(classifier.categories())}
+        redis_client = self.context.redis
+        if redis_client and hasattr(redis_client, "get_pubsub_stats"):
+            stats["redis_pubsub"] = redis_client.get_pubsub_stats()
+        if self.data_manager and hasattr(self.data_manager, "get_cache_stats"):
+            stats["game_data"] = self.data_manager.get_cache_stats()
+        sync_plugin = getattr(self.context, "character_sync_plugin", None)
+        if sync_plugin and hasattr(sync_plugin, "get_sync_stats"):
+            stats["character_sync"] = sync_plugin.get_sync_stats()
+        if self.context.warmup:
+            stats["warmup"] = self.context.warmup.get_report()
+        return stats
+
+    def _format_text(self, stats: Dict[str, Any]) -> str:
+        lines = ["📈 **运行性能统计**"]
+        bus_stats = stats.get("event_bus")
+        if bus_stats:
+            listeners: List[Dict[str, Any]] = []
+            failures = 0; slow = 0
+            for event_name, event_stats in bus_stats["events"].items():
+                for listener in event_stats["listeners"]:
+                    failures += listener["failures"]; slow += listener["slow"]
+                    if listener["invocations"]: listeners.append({**listener, "event": event_name})
+            lines.append(
+                f"\n🚌 **事件总线** (运行 {bus_stats['uptime_seconds'] / 3600:.1f} 小时)\n"
+                f"  运行中任务: {bus_stats['running_tasks']} | 失败: {failures} | 慢处理: {slow} (阈值 {bus_stats['slow_listener_threshold']} 秒)"
+            )
+            listeners.sort(key=lambda item: item["p95_ms"], reverse=True)
+            for listener in listeners[:TOP_LISTENER_COUNT]:
+                short_name = ".".join(listener["listener"].rsplit(".", 2)[-2:]) # 模块末段.函数名
+                line = (f"  `{short_name}` ({listener['event']}): {listener['invocations']} 次, "
+                        f"p50 {listener['p50_ms']}ms / p95 {listener['p95_ms']}ms / max {listener['max_ms']}ms")
+                if listener["in_flight"]: line += f", 运行中 {listener['in_flight']}"
+                if listener["failures"]: line += f", 失败 {listener['failures']}"
+                if listener.get("pending"): line += f", 排队 {listener['pending']}"
+                if listener.get("dropped") or listener.get("timeouts"): line += f", 丢弃 {listener['dropped']} / 超时 {listener['timeouts']}"
+                lines.append(line)
+        queue_stats = stats.get("command_queue")
+        if queue_stats:
+            lines.append("\n📤 **指令队列**")
+            for lane in ("urgent", "normal", "bulk"):
+                lane_stats = queue_stats.get(lane)
+                if not lane_stats: continue
+                lines.append(
+                    f"  {lane}: 积压 {lane_stats['depth']} | 已发 {lane_stats['sent']} | 过期 {lane_stats['expired']} | "
+                    f"等待 p50 {lane_stats['wait_p50']}s / p95 {lane_stats['wait_p95']}s"
+                )
+            correlator = queue_stats.get("correlator")
+            if correlator:
+                lines.append(f"  关联: 等待回复 {correlator['pending']} | 已回复 {correlator['resolved']} | 超时 {correlator['timeouts']}")
+            edits = queue_stats.get("edits")
+            if edits:
+                lines.append(f"  编辑合并 ({edits['mode']}): 收到 {edits['edits']} | 分发 {edits['dispatched']} | 合并 {edits['coalesced']} | 无变化 {edits['unchanged']}")
+            outbound = queue_stats.get("outbound")
+            if outbound:
+                lines.append(f"  出站限速: {outbound['global_rate_per_minute']}/分钟 ({outbound['rate_fraction']:.0%}) | 调用 {outbound['calls']} | 限速等待 {outbound['throttled']} 次 | FloodWait {outbound['flood_waits']}")
+            notifications = queue_stats.get("notifications")
+            if notifications:
+                lines.append(f"  通知: 收到 {notifications['received']} | 实际发送 {notifications['sent_messages']} | 合并 {notifications['merged']} | 紧急 {notifications['critical']}")
+        pubsub = stats.get("redis_pubsub")
+        if pubsub:
+            lines.append("\n📡 **Redis 频道**")
+            for channel, channel_stats in pubsub.items():
+                lines.append(
+                    f"  `{channel}`: 积压 {channel_stats['depth']} (峰值 {channel_stats['max_depth']}) | 处理 {channel_stats['processed']} | "
+                    f"失败 {channel_stats['failed']} | 丢弃 {channel_stats['dropped']} | p95 {channel_stats['handler_p95_ms']}ms"
+                )
+        game_data = stats.get("game_data")
+        if game_data:
+            refresh = game_data["refresh"]
+            lines.append(f"\n🗄️ **角色缓存** (API 刷新 {refresh['started']} 次 | 合并并发刷新 {refresh['joined']} 次)")
+            sync = game_data.get("sync")
+            if sync and sync["syncs"]:
+                lines.append(
+                    f"  同步: {sync['syncs']} 次 | 写入 Key {sync['keys_written']} / 未变化 {sync['keys_unchanged']} | "
+                    f"{sync['bytes_written'] / 1024:.1f} KB | 变化事件 {sync['events']} | API 平均 {sync['api_ms_avg']}ms / 处理平均 {sync['process_ms_avg']}ms"
+                )
+            sync_requests = stats.get("character_sync")
+            if sync_requests:
+                lines.append(
+                    f"  同步请求: {sync_requests['requests']} 次 (紧急 {sync_requests['urgent']}) | 合并抑制 {sync_requests['suppressed']} | "
+                    f"实际同步 {sync_requests['syncs']} | 失败 {sync_requests['failures']}"
+                )
+            l1 = game_data.get("l1")
+            if l1:
+                hit_rate = f"{l1['hit_rate']:.0%}" if l1["hit_rate"] is not None else "-"
+                lines.append(f"  L1: {l1['size']}/{l1['max_entries']} 条 | 命中 {l1['hits']} | 未命中 {l1['misses']} | 命中率 {hit_rate} | 失效 {l1['invalidations']}")
+            shared = game_data.get("shared")
+            if shared:
+                lines.append(f"  全局数据: API 刷新 {shared['fetches']} 次 | 近期已刷新跳过 {shared['skipped_fresh']} | 等待租约 {shared['lease_waits']} | 收到更新通知 {shared['notifications']}")
+            catalog = game_data.get("item_catalog")
+            if catalog and catalog.get("items") is not None:
+                lines.append(f"  物品目录: {catalog['items']} 条 | 重建 {catalog['builds']} 次 | 复用 {catalog['hits']} 次")
+            for data_type, type_stats in sorted(game_data["types"].items()):
+                hit_rate = f"{type_stats['hit_rate']:.0%}" if type_stats["hit_rate"] is not None else "-"
+                lines.append(
+                    f"  {data_type}: 命中 {type_stats['hits']} | 过期命中 {type_stats['stale_hits']} (最久超期 {type_stats['max_staleness']}s) | "
+                    f"未命中 {type_stats['misses']} | 超龄刷新 {type_stats['too_old']} | 后台刷新 {type_stats['background_refreshes']} | 命中率 {hit_rate}"
+                )
+        warmup = stats.get("warmup")
+        if warmup:
+            if warmup["ready"]:
+                lines.append(f"\n🚀 **启动预热**: 耗时 {warmup['warmup_seconds']}s | 进程启动后 {warmup['time_to_ready']}s 就绪")
+            else:
+                lines.append("\n🚀 **启动预热**: 进行中")
+            for step in warmup["steps"]:
+                timing = f"{step['start_offset']}s 开始, 用时 {step['duration']}s" if step["duration"] is not None else "-"
+                lines.append(f"  {step['name']}: {step['status']} ({timing})" + (f" - {step['error']}" if step["error"] else ""))
+        classifier = stats.get("classifier")
+        if classifier:
+            lines.append(f"\n🏷️ **消息分类**: 已分类 {classifier['classified']} | 命中 {classifier['matched']} | 分类数 {classifier['categories']}")
+        lines.append("\n💡 使用 `,性能 json` 获取完整的机器可读统计 (JSON 文件)。")
+        return "\n".join(lines)
+
+    async def handle_performance_command(self, message: Message, args: str | None, edit_target_id: int | None):
+        """处理 ,性能 [json] 指令"""
+        self.info(f"处理 ,性能 指令 (args: {args})")
+        stats = self.collect_stats()
+        if args and args.strip().lower() == "json":
+            await self._send_json(message, edit_target_id, stats)
+            return
+        await edit_or_reply(self, message.chat.id, edit_target_id, self._format_text(stats), original_message=message)
+
+    async def _send_json(self, message: Message, edit_target_id: int | None, stats: Dict[str, Any]):
+        """以 JSON 文件发送完整统计 (不经过消息截断)"""
+        tg_client = self.context.telegram_client
+        if not tg_client: self.error("无法发送性能统计 JSON：TG 客户端不可用。"); return
+        payload = json.dumps(stats, ensure_ascii=False, indent=1, default=str).encode("utf-8")
+        document = io.BytesIO(payload); document.name = JSON_FILE_NAME
+        try:
+            await tg_client.send_document(
+                message.chat.id, document, caption=f"📈 运行性能统计 (JSON, {len(payload) / 1024:.1f} KB)",
+                reply_parameters=ReplyParameters(message_id=message.id),
+            )
+        except Exception as e:
+            self.error(f"发送性能统计 JSON 文件失败: {e}", exc_info=True)
+            await edit_or_reply(self, message.chat.id, edit_target_id, f"❌ 发送 JSON 文件失败: {e}", original_message=message)
+            return
+        if edit_target_id: await edit_or_reply(self, message.chat.id, edit_target_id, "✅ 完整统计已以 JSON 文件发送。", original_message=message)
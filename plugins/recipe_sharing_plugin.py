@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, List, Tuple, Set, Any
 from plugins.base_plugin import BasePlugin, AppContext
 from core.context import get_global_context # <--- 导入 get_global_context
+from modules.redis_client import TASK_ROUTING_SHARED, TASK_ROUTING_ADDRESSED, addressed_task_channel
 from apscheduler.jobstores.base import JobLookupError
 
 # --- 从 GameDataManager 导入 Key ---
@@ -45,6 +46,10 @@ async def _publish_task_internal(context: AppContext, target_user_id: int, task_
     if not task_channel:
          logger.error(f"无法发布任务 '{task_type}' 给 {target_user_id}: 任务频道未配置。")
          return None
+    # --- 新增: 定向路由时直接发布到目标实例的频道 ---
+    if context.config.get("communication.task_routing", TASK_ROUTING_SHARED) == TASK_ROUTING_ADDRESSED:
+        task_channel = addressed_task_channel(task_channel, target_user_id)
+    # --- 新增结束 ---
 
     if not task_id:
         task_id = f"{task_type}_{uuid.uuid4()}"
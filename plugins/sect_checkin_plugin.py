@@ -8,6 +8,7 @@ from typing import Optional
 from plugins.base_plugin import BasePlugin, AppContext
 from core.context import get_global_context
 from apscheduler.jobstores.base import JobLookupError
+from modules.warmup import SYSTEM_READY_EVENT
 
 # --- 常量 ---
 CHECKIN_JOB_ID = 'auto_sect_checkin_job'
@@ -20,6 +21,7 @@ DEFAULT_RETRY_DELAY_MINUTES = 60
 NEXT_DAY_SCHEDULE_HOUR_START = 0
 NEXT_DAY_SCHEDULE_MINUTE_START = 5
 NEXT_DAY_SCHEDULE_JITTER_SECONDS = 30 * 60
+SECT_DATA_MAX_AGE = 60 # 判断今日是否已点卯时接受的缓存最大秒数
 
 async def _get_local_timezone(config) -> pytz.BaseTzInfo:
     """获取配置的本地时区，默认为上海"""
@@ -108,7 +110,7 @@ async def _execute_checkin_and_reschedule():
     try:
         # ... (强制刷新宗门数据逻辑不变) ...
         logger.info("【自动点卯】正在通过 DataManager 强制刷新宗门缓存数据...")
-        sect_data = await context.data_manager.get_sect_info(my_id, use_cache=False)
+        sect_data = await context.data_manager.get_sect_info(my_id, max_age=SECT_DATA_MAX_AGE)
         if sect_data:
             last_checkin_date_str = sect_data.get("last_sect_check_in")
             logger.info(f"【自动点卯】获取到最新上次点卯日期: {last_checkin_date_str}")
@@ -142,7 +144,7 @@ async def _execute_checkin_and_reschedule():
                 logger.info(f"【自动点卯】指令 '{CHECKIN_COMMAND}' 已成功加入发送队列。")
                 logger.info("【自动点卯】触发角色数据同步...")
                 try:
-                    await event_bus.emit("trigger_character_sync_now")
+                    await event_bus.emit("trigger_character_sync_now", reason="自动点卯")
                 except Exception as sync_e:
                     logger.error(f"【自动点卯】尝试在发送指令后触发角色同步时出错: {sync_e}", exc_info=True)
 
@@ -214,13 +216,12 @@ class Plugin(BasePlugin):
     def register(self):
         # ... (注册逻辑不变) ...
         if not self.auto_enabled: return
-        self.event_bus.on("telegram_client_started", self.initial_check_and_schedule)
-        self.info(f"已注册 'telegram_client_started' 监听器，用于启动时检查点卯任务。")
+        self.event_bus.on(SYSTEM_READY_EVENT, self.initial_check_and_schedule) # 启动预热完成后再检查，无需固定延迟
+        self.info(f"已注册 '{SYSTEM_READY_EVENT}' 监听器，用于启动时检查点卯任务。")
 
-    async def initial_check_and_schedule(self):
-        """应用启动时检查任务状态"""
-        self.info("【自动点卯】TG 客户端已启动，开始启动时检查任务状态...")
-        await asyncio.sleep(random.uniform(5, 10)) # 随机延迟启动检查
+    async def initial_check_and_schedule(self, report=None):
+        """应用启动 (预热完成) 时检查任务状态"""
+        self.info("【自动点卯】启动预热已完成，开始启动时检查任务状态...")
 
         context = self.context
         if not context or not context.scheduler or not context.data_manager or not context.redis or not context.telegram_client:
@@ -10,6 +10,10 @@ from plugins.base_plugin import BasePlugin, AppContext
 from core.context import get_global_context
 from apscheduler.jobstores.base import JobLookupError
 from pyrogram.types import Message, ReplyParameters
+from modules.command_queue import GameCommand
+from modules.game_message_classifier import GameMessage
+from core.event_bus import reply_to_me
+from modules.warmup import SYSTEM_READY_EVENT
 from plugins.character_sync_plugin import format_local_time
 
 # --- 常量 ---
@@ -26,6 +30,7 @@ PLACEHOLDER_MESSAGES = [
     "嗯嗯", "哦", "ok", "k", "行", ".", "可",
 ]
 TEACH_SUCCESS_KEYWORDS = ["传功玉简已记录！", "获得了", "点贡献", "今日已传功"]
+TEACH_RESPONSE_KEYWORDS = ["传功玉简已记录！", "传功失败", "次数已用完", "无法传功", "今日传功次数已达上限", "过于频繁"] # 消息分类用
 
 async def _get_local_timezone(config) -> pytz.BaseTzInfo:
     """获取配置的本地时区，默认为上海"""
@@ -177,18 +182,17 @@ class Plugin(BasePlugin):
                 self.info(f"已注册宗门传功状态定时检查任务 (每 {self.check_interval_minutes} 分钟)。")
             else: self.error("无法注册定时任务：Scheduler 不可用。")
             self.event_bus.on("game_command_sent", self.handle_command_sent)
-            self.event_bus.on("game_response_received", self.handle_game_response)
+            self.listen_game_category("sect_teach", TEACH_RESPONSE_KEYWORDS, self.handle_game_response, when=reply_to_me)
             self.info("已注册传功相关的 game_command_sent, game_response_received 事件监听器。")
-            self.event_bus.on("telegram_client_started", self.run_initial_check)
+            self.event_bus.on(SYSTEM_READY_EVENT, self.run_initial_check)
         except Exception as e: self.error(f"注册宗门传功定时任务或监听器时出错: {e}", exc_info=True)
 
-    async def run_initial_check(self):
-        # ... (启动检查逻辑不变) ...
+    async def run_initial_check(self, report=None):
+        """启动预热完成后执行首次检查 (缓存已就绪，无需固定延迟)"""
         if self.context.telegram_client:
              self._my_id = await self.context.telegram_client.get_my_id()
              self._my_username = await self.context.telegram_client.get_my_username()
-        self.info("【自动传功】TG客户端已启动，延迟后执行首次检查...")
-        await asyncio.sleep(random.uniform(20, 40)) # 随机延迟
+        self.info("【自动传功】启动预热已完成，执行首次检查...")
         await _check_sect_teach()
 
     async def handle_command_sent(self, sent_message: Message, command_text: str):
@@ -222,19 +226,19 @@ class Plugin(BasePlugin):
 
             async def add_reply_to_queue_task(p_msg_id, delay_sec):
                 await asyncio.sleep(delay_sec)
-                command_with_reply_info = f"{TEACH_COMMAND} --reply_to {p_msg_id}"
-                self.info(f"【自动传功】延迟结束，将传功指令 '{command_with_reply_info}' 加入队列...")
-                success = await self.context.telegram_client.send_game_command(command_with_reply_info)
-                if success: self.info(f"【自动传功】传功指令 '{command_with_reply_info}' 已成功加入队列。")
+                teach_command = GameCommand(TEACH_COMMAND, reply_to=p_msg_id, origin=self.plugin_name)
+                self.info(f"【自动传功】延迟结束，将传功指令 '{TEACH_COMMAND}' (回复 {p_msg_id}) 加入队列...")
+                success = await self.context.telegram_client.send_game_command(teach_command)
+                if success: self.info(f"【自动传功】传功指令 '{TEACH_COMMAND}' (回复 {p_msg_id}) 已成功加入队列。")
                 else: self.error("【自动传功】将传功指令加入队列失败。")
 
             asyncio.create_task(add_reply_to_queue_task(placeholder_msg_id, delay))
             return
-        elif command_text.startswith(TEACH_COMMAND): # 检查是否是传功指令本身（带回复标记的）
-            self.info(f"【自动传功】步骤 4: 监听到传功指令 '{command_text.split('--reply_to')[0].strip()}' 已发送 (MsgID: {sent_message.id})。等待游戏响应...")
+        elif command_text.startswith(TEACH_COMMAND): # 检查是否是传功指令本身（回复占位消息的）
+            self.info(f"【自动传功】步骤 4: 监听到传功指令 '{command_text}' 已发送 (MsgID: {sent_message.id})。等待游戏响应...")
 
 
-    async def handle_game_response(self, message: Message, is_reply_to_me: bool, is_mentioning_me: bool):
+    async def handle_game_response(self, message: Message, is_reply_to_me: bool, is_mentioning_me: bool, game_message: Optional[GameMessage] = None):
         """处理游戏响应，确认传功是否成功，并可能触发下一次"""
         # ... (逻辑不变) ...
         if not self.auto_enabled or not self.context.data_manager or not self.context.event_bus or not self.context.redis: return
@@ -277,7 +281,7 @@ class Plugin(BasePlugin):
 
         self.info(f"【自动传功】触发角色同步 (原因: {sync_reason})...")
         try:
-            await self.context.event_bus.emit("trigger_character_sync_now")
+            await self.context.event_bus.emit("trigger_character_sync_now", reason="自动传功")
             self.info("【自动传功】角色同步事件已发出。")
         except Exception as sync_e: self.error(f"【自动传功】尝试触发角色同步时出错: {sync_e}", exc_info=True)
 
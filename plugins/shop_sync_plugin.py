@@ -29,13 +29,11 @@ async def trigger_shop_sync_update(context: Optional[AppContext] = None, force:
         logger.error(f"【商店同步触发器】失败：{msg}")
         return False, 0, msg
 
-    # force 参数在此处意义不大，因为商店通常基于用户 ID，每日同步一次即可
-    # 但保留参数以防未来需要
-
-    logger.info(f"【商店同步触发器】请求 DataManager 更新用户 {my_id} 的商店缓存...")
+    # --- 修改: 商店为全局共享数据，非强制时若其他实例近期已刷新则跳过 API 调用 ---
+    logger.info(f"【商店同步触发器】请求 DataManager 更新全局商店缓存 (触发用户: {my_id})...")
     try:
         # 调用 DataManager 的更新方法
-        success = await local_context.data_manager.update_shop_cache(my_id)
+        success = await local_context.data_manager.update_shop_cache(my_id, force=force)
         if success:
             logger.info(f"【商店同步触发器】DataManager 商店缓存更新成功 (用户: {my_id})。")
             return True, 0, f"✅ DataManager 商店缓存更新已触发 (用户: {my_id})。" # 数量无意义
@@ -83,7 +81,9 @@ class Plugin(BasePlugin):
                 self.error("无法注册定时任务：Scheduler 不可用。")
 
             run_on_startup = self.config.get("sync_on_startup.shop", True)
-            if run_on_startup:
+            if run_on_startup and self.context.warmup:
+                self.info("启动时商店同步由启动预热负责。")
+            elif run_on_startup:
                 self.info("将在 TG 客户端启动后触发一次商店信息同步。")
                 self.event_bus.on("telegram_client_started", self.run_startup_sync)
         except Exception as e:
@@ -12,6 +12,8 @@ import random # 增加 random 导入
 
 # 导入 GDM Key 和常量
 from modules.game_data_manager import CHAR_INVENTORY_KEY
+from modules.game_models import Inventory
+from modules.item_catalog import ItemCatalog
 from plugins.constants import GAME_CRAFTING_RECIPES_KEY
 # 导入辅助函数 (现在 edit_or_reply 会返回 Message)
 from plugins.utils import edit_or_reply, get_my_id
@@ -23,7 +25,9 @@ DEFAULT_PAY_ITEM_NAME = "灵石" # 收货时默认支付物品
 DEFAULT_PAY_QTY = 1        # 收货时默认支付数量
 MATERIAL_WAIT_TIMEOUT = 300 # 等待材料到账的超时时间 (秒), 5分钟
 MATERIAL_CHECK_INTERVAL = 15 # 检查材料是否到账的间隔 (秒)
+INVENTORY_MAX_AGE = 5 # 检查背包时接受的缓存最大秒数 (需小于检查间隔，才能看到新到账的材料)
 LEARN_RECIPE_COMMAND_FORMAT = ".学习 {}" # 学习指令格式
+RECIPE_NAME_SUFFIXES = ("丹方", "图纸", "阵图", "配方") # 配方物品名称可能的后缀
 
 # --- 辅助函数 ---
 async def get_recipe(redis_client: Any, item_name: str) -> Optional[Dict[str, int]]: # 添加类型提示
@@ -39,28 +43,24 @@ async def get_recipe(redis_client: Any, item_name: str) -> Optional[Dict[str, in
     except Exception as e: logger.error(f"获取配方 '{item_name}' 出错: {e}", exc_info=True); return None
 
 # --- (修改: check_materials 接受 quantity 参数) ---
-async def check_materials(inventory_data: Optional[Dict], recipe: Dict[str, int], item_master: Dict[str, Dict], quantity: int = 1) -> Tuple[bool, Dict[str, int]]:
+async def check_materials(inventory_data: Optional[Inventory | Dict], recipe: Dict[str, int], item_master: Dict[str, Dict], quantity: int = 1) -> Tuple[bool, Dict[str, int]]:
     """检查背包数据是否满足配方需求 (考虑炼制数量)"""
     missing_materials: Dict[str, int] = {}
-    if not inventory_data or not isinstance(inventory_data.get("items_by_type"), dict):
+    # --- 修改: 使用背包模型的名称索引 (同名物品数量已合并)，不再展开整个背包 ---
+    inventory = inventory_data if isinstance(inventory_data, Inventory) else None
+    if inventory is None and isinstance(inventory_data, dict) and isinstance(inventory_data.get("items_by_type"), dict):
+        inventory = Inventory.from_cache(inventory_data)
+    if inventory is None:
         logger.warning("检查材料：背包数据无效。")
         # 如果背包无效，返回所有材料都缺少 (乘以数量)
         total_required = {name: qty * quantity for name, qty in recipe.items()}
         return False, total_required
-
-    current_materials: Dict[str, int] = {}
-    items_by_type = inventory_data.get("items_by_type", {})
-    all_items_flat: List[Dict] = [item for sublist in items_by_type.values() if isinstance(sublist, list) for item in sublist]
-
-    for item in all_items_flat:
-        if isinstance(item, dict) and "name" in item and "quantity" in item:
-            # 累加同名物品的数量 (以防背包数据中有重复条目)
-            current_materials[item["name"]] = current_materials.get(item["name"], 0) + item.get("quantity", 0)
+    # --- 修改结束 ---
 
     has_enough = True
     for material_name, required_qty_per_item in recipe.items():
         total_required_qty = required_qty_per_item * quantity # 计算总需求量
-        available_qty = current_materials.get(material_name, 0)
+        available_qty = inventory.quantity_by_name(material_name)
         if available_qty < total_required_qty:
             has_enough = False
             missing_qty = total_required_qty - available_qty
@@ -72,26 +72,27 @@ async def check_materials(inventory_data: Optional[Dict], recipe: Dict[str, int]
     return has_enough, missing_materials
 # --- (修改结束) ---
 
-async def get_item_id_by_name_local(item_name: str, item_master: Dict[str, Dict]) -> Optional[str]:
-    """在本插件内部通过名称查找物品 ID"""
-    if not item_name or not item_master: return None
-    name_to_find = item_name.strip()
-    for item_id, details in item_master.items():
-        if isinstance(details, dict) and details.get("name") == name_to_find:
-            return item_id
-    logger.warning(f"物品主数据中未找到名称为 '{name_to_find}' 的物品。")
-    return None
-
-async def find_recipe_item_in_inventory(inventory_data: Optional[Dict], recipe_item_id: str) -> bool:
+def find_recipe_for_item(catalog: ItemCatalog, item_id: str, item_name: str) -> Tuple[Optional[str], Optional[str]]:
+    """查找产品对应的配方物品 (ID, 名称): recipe_{产品ID} > 产品名+后缀 > 以产品名开头的配方"""
+    potential_recipe_id = f"recipe_{item_id}"
+    record = catalog.get(potential_recipe_id)
+    if record and record.get("type") == "recipe":
+        return potential_recipe_id, record.get("name", item_name + "配方")
+    for suffix in RECIPE_NAME_SUFFIXES:
+        recipe_id = catalog.id_of(item_name + suffix)
+        if recipe_id and (catalog.get(recipe_id) or {}).get("type") == "recipe":
+            return recipe_id, catalog.name_of(recipe_id)
+    for recipe_id, recipe_name in catalog.prefix_search(item_name, limit=20): # 容错
+        if (catalog.get(recipe_id) or {}).get("type") == "recipe":
+            return recipe_id, recipe_name
+    return None, None
+
+async def find_recipe_item_in_inventory(inventory_data: Optional[Inventory | Dict], recipe_item_id: str) -> bool:
     """检查背包中是否存在指定的配方物品 ID"""
-    if not inventory_data or not isinstance(inventory_data.get("items_by_type"), dict) or not recipe_item_id:
-        return False
-    recipe_list = inventory_data.get("items_by_type", {}).get("recipe", [])
-    if isinstance(recipe_list, list):
-        for item in recipe_list:
-            if isinstance(item, dict) and item.get("item_id") == recipe_item_id:
-                return True
-    return False
+    if not inventory_data or not recipe_item_id: return False
+    inventory = inventory_data if isinstance(inventory_data, Inventory) else Inventory.from_cache(inventory_data)
+    item = inventory.by_id.get(recipe_item_id)
+    return item is not None and item.type == "recipe"
 
 async def get_total_material_availability(context: AppContext, crafter_id: int, missing_materials: Dict[str, int], item_master: Dict[str, Dict]) -> Tuple[Dict[str, int], Dict[str, int]]:
     """检查所有其他助手总共拥有多少缺少的材料 (返回 total_available, shortfall)"""
@@ -115,18 +116,11 @@ async def get_total_material_availability(context: AppContext, crafter_id: int,
                 if assistant_id == crafter_id: continue
 
                 # 使用 DataManager 获取缓存，减少 Redis 直接读取压力
-                inv_data = await context.data_manager.get_inventory(assistant_id, use_cache=True)
-                if not inv_data or not isinstance(inv_data.get("items_by_type"), dict): continue
-
-                current_assistant_materials: Dict[str, int] = {}
-                items_by_type = inv_data.get("items_by_type", {})
-                all_items_flat_other: List[Dict] = [item for sublist in items_by_type.values() if isinstance(sublist, list) for item in sublist]
-                for item in all_items_flat_other:
-                    if isinstance(item, dict) and "name" in item and "quantity" in item:
-                        current_assistant_materials[item["name"]] = current_assistant_materials.get(item["name"], 0) + item.get("quantity", 0) # 累加同名物品
+                assistant_inventory = await context.data_manager.get_inventory_model(assistant_id, use_cache=True)
+                if not assistant_inventory or not assistant_inventory.items: continue
 
                 for mat_name, needed_qty in list(shortfall.items()): # 遍历 shortfall 的副本，因为可能在循环中删除
-                    qty_on_assistant = current_assistant_materials.get(mat_name, 0)
+                    qty_on_assistant = assistant_inventory.quantity_by_name(mat_name) # 名称索引已合并同名物品
                     if qty_on_assistant > 0:
                         total_available[mat_name] += qty_on_assistant
                         can_provide = min(needed_qty, qty_on_assistant) # 该助手能提供的数量
@@ -209,49 +203,25 @@ class Plugin(BasePlugin):
             # 0. 获取物品主数据
             await update_status(f"⏳ 正在加载基础数据...")
             item_master = await self.data_manager.get_item_master_data(use_cache=True)
-            if not item_master:
+            catalog = await self.data_manager.get_item_catalog()
+            if not item_master or not catalog:
                 await update_status("❌ 无法获取物品主数据，无法继续。")
                 return
 
-            target_item_id = await get_item_id_by_name_local(item_name, item_master)
+            # --- 修改: 名称解析与配方查找走物品目录索引 (支持前缀唯一匹配，找不到时给出候选) ---
+            target_item_id = catalog.resolve(item_name)
             if not target_item_id:
-                 await update_status(f"❌ 在物品主数据中找不到物品 '{item_name}'。")
+                 candidates = "、".join(name for _, name, _ in catalog.search(item_name))
+                 await update_status(f"❌ 在物品主数据中找不到物品 '{item_name}'。" + (f"\n你是否想找: {candidates}" if candidates else ""))
                  return
+            if catalog.name_of(target_item_id) != item_name:
+                 self.info(f"物品名称 '{item_name}' 解析为 '{catalog.name_of(target_item_id)}' ({target_item_id})。")
+                 item_name = catalog.name_of(target_item_id, item_name)
 
-            # --- 修改: 更健壮地查找配方ID和名称 ---
-            actual_recipe_id: Optional[str] = None
-            actual_recipe_name: Optional[str] = None
-            possible_suffixes = ["丹方", "图纸", "阵图", "配方"] # 可能的配方后缀
-
-            # 尝试直接通过产品ID构造 recipe_ID 查找
-            potential_recipe_id = f"recipe_{target_item_id}"
-            if potential_recipe_id in item_master and item_master[potential_recipe_id].get("type") == "recipe":
-                 actual_recipe_id = potential_recipe_id
-                 actual_recipe_name = item_master[actual_recipe_id].get("name", item_name + "配方") # 使用 item master 中的名字
-                 logger.info(f"通过构造 recipe_{target_item_id} 找到配方 ID: {actual_recipe_id}, 名称: {actual_recipe_name}")
+            actual_recipe_id, actual_recipe_name = find_recipe_for_item(catalog, target_item_id, item_name)
+            if actual_recipe_id:
+                logger.info(f"找到 '{item_name}' 的配方 ID: {actual_recipe_id}, 名称: {actual_recipe_name}")
             else:
-                 # 尝试通过名称匹配 (产品名称 + 后缀)
-                 logger.debug(f"未通过构造找到配方 ID，尝试通过名称 '{item_name}' + 后缀查找...")
-                 for item_id, details in item_master.items():
-                     if details.get("type") == "recipe":
-                         recipe_name = details.get("name", "")
-                         # 检查是否以 产品名+后缀 结尾
-                         is_match = False
-                         for suffix in possible_suffixes:
-                             if recipe_name == item_name + suffix:
-                                 is_match = True
-                                 break
-                         # 如果不匹配，再检查是否以 产品名 开头 (作为备选)
-                         if not is_match and recipe_name.startswith(item_name):
-                              is_match = True # 容错
-
-                         if is_match:
-                             actual_recipe_id = item_id
-                             actual_recipe_name = recipe_name
-                             logger.info(f"通过名称匹配找到配方 ID: {actual_recipe_id}, 名称: {actual_recipe_name}")
-                             break # 找到第一个就停止
-
-            if not actual_recipe_id:
                 self.warning(f"无法在物品主数据中明确找到物品 '{item_name}' (ID: {target_item_id}) 对应的配方物品 ID 和名称。将跳过学习检查。")
             # --- 修改结束 ---
 
@@ -266,14 +236,14 @@ class Plugin(BasePlugin):
             # 2. 配方学习检查
             if actual_recipe_id and actual_recipe_name: # 只有在找到确切配方信息时才检查
                 await update_status(f"⏳ 正在检查 {crafter_username} 是否已学习配方 '{actual_recipe_name}'...")
-                learned_recipes_list = await self.data_manager.get_learned_recipes(crafter_id, use_cache=False)
+                learned_recipes_list = await self.data_manager.get_learned_recipes(crafter_id, max_age=INVENTORY_MAX_AGE)
                 if learned_recipes_list is None:
                     await update_status(f"❌ 无法获取 {crafter_username} 已学习的配方列表。"); return
 
                 if actual_recipe_id not in learned_recipes_list:
                     self.warning(f"助手 {crafter_username} 未学习配方 '{actual_recipe_name}' (ID: {actual_recipe_id})。检查背包...")
                     await update_status(f"⚠️ {crafter_username} 未学习配方，正在检查背包...")
-                    inventory_data_learn = await self.data_manager.get_inventory(crafter_id, use_cache=False)
+                    inventory_data_learn = await self.data_manager.get_inventory_model(crafter_id, max_age=INVENTORY_MAX_AGE)
                     recipe_item_found = await find_recipe_item_in_inventory(inventory_data_learn, actual_recipe_id)
 
                     if recipe_item_found:
@@ -300,7 +270,7 @@ class Plugin(BasePlugin):
                 self.info(f"第 {check_attempt + 1} 次检查材料 (炼制 {quantity} 个)...")
                 await update_status(f"⏳ 第 {check_attempt + 1} 次检查 {crafter_username} 的材料 (炼制 {quantity} 个)...")
 
-                inventory_data = await self.data_manager.get_inventory(crafter_id, use_cache=False) # 强制刷新背包
+                inventory_data = await self.data_manager.get_inventory_model(crafter_id, max_age=INVENTORY_MAX_AGE) # 强制刷新背包
                 if not inventory_data:
                     await update_status(f"❌ 无法获取 {crafter_username} 的背包信息。")
                     return
@@ -342,13 +312,13 @@ class Plugin(BasePlugin):
 
                 pay_item_name_default = self.config.get("marketplace_transfer.default_pay_item_name", DEFAULT_PAY_ITEM_NAME)
                 pay_qty_default = self.config.get("marketplace_transfer.default_pay_quantity", DEFAULT_PAY_QTY)
-                pay_item_id_default = await get_item_id_by_name_local(pay_item_name_default, item_master)
+                pay_item_id_default = catalog.id_of(pay_item_name_default)
                 if not pay_item_id_default:
                      await update_status(f"❌ 无法获取默认支付物品 '{pay_item_name_default}' 的 ID。"); return
 
                 publish_success_count = 0; publish_fail_count = 0; all_request_ids = []
                 for mat_name, qty_needed in materials_to_request.items():
-                    mat_id = await get_item_id_by_name_local(mat_name, item_master)
+                    mat_id = catalog.id_of(mat_name)
                     if not mat_id: self.error(f"无法获取材料 '{mat_name}' 的 ID"); publish_fail_count += 1; continue
                     req_id = f"craft_req_{task_id}_{mat_id}_{random.randint(100, 999)}"; all_request_ids.append(req_id)
                     request_data = {
@@ -373,7 +343,7 @@ class Plugin(BasePlugin):
                     self.info(f"等待材料中... {remaining_time}s 剩余...")
                     await update_status(f"⏳ 等待材料到账 ({remaining_time} 秒)...")
 
-                    inv_data_wait = await self.data_manager.get_inventory(crafter_id, use_cache=False) # 再次强制刷新
+                    inv_data_wait = await self.data_manager.get_inventory_model(crafter_id, max_age=INVENTORY_MAX_AGE) # 再次强制刷新
                     if not inv_data_wait: continue
 
                     # --- (修改: 调用 check_materials 时传递 quantity) ---
@@ -384,7 +354,7 @@ class Plugin(BasePlugin):
 
                 if not materials_arrived: # 超时
                     self.error(f"等待材料超时 ({MATERIAL_WAIT_TIMEOUT} 秒)！")
-                    inv_data_final = await self.data_manager.get_inventory(crafter_id, use_cache=False)
+                    inv_data_final = await self.data_manager.get_inventory_model(crafter_id, max_age=INVENTORY_MAX_AGE)
                     # --- (修改: 调用 check_materials 时传递 quantity) ---
                     _, final_missing = await check_materials(inv_data_final or {}, recipe_materials, item_master, quantity)
                     # --- (修改结束) ---
@@ -10,6 +10,8 @@ from core.context import get_global_context
 from apscheduler.jobstores.base import JobLookupError
 from plugins.character_sync_plugin import parse_iso_datetime, format_local_time # 导入时间处理
 from pyrogram.types import Message # <--- 导入 Message
+from modules.command_queue import PRIORITY_BULK
+from core.event_bus import reply_to_me, OVERFLOW_COALESCE
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +29,7 @@ STATE_TTL = 360 # 指令列表和索引 TTL (6分钟)
 
 RESPONSE_TIMEOUT = 120 # 等待响应超时 (秒)
 TIMEOUT_JOB_ID_PREFIX = "star_platform_timeout:" # 超时任务ID前缀
+DATA_MAX_AGE = 30 # 检查前接受的缓存数据最大秒数
 
 TARGET_SECT_NAME = "星宫" # 目标宗门
 
@@ -113,17 +116,17 @@ async def _handle_star_platform_timeout(user_id: int, expected_msg_id: int):
             timeout_logger.warning(f"【自动观星台】确认超时！等待 MsgID {expected_msg_id} 的响应超时。")
             await _clear_star_platform_state(redis_client, user_id, context.scheduler, release_lock=True)
             timeout_logger.info("【自动观星台】超时后触发角色数据同步...")
-            await context.event_bus.emit("trigger_character_sync_now")
+            await context.event_bus.emit("trigger_character_sync_now", reason="自动观星台")
         else:
             timeout_logger.info(f"【自动观星台】超时任务触发，但当前等待MsgID是 '{current_pending_msg_id_str}' (不是 {expected_msg_id}) 或无等待，忽略。")
     except ValueError:
         timeout_logger.error(f"【自动观星台】Redis 中的 pending MsgID '{current_pending_msg_id_str}' 无效，清理状态。")
         await _clear_star_platform_state(redis_client, user_id, context.scheduler, release_lock=True)
-        await context.event_bus.emit("trigger_character_sync_now")
+        await context.event_bus.emit("trigger_character_sync_now", reason="自动观星台")
     except Exception as e:
         timeout_logger.error(f"【自动观星台】处理观星台响应超时状态时出错: {e}", exc_info=True)
         await _clear_star_platform_state(redis_client, user_id, context.scheduler, release_lock=True) # 强制清理
-        await context.event_bus.emit("trigger_character_sync_now")
+        await context.event_bus.emit("trigger_character_sync_now", reason="自动观星台")
 
 async def _check_star_platform_task():
     """由 APScheduler 调度的顶层函数，用于检查和管理观星台"""
@@ -182,8 +185,8 @@ async def _check_star_platform_task():
     try:
         task_logger.info("【自动观星台】正在通过 DataManager 强制获取宗门和观星台数据...")
         # 强制刷新 sect 和 star_platform 缓存
-        sect_info = await data_manager.get_sect_info(my_id, use_cache=False)
-        star_platform_data = await data_manager.get_star_platform(my_id, use_cache=False) # 使用新方法
+        sect_info = await data_manager.get_sect_info(my_id, max_age=DATA_MAX_AGE)
+        star_platform_data = await data_manager.get_star_platform(my_id, max_age=DATA_MAX_AGE) # 使用新方法
 
         if not sect_info:
             task_logger.error("【自动观星台】无法从 API 获取宗门信息，任务终止。")
@@ -324,7 +327,7 @@ async def _check_star_platform_task():
 
                 first_command = commands_to_send[0]
                 task_logger.info(f"准备发送序列中的第一个指令: '{first_command}'")
-                success = await context.telegram_client.send_game_command(first_command)
+                success = await context.telegram_client.send_game_command(first_command, priority=PRIORITY_BULK, origin="star_platform_plugin")
                 if success:
                     task_logger.info(f"第一个指令 '{first_command}' 已成功加入队列。等待响应...")
                     lock_acquired = False # 锁不由 finally 块释放
@@ -397,7 +400,9 @@ class Plugin(BasePlugin):
                 self.info(f"已注册观星台定时检查任务 (每 {self.check_interval} 分钟)。")
                 self.event_bus.on("telegram_client_started", self._initialize_id)
                 self.event_bus.on("game_command_sent", self.handle_command_sent)
-                self.event_bus.on("game_response_received", self.handle_game_response)
+                # 序列指令按回复顺序逐条推进，避免并发处理导致索引错乱
+                self.event_bus.on("game_response_received", self.handle_game_response, when=reply_to_me,
+                                  max_concurrency=1, overflow=OVERFLOW_COALESCE, timeout=120)
                 self.info("已注册观星台相关的 game_command_sent 和 game_response_received 事件监听器。")
             else:
                  self.error("无法注册观星台定时任务或监听器：Scheduler 不可用。")
@@ -582,7 +587,7 @@ class Plugin(BasePlugin):
                     await asyncio.sleep(delay)
                     # 更新索引并发送
                     await redis_client.set(index_key, str(next_index), ex=STATE_TTL)
-                    success = await self.context.telegram_client.send_game_command(next_command)
+                    success = await self.context.telegram_client.send_game_command(next_command, priority=PRIORITY_BULK, origin=self.plugin_name)
                     if not success:
                          self.error(f"发送下一条指令 '{next_command}' 失败！清理状态。")
                          await _clear_star_platform_state(redis_client, self._my_id, self.scheduler, release_lock=True)
@@ -590,16 +595,16 @@ class Plugin(BasePlugin):
                     self.info(f"序列指令 {next_index}/{len(commands_in_list)} 全部处理完成！")
                     await _clear_star_platform_state(redis_client, self._my_id, self.scheduler, release_lock=True)
                     self.info("【自动观星台】序列完成后触发角色数据同步...")
-                    await self.context.event_bus.emit("trigger_character_sync_now")
+                    await self.context.event_bus.emit("trigger_character_sync_now", reason="自动观星台")
             elif is_fail:
                 self.error(f"指令 '{pending_command}' 执行失败！序列中断。")
                 await _clear_star_platform_state(redis_client, self._my_id, self.scheduler, release_lock=True)
                 self.info("【自动观星台】指令失败后触发角色数据同步...")
-                await self.context.event_bus.emit("trigger_character_sync_now")
+                await self.context.event_bus.emit("trigger_character_sync_now", reason="自动观星台")
             else: # 未知结果
                  self.warning(f"指令 '{pending_command}' 的回复无法判断结果 ({text[:50]}...)，序列中断。")
                  await _clear_star_platform_state(redis_client, self._my_id, self.scheduler, release_lock=True)
-                 await self.context.event_bus.emit("trigger_character_sync_now")
+                 await self.context.event_bus.emit("trigger_character_sync_now", reason="自动观星台")
 
         except ValueError:
             self.error(f"Redis 中的 pending MsgID '{expected_msg_id_str}' 无效！清理状态。")
@@ -607,5 +612,5 @@ class Plugin(BasePlugin):
         except Exception as e:
             self.error(f"处理观星台游戏响应时出错: {e}", exc_info=True)
             await _clear_star_platform_state(redis_client, self._my_id, self.scheduler, release_lock=True)
-            await self.context.event_bus.emit("trigger_character_sync_now")
+            await self.context.event_bus.emit("trigger_character_sync_now", reason="自动观星台")
 
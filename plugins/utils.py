@@ -81,7 +81,7 @@ async def edit_or_reply(plugin: 'BasePlugin', chat_id: int, message_id: int | No
         text = text[:MAX_LEN - 15] + "\n...(消息过长截断)"
     if message_id:
         try:
-            sent_or_edited_message = await tg_client.app.edit_message_text(chat_id, message_id, text, link_preview_options=link_preview_options)
+            sent_or_edited_message = await tg_client.edit_message_text(chat_id, message_id, text, link_preview_options=link_preview_options)
             edited = True
         except Exception as e:
             if "MESSAGE_NOT_MODIFIED" not in str(e):
@@ -98,17 +98,17 @@ async def edit_or_reply(plugin: 'BasePlugin', chat_id: int, message_id: int | No
              plugin.error("编辑失败且无法回复：缺少原始消息对象。")
              fallback_chat_id = plugin.context.config.get("telegram.control_chat_id") or plugin.context.config.get("telegram.admin_id")
              if fallback_chat_id:
-                 try: await tg_client.app.send_message(fallback_chat_id, f"(Edit/Reply Failed)\n{text[:1000]}...", link_preview_options=link_preview_options)
+                 try: await tg_client.send_message(fallback_chat_id, f"(Edit/Reply Failed)\n{text[:1000]}...", link_preview_options=link_preview_options)
                  except Exception as final_err: plugin.critical(f"最终 fallback 发送失败: {final_err}")
              return None
         try:
             reply_params = ReplyParameters(message_id=original_message.id)
-            sent_or_edited_message = await tg_client.app.send_message(chat_id, text, reply_parameters=reply_params, link_preview_options=link_preview_options)
+            sent_or_edited_message = await tg_client.send_message(chat_id, text, reply_parameters=reply_params, link_preview_options=link_preview_options)
         except Exception as e2:
             plugin.error(f"编辑和回复均失败: {e2}")
             fallback_chat_id = plugin.context.config.get("telegram.control_chat_id") or plugin.context.config.get("telegram.admin_id")
             if fallback_chat_id:
-                try: await tg_client.app.send_message(fallback_chat_id, f"(Edit/Reply Failed)\n{text[:1000]}...", link_preview_options=link_preview_options)
+                try: await tg_client.send_message(fallback_chat_id, f"(Edit/Reply Failed)\n{text[:1000]}...", link_preview_options=link_preview_options)
                 except Exception as final_err: plugin.critical(f"最终 fallback 发送失败: {final_err}")
             return None
     return sent_or_edited_message # 返回发送或编辑后的 Message 对象
@@ -123,10 +123,10 @@ async def send_status_message(plugin: 'BasePlugin', original_message: Message, s
     reply_params = ReplyParameters(message_id=original_message.id)
     link_preview_options = LinkPreviewOptions(is_disabled=True)
     try:
-        return await tg_client.app.send_message(original_message.chat.id, status_text, reply_parameters=reply_params, link_preview_options=link_preview_options)
+        return await tg_client.send_message(original_message.chat.id, status_text, reply_parameters=reply_params, link_preview_options=link_preview_options)
     except Exception as e:
         plugin.warning(f"回复状态消息失败 ({e})，尝试直接发送...")
-        try: return await tg_client.app.send_message(original_message.chat.id, status_text, link_preview_options=link_preview_options)
+        try: return await tg_client.send_message(original_message.chat.id, status_text, link_preview_options=link_preview_options)
         except Exception as e2: plugin.error(f"直接发送状态消息也失败: {e2}"); return None
 
 # --- (新增: 格式化任务详情函数) ---
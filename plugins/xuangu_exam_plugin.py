@@ -5,6 +5,9 @@ import random
 from typing import Tuple, Dict, Optional
 from plugins.base_plugin import BasePlugin, AppContext # 保持导入 BasePlugin
 from pyrogram.types import Message, ReplyParameters, LinkPreviewOptions
+from modules.command_queue import PRIORITY_URGENT
+from core.event_bus import OVERFLOW_COALESCE
+from modules.game_message_classifier import GameMessage
 
 REDIS_XUANGU_QA_PREFIX = "xuangu_qa"
 
@@ -29,10 +32,12 @@ class Plugin(BasePlugin):
     def register(self):
         """注册游戏响应监听器"""
         if self.config_enabled:
-            self.event_bus.on("game_response_received", self.handle_game_response)
-            self.info("已注册 game_response_received 事件监听器。")
+            # 题目逐条处理 (AI 查询较慢)，同一题目消息的编辑合并为一次
+            self.listen_game_category("xuangu_exam", ["作答 <选项>"], self.handle_game_response,
+                                      max_concurrency=1, overflow=OVERFLOW_COALESCE, timeout=120)
+            self.info("已注册 game_response:xuangu_exam 事件监听器。")
 
-    async def handle_game_response(self, message: Message, is_reply_to_me: bool, is_mentioning_me: bool):
+    async def handle_game_response(self, message: Message, is_reply_to_me: bool, is_mentioning_me: bool, game_message: Optional[GameMessage] = None):
         """处理来自游戏机器人的消息，检查是否为玄骨考校题目"""
         text = message.text or message.caption
         if not text:
@@ -254,7 +259,7 @@ class Plugin(BasePlugin):
         command = f".作答 {option_letter}"
         try:
             self.info(f"准备将考校答案指令 '{command}' 加入发送队列...")
-            success = await self.context.telegram_client.send_game_command(command)
+            success = await self.context.telegram_client.send_game_command(command, priority=PRIORITY_URGENT, origin=self.plugin_name)
             if success:
                 self.info(f"已将考校答案指令 '{command}' 加入队列。")
             else:
@@ -272,7 +277,7 @@ class Plugin(BasePlugin):
              return
         try:
             link_preview_options = LinkPreviewOptions(is_disabled=True)
-            await self.context.telegram_client.app.send_message(
+            await self.context.telegram_client.send_message(
                 self.admin_chat_id,
                 text,
                 link_preview_options=link_preview_options